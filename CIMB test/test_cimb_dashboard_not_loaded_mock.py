@@ -7,19 +7,21 @@ from selenium.webdriver.common.by import By
 from selenium.common.exceptions import TimeoutException
 
 def test_cimb_dashboard_not_loaded():
-    with patch('main3.webdriver.Chrome') as MockChrome, \
-         patch('main3.WebDriverWait') as MockWait, \
-         patch('main3.time.sleep'):
+    with patch('driver_factory.webdriver.Chrome') as MockChrome, \
+         patch('main3.wait_until') as MockWait, \
+         patch('waits.time.sleep'):
         mock_driver = MagicMock()
         MockChrome.return_value = mock_driver
         # Mock login form fields (all found)
         def find_element_side_effect(by, value):
             return MagicMock()
         mock_driver.find_element.side_effect = find_element_side_effect
-        # Patch WebDriverWait to raise TimeoutException (dashboard never loads)
-        wait_instance = MagicMock()
-        wait_instance.until.side_effect = TimeoutException("Dashboard did not load")
-        MockWait.return_value = wait_instance
+        # Patch the wait engine to raise TimeoutException once logged in (dashboard never loads)
+        def wait_side_effect(target, condition, timeout=None, poll=None, label=None):
+            if label == "cimb.dashboard_url":
+                raise TimeoutException("Dashboard did not load")
+            return True
+        MockWait.side_effect = wait_side_effect
         # Mock frame switching (no-op)
         mock_driver.switch_to.default_content.return_value = None
         mock_driver.switch_to.frame.return_value = None
@@ -6,9 +6,9 @@ from main3 import login_and_get_cimb_balance
 from selenium.webdriver.common.by import By
 
 def test_cimb_invalid_creds():
-    with patch('main3.webdriver.Chrome') as MockChrome, \
-         patch('main3.WebDriverWait') as MockWait, \
-         patch('main3.time.sleep'):
+    with patch('driver_factory.webdriver.Chrome') as MockChrome, \
+         patch('main3.wait_until') as MockWait, \
+         patch('waits.time.sleep'):
         mock_driver = MagicMock()
         MockChrome.return_value = mock_driver
         # Mock login form fields
@@ -28,11 +28,13 @@ def test_cimb_invalid_creds():
                 return login_button
             return MagicMock()
         mock_driver.find_element.side_effect = find_element_side_effect
-        # Patch WebDriverWait to raise TimeoutException on dashboard load (login fails)
-        wait_instance = MagicMock()
+        # Patch the wait engine to raise TimeoutException on dashboard load (login fails)
         from selenium.common.exceptions import TimeoutException
-        wait_instance.until.side_effect = TimeoutException("Login failed: invalid credentials")
-        MockWait.return_value = wait_instance
+        def wait_side_effect(target, condition, timeout=None, poll=None, label=None):
+            if label == "cimb.dashboard_url":
+                raise TimeoutException("Login failed: invalid credentials")
+            return True
+        MockWait.side_effect = wait_side_effect
         # Mock frame switching (no-op)
         mock_driver.switch_to.default_content.return_value = None
         mock_driver.switch_to.frame.return_value = None
@@ -6,9 +6,9 @@ from main3 import login_and_get_cimb_balance
 from selenium.webdriver.common.by import By
 
 def test_cimb_menu_not_found():
-    with patch('main3.webdriver.Chrome') as MockChrome, \
-         patch('main3.WebDriverWait') as MockWait, \
-         patch('main3.time.sleep'):
+    with patch('driver_factory.webdriver.Chrome') as MockChrome, \
+         patch('main3.wait_until') as MockWait, \
+         patch('waits.time.sleep'):
         mock_driver = MagicMock()
         MockChrome.return_value = mock_driver
         # Mock login form fields (all found)
@@ -25,10 +25,8 @@ def test_cimb_menu_not_found():
                 raise Exception("Menu div not found")
             return MagicMock()
         mock_driver.find_element.side_effect = find_element_side_effect
-        # Patch WebDriverWait to immediately succeed for both waits
-        wait_instance = MagicMock()
-        wait_instance.until.side_effect = [True, True]
-        MockWait.return_value = wait_instance
+        # Patch the wait engine so every wait succeeds immediately
+        MockWait.return_value = True
         # Simulate menuFrame present
         def find_elements_side_effect(by, value):
             if by == By.NAME and value == "menuFrame":
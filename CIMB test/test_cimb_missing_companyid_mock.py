@@ -6,8 +6,8 @@ from main3 import login_and_get_cimb_balance
 from selenium.webdriver.common.by import By
 
 def test_cimb_missing_companyid():
-    with patch('main3.webdriver.Chrome') as MockChrome, \
-         patch('main3.time.sleep'):
+    with patch('driver_factory.webdriver.Chrome') as MockChrome, \
+         patch('waits.time.sleep'):
         mock_driver = MagicMock()
         MockChrome.return_value = mock_driver
         # Simulate finding username, password, button, but NOT company ID
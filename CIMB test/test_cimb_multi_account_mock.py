@@ -0,0 +1,48 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from unittest.mock import patch, MagicMock
+import main3
+from main3 import login_and_get_cimb_balances, login_and_get_cimb_balance, parse_account_summary
+from session_cache import SessionCache
+from selenium.webdriver.common.by import By
+
+ACCOUNTS = {"7013252356": "7,123,456.78", "7013-25236-4": "250,000.00", "7013252372": "1,000.00"}
+
+def account_summary_links():
+    links = []
+    for number, balance in ACCOUNTS.items():
+        links.append({"index": len(links), "text": f"{number} /THB   Some Company", "onclick": "#"})
+        links.append({"index": len(links), "text": balance, "onclick": "#"})
+    return links
+
+def test_parse_account_summary():
+    balances = parse_account_summary(account_summary_links(), ["7013252356", "7013252364", "9999999999"])
+    assert balances == {"7013252356": 7123456.78, "7013252364": 250000.0, "9999999999": None}
+
+def test_all_accounts_from_one_login():
+    with patch('driver_factory.webdriver.Chrome') as MockChrome, \
+         patch('main3.wait_until', return_value=True), \
+         patch('main3.session_cache', SessionCache(enabled=False)), \
+         patch('waits.time.sleep'):
+        mock_driver = MagicMock()
+        MockChrome.return_value = mock_driver
+        # The whole Account Summary comes back from one in-page snapshot
+        mock_driver.execute_script.side_effect = lambda script, by, value, attributes: account_summary_links() if value == "a" else []
+        with patch('main3.CIMB_ACCOUNT_NUMBERS', ["7013252356", "7013252364"]):
+            balances = login_and_get_cimb_balances()
+            print(f"login_and_get_cimb_balances() result: {balances}")
+            assert balances == {"7013252356": 7123456.78, "7013252364": 250000.0}
+            logins = [c for c in mock_driver.find_element.call_args_list if c.args == (By.NAME, "submit1")]
+            assert len(logins) == 1, "Every account should come from a single login"
+
+            # The report's CIMB balance is the total of the configured accounts
+            assert login_and_get_cimb_balance() == 7373456.78
+
+        # A configured account missing from the page fails the total
+        with patch('main3.CIMB_ACCOUNT_NUMBERS', ["7013252356", "9999999999"]):
+            assert login_and_get_cimb_balance() is None
+
+if __name__ == '__main__':
+    test_parse_account_summary()
+    test_all_accounts_from_one_login()
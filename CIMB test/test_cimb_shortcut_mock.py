@@ -0,0 +1,81 @@
+import sys
+import os
+import json
+import tempfile
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from unittest.mock import patch, MagicMock
+import main3
+from main3 import login_and_get_cimb_balance, account_summary_target
+from session_cache import SessionCache
+from selenium.webdriver.common.by import By
+
+PORTAL = "https://www.bizchannel.cimbthai.com"
+SUMMARY_URL = PORTAL + "/corp/front/accountsummary.do?action=accountSummaryRequest"
+
+def fake_cimb():
+    """A logged-in frameset whose menu links to the Account Summary page."""
+    driver = MagicMock()
+
+    def execute_script(script, *args):
+        if "document.baseURI" in script:
+            return PORTAL + "/corp/menu.html"
+        if "mainFrame" in script:
+            return None  # Shortcut navigation
+        by, value = args[0], args[1]
+        if value == "#subs8":
+            return [{"index": 0, "text": "Account Summary", "href": "/corp/front/accountsummary.do?action=accountSummaryRequest",
+                     "onclick": None, "element": MagicMock()}]
+        if value == "a":
+            return [{"index": 0, "text": "7013252356 /THB   Some Company", "onclick": "#"},
+                    {"index": 1, "text": "7,123,456.78", "onclick": "#"}]
+        return []
+    driver.execute_script.side_effect = execute_script
+    return driver
+
+def menu_clicks(driver):
+    return [c for c in driver.find_element.call_args_list if c.args == (By.ID, "subs8")]
+
+def test_account_summary_target():
+    base = PORTAL + "/corp/menu.html"
+    assert account_summary_target({"href": "/corp/front/accountsummary.do?a=1", "onclick": None}, base) == PORTAL + "/corp/front/accountsummary.do?a=1"
+    assert account_summary_target({"href": "#", "onclick": "goPage('accountsummary.do?a=1'); return false;"}, base) == PORTAL + "/corp/accountsummary.do?a=1"
+    assert account_summary_target({"href": "javascript:void(0)", "onclick": "openMenu()"}, base) is None
+    assert account_summary_target({"href": "https://elsewhere.example/x.do", "onclick": None}, base) is None
+
+def test_menu_is_used_once_then_skipped():
+    with tempfile.TemporaryDirectory() as tmp:
+        shortcut_path = os.path.join(tmp, "cimb_shortcut.json")
+        with patch('driver_factory.webdriver.Chrome') as MockChrome, \
+             patch('main3.wait_until', return_value=True), \
+             patch('main3.session_cache', SessionCache(enabled=False)), \
+             patch('main3.CIMB_URL', PORTAL + "/corp/common2/login.do?action=loginRequest"), \
+             patch('main3.CIMB_ACCOUNT_NUMBERS', ["7013252356"]), \
+             patch('main3.CIMB_SHORTCUT_PATH', shortcut_path), \
+             patch('waits.time.sleep'):
+            first = fake_cimb()
+            MockChrome.return_value = first
+            assert login_and_get_cimb_balance() == 7123456.78
+            assert len(menu_clicks(first)) == 1, "First run has to click through the menu"
+            with open(shortcut_path) as f:
+                assert json.load(f)["target"] == SUMMARY_URL
+
+            second = fake_cimb()
+            MockChrome.return_value = second
+            assert login_and_get_cimb_balance() == 7123456.78
+            assert menu_clicks(second) == [], "Later runs should load the Account Summary directly"
+            assert any(c.args[1:] == (SUMMARY_URL,) for c in second.execute_script.call_args_list)
+
+            # A shortcut that no longer loads falls back to the menu
+            third = fake_cimb()
+            MockChrome.return_value = third
+            def wait_until(driver, condition, timeout=None, label=None, **kwargs):
+                if label == "cimb.account_summary_shortcut":
+                    raise TimeoutError(label)
+                return True
+            with patch('main3.wait_until', side_effect=wait_until):
+                assert login_and_get_cimb_balance() == 7123456.78
+            assert len(menu_clicks(third)) == 1
+
+if __name__ == '__main__':
+    test_account_summary_target()
+    test_menu_is_used_once_then_skipped()
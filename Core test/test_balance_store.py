@@ -0,0 +1,81 @@
+import sys
+import os
+import time
+import tempfile
+from datetime import date, datetime, timedelta
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from unittest.mock import patch
+import pytz
+from balance_store import BalanceStore, record_extraction
+
+BANGKOK_TZ = pytz.timezone("Asia/Bangkok")
+
+def at(day, hour=2, minute=5):
+    return BANGKOK_TZ.localize(datetime(day.year, day.month, day.day, hour, minute))
+
+def test_latest_range_and_day_over_day():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BalanceStore(os.path.join(tmp, "balances.db"))
+        monday, tuesday = date(2026, 3, 9), date(2026, 3, 10)
+        store.record("CIMB", 1000.0, at(tuesday), monday, duration=12.3)
+        store.record("CIMB", None, at(tuesday + timedelta(days=1)), tuesday, status="failed")
+        store.record("CIMB", 1200.0, at(tuesday + timedelta(days=1), 3), tuesday, duration=9.8, run_id="r2")
+        store.record("V2", 50.0, at(tuesday + timedelta(days=1)), tuesday)
+
+        assert store.value_on("CIMB", tuesday) == 1200.0
+        assert store.value_on("CIMB", "2026-03-09") == 1000.0
+        assert store.value_on("CIMB", date(2026, 3, 1)) is None
+        latest = store.latest("CIMB")
+        print(f"latest CIMB: {latest!r}")
+        assert latest["business_date"] == "2026-03-10" and latest["run_id"] == "r2"
+        assert latest["extracted_at"].tzinfo is not None
+        assert store.latest("CIMB", status="failed")["value"] is None
+
+        history = store.history("CIMB", start=monday, end=tuesday)
+        assert [(r["business_date"], r["value"]) for r in history] == [("2026-03-09", 1000.0), ("2026-03-10", 1200.0)]
+        assert len(store.history(start=tuesday)) == 2, "One row per source and day expected"
+        assert [r["status"] for r in store.attempts("CIMB", tuesday)] == ["failed", "ok"]
+
+        delta = store.day_over_day("CIMB")
+        print(f"day_over_day CIMB: {delta!r}")
+        assert delta["delta"] == 200.0 and delta["previous_date"] == "2026-03-09"
+        assert store.day_over_day("V2")["delta"] is None
+        assert store.day_over_day("VAS") is None
+        store.close()
+
+def test_queries_stay_fast_over_years_of_history():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BalanceStore(os.path.join(tmp, "balances.db"))
+        conn = store._connect()
+        start = date(2020, 1, 1)
+        rows = []
+        for offset in range(5 * 365):
+            day = start + timedelta(days=offset)
+            extracted = at(day + timedelta(days=1))
+            for source in ("CIMB", "V2", "VAS"):
+                rows.append((source, day.isoformat(), extracted.isoformat(), extracted.timestamp(), float(offset), 10.0, "ok"))
+        conn.executemany("INSERT INTO extractions (source, business_date, extracted_at, extracted_ts, value, duration, status) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+        began = time.perf_counter()
+        assert store.value_on("CIMB", date(2022, 6, 14)) is not None
+        assert store.latest("VAS")["business_date"] == (start + timedelta(days=5 * 365 - 1)).isoformat()
+        assert len(store.history("V2", start=date(2023, 1, 1), end=date(2023, 1, 31))) == 31
+        assert store.day_over_day("CIMB", date(2021, 2, 1))["delta"] == 1.0
+        elapsed = time.perf_counter() - began
+        print(f"4 queries over {len(rows)} rows took {elapsed * 1000:.1f} ms")
+        assert elapsed < 0.5
+        plan = conn.execute("EXPLAIN QUERY PLAN SELECT value FROM extractions WHERE source = 'CIMB' "
+                            "AND business_date = '2022-06-14' AND status = 'ok'").fetchall()
+        assert any("idx_extractions" in row[-1] for row in plan), "Lookups should use an index"
+        store.close()
+
+def test_record_extraction_never_raises():
+    broken = BalanceStore("/proc/no-such-dir/balances.db")
+    with patch('balance_store.balance_store', broken):
+        assert record_extraction("V2", 1.0) is None
+
+if __name__ == '__main__':
+    test_latest_range_and_day_over_day()
+    test_queries_stay_fast_over_years_of_history()
+    test_record_extraction_never_raises()
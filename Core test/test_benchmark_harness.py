@@ -0,0 +1,67 @@
+import sys
+import os
+import io
+import json
+import tempfile
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from unittest.mock import patch
+from benchmark import run_benchmark, main_cli, build_sample_report, process_tree_rss
+from excel_reader import read_cells
+
+# configure_sources() rewrites these module settings; restore them after each test
+SETTINGS = ['main.V2_URL', 'main.USERNAME', 'main.PASSWORD', 'main2.VAS_URL', 'main2.VAS_REPORT_URL',
+            'main2.VAS_USERNAME', 'main2.VAS_PASSWORD', 'main3.CIMB_URL', 'main3.CIMB_COMPANY_ID',
+            'main3.CIMB_USERNAME', 'main3.CIMB_PASSWORD', 'main3.CIMB_ACCOUNT_NUMBERS']
+
+def restore_settings():
+    patches = [patch(target, getattr(sys.modules[target.split('.')[0]], target.split('.')[1])) for target in SETTINGS]
+    for p in patches:
+        p.start()
+    return patches
+
+def test_benchmark_v2_over_http():
+    patches = restore_settings()
+    try:
+        with patch('main.V2_EXTRACT_MODE', "http"):
+            report = run_benchmark(["v2"], repeat=2)
+        print(json.dumps(report, indent=2))
+        v2 = report["sources"]["v2"]
+        assert v2["runs"] == 2 and v2["ok"] == 2, "V2 fast path did not succeed against the fixtures!"
+        assert v2["values"] == [241.67, 241.67]
+        for metric in ("wall", "cpu", "peak_rss_mb"):
+            assert set(v2[metric]) == {"min", "median", "mean", "max"}
+        assert v2["peak_rss_mb"]["max"] > 0
+        assert {"http_login", "parse"} <= set(v2["stages"]), "Per-stage figures missing!"
+        assert v2["stages"]["http_login"]["wall"]["min"] >= 0
+    finally:
+        for p in patches:
+            p.stop()
+
+def test_benchmark_cli_writes_json_and_exit_code():
+    patches = restore_settings()
+    try:
+        with tempfile.TemporaryDirectory() as tmp, patch('main.V2_EXTRACT_MODE', "http"):
+            output = os.path.join(tmp, "bench.json")
+            assert main_cli(["--sources", "v2", "--repeat", "1", "--output", output]) == 0
+            with open(output) as f:
+                report = json.load(f)
+            assert report["sources"]["v2"]["ok"] == 1
+            assert main_cli(["--sources", "nope"]) == 2, "Unknown sources should be rejected"
+    finally:
+        for p in patches:
+            p.stop()
+
+def test_sample_report_has_balance_in_b15():
+    values = read_cells(io.BytesIO(build_sample_report(42.5)), {"balance": "B15"})
+    assert values == {"balance": 42.5}
+
+def test_process_tree_rss_counts_this_process():
+    if not os.path.isdir("/proc"):
+        return
+    assert process_tree_rss() > 0
+
+if __name__ == '__main__':
+    test_benchmark_v2_over_http()
+    test_benchmark_cli_writes_json_and_exit_code()
+    test_sample_report_has_balance_in_b15()
+    test_process_tree_rss_counts_this_process()
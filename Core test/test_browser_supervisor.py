@@ -0,0 +1,113 @@
+import sys
+import os
+import time
+import subprocess
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from unittest.mock import patch, MagicMock
+from browser_supervisor import BrowserSupervisor, BROWSER_MARKER
+
+# A stand-in for Chrome: a marked process with one child (a "renderer")
+FAKE_CHROME = "import subprocess, sys, time; subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)']); time.sleep(60)"
+
+def start_fake_chrome(owner):
+    process = subprocess.Popen([sys.executable, "-c", FAKE_CHROME, f"{BROWSER_MARKER}={owner}"])
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline and not children(process.pid):
+        time.sleep(0.05)
+    return process, children(process.pid)[0]
+
+def children(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+def running(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            stat = f.read()
+    except OSError:
+        return False
+    return stat[stat.rfind(")") + 2] != "Z"
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+def test_orphaned_browser_trees_are_reaped():
+    orphan, orphan_renderer = start_fake_chrome(owner=dead_pid())
+    other, other_renderer = start_fake_chrome(owner=os.getppid())  # Another live instance's browser
+    try:
+        supervisor = BrowserSupervisor()
+        reaped = supervisor.reap_orphans()
+        print(f"Reaped: {reaped}")
+        assert reaped == [orphan.pid]
+        assert not running(orphan.pid) and not running(orphan_renderer), "The whole tree should be killed"
+        assert running(other.pid) and running(other_renderer)
+        assert supervisor.stats["orphans_reaped"] == 1
+    finally:
+        for pid in (other.pid, other_renderer, orphan.pid, orphan_renderer):
+            try:
+                os.kill(pid, 9)
+            except OSError:
+                pass
+        other.wait()
+
+def test_browser_past_its_lifetime_is_killed():
+    process, renderer = start_fake_chrome(owner=os.getpid())
+    driver = MagicMock()
+    driver.service.process.pid = process.pid
+    driver.quit.side_effect = lambda: time.sleep(1)  # A hung chromedriver
+    on_expire = MagicMock()
+    try:
+        with patch('browser_supervisor.QUIT_TIMEOUT', 0.2):
+            supervisor = BrowserSupervisor(max_lifetime=0.2, interval=0.1, on_expire=on_expire)
+            supervisor.starting()
+            supervisor.track(driver, "cimb")
+            assert supervisor.reap_orphans() == [], "A tracked browser is not an orphan"
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline and supervisor.stats["expired"] == 0:
+                time.sleep(0.05)
+        report = supervisor.report()
+        print(report)
+        assert report["expired"] == 1 and report["killed_trees"] == 1 and report["open"] == []
+        on_expire.assert_called_once_with(driver)
+        assert not running(process.pid) and not running(renderer)
+    finally:
+        for pid in (process.pid, renderer):
+            try:
+                os.kill(pid, 9)
+            except OSError:
+                pass
+
+def test_release_after_expiry_does_not_kill_a_reused_pid():
+    process, renderer = start_fake_chrome(owner=os.getpid())
+    driver = MagicMock()
+    driver.service.process.pid = process.pid
+    stranger = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+    try:
+        supervisor = BrowserSupervisor(max_lifetime=0, interval=60)
+        supervisor.track(driver, "cimb")
+        time.sleep(0.01)
+        assert supervisor.expire() == 1
+        assert not running(process.pid) and not running(renderer)
+        # The source still holds the browser; by the time the pool releases it the pid is someone else's
+        driver.service.process.pid = stranger.pid
+        supervisor.quit(driver)
+        assert running(stranger.pid), "A retired browser must not be killed again by its stale pid"
+        assert driver.quit.call_count == 1
+        assert supervisor.stats["quit"] == 1 and supervisor.stats["expired"] == 1
+    finally:
+        for pid in (process.pid, renderer, stranger.pid):
+            try:
+                os.kill(pid, 9)
+            except OSError:
+                pass
+        stranger.wait()
+
+if __name__ == '__main__':
+    test_orphaned_browser_trees_are_reaped()
+    test_browser_past_its_lifetime_is_killed()
+    test_release_after_expiry_does_not_kill_a_reused_pid()
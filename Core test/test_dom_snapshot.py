@@ -0,0 +1,65 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from unittest.mock import MagicMock
+from selenium.webdriver.common.by import By
+from dom_snapshot import element_snapshot, account_index, normalize_account
+
+def anchors(*texts):
+    return [{"index": i, "element": None, "text": text, "x": 0, "y": 20 * i} for i, text in enumerate(texts)]
+
+def test_snapshot_is_one_round_trip():
+    driver = MagicMock()
+    driver.execute_script.return_value = anchors("7013252356 /THB   Some Company", "7,123,456.78")
+    links = element_snapshot(driver, By.TAG_NAME, "a", ("href", "onclick"))
+    assert [link["text"] for link in links] == ["7013252356 /THB   Some Company", "7,123,456.78"]
+    driver.execute_script.assert_called_once()
+    assert driver.execute_script.call_args.args[1:] == ("tag name", "a", ["href", "onclick"])
+    driver.find_elements.assert_not_called()
+
+def test_snapshot_falls_back_to_element_reads():
+    driver = MagicMock()
+    driver.execute_script.side_effect = Exception("javascript error")
+    link = MagicMock(text="  Account Summary ")
+    link.get_attribute.return_value = "accountsummary.do"
+    driver.find_elements.return_value = [link]
+    links = element_snapshot(driver, By.TAG_NAME, "a", ("href",))
+    assert links == [{"index": 0, "element": link, "text": "Account Summary", "x": None, "y": None,
+                      "href": "accountsummary.do"}]
+
+def test_unsupported_locator_is_rejected():
+    driver = MagicMock()
+    for by in (By.LINK_TEXT, By.PARTIAL_LINK_TEXT):
+        try:
+            element_snapshot(driver, by, "Account Summary")
+        except ValueError as e:
+            print(f"rejected {by}: {e}")
+        else:
+            raise AssertionError(f"{by} should be rejected, not run as a CSS selector")
+    driver.execute_script.assert_not_called()
+    driver.find_elements.assert_not_called()
+
+def test_id_name_and_class_locators_are_passed_through():
+    driver = MagicMock()
+    driver.execute_script.return_value = []
+    for by, value in ((By.ID, "businessDate"), (By.NAME, "username"), (By.CLASS_NAME, "fa-file-o"), (By.CSS_SELECTOR, "#subs8")):
+        assert element_snapshot(driver, by, value) == []
+        assert driver.execute_script.call_args.args[1:3] == (by, value)
+    # The script builds the matching CSS for each of them in the page
+    script = driver.execute_script.call_args.args[0]
+    assert '"class name"' in script and '"id" || by === "name"' in script
+
+def test_account_index_maps_accounts_to_balance_links():
+    links = anchors("Home", "7013252356 /THB   Some Company", "7,123,456.78",
+                    "701-3-25235-7 /THB  Other", "15.00", "Logout")
+    index = account_index(links)
+    assert index["7013252356"]["text"] == "7,123,456.78"
+    assert index[normalize_account("701-3-25235-7")]["text"] == "15.00"
+    assert "Home" not in index and len(index) == 2
+
+if __name__ == '__main__':
+    test_snapshot_is_one_round_trip()
+    test_snapshot_falls_back_to_element_reads()
+    test_unsupported_locator_is_rejected()
+    test_id_name_and_class_locators_are_passed_through()
+    test_account_index_maps_accounts_to_balance_links()
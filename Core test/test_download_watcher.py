@@ -0,0 +1,63 @@
+import sys
+import os
+import time
+import tempfile
+import threading
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from unittest.mock import patch
+from openpyxl import Workbook
+from download_watcher import wait_for_download, is_valid_xlsx
+
+def simulate_chrome_download(directory, name, delay=0.2):
+    # Chrome writes <name>.crdownload in chunks, then renames it to <name>
+    source = os.path.join(directory, "source.xlsx")
+    Workbook().save(source)
+    with open(source, "rb") as f:
+        content = f.read()
+    os.remove(source)
+    partial = os.path.join(directory, name + ".crdownload")
+    time.sleep(delay)
+    with open(partial, "wb") as f:
+        half = len(content) // 2
+        f.write(content[:half])
+        f.flush()
+        time.sleep(delay)
+        f.write(content[half:])
+    os.rename(partial, os.path.join(directory, name))
+
+def run_download(use_inotify):
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = threading.Thread(target=simulate_chrome_download, args=(tmp, "UserAcccountStatReport_20250605 (1).xlsx"))
+        start = time.monotonic()
+        writer.start()
+        if use_inotify:
+            path = wait_for_download(tmp, "UserAcccountStatReport_20250605*.xlsx", timeout=10, validate=is_valid_xlsx)
+        else:
+            with patch('download_watcher._open_inotify', return_value=None):
+                path = wait_for_download(tmp, "UserAcccountStatReport_20250605*.xlsx", timeout=10, validate=is_valid_xlsx)
+        elapsed = time.monotonic() - start
+        writer.join()
+        print(f"wait_for_download() returned {os.path.basename(path)} after {elapsed:.2f}s (inotify={use_inotify})")
+        assert os.path.basename(path) == "UserAcccountStatReport_20250605 (1).xlsx"
+        assert elapsed < 3, "Watcher should return shortly after the download finishes!"
+
+def test_download_watcher_inotify():
+    run_download(use_inotify=True)
+
+def test_download_watcher_polling_fallback():
+    run_download(use_inotify=False)
+
+def test_download_watcher_rejects_invalid_xlsx():
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, "UserAcccountStatReport_20250605.xlsx"), "wb") as f:
+            f.write(b"<html>Session expired</html>")
+        try:
+            wait_for_download(tmp, "*.xlsx", timeout=0.5, validate=is_valid_xlsx)
+            assert False, "Expected TimeoutError for a file that is not a valid xlsx"
+        except TimeoutError as e:
+            print(f"wait_for_download() with invalid file raised: {e}")
+
+if __name__ == '__main__':
+    test_download_watcher_inotify()
+    test_download_watcher_polling_fallback()
+    test_download_watcher_rejects_invalid_xlsx()
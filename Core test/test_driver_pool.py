@@ -0,0 +1,79 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from unittest.mock import patch, MagicMock
+from selenium.common.exceptions import WebDriverException
+from driver_factory import DriverPool
+import generate_report
+
+def test_open_pool_reuses_browser_with_cookies_cleared():
+    with patch('driver_factory.webdriver.Chrome') as MockChrome:
+        MockChrome.side_effect = lambda options: MagicMock()
+        pool = DriverPool(max_size=2)
+        pool.open()
+        first = pool.acquire("v2")
+        pool.release(first)
+        second = pool.acquire("cimb")
+        print(f"Chrome launches: {MockChrome.call_count}")
+        assert second is first, "Open pool should hand out the warm browser again!"
+        assert MockChrome.call_count == 1
+        first.execute_cdp_cmd.assert_any_call("Network.clearBrowserCookies", {})
+        pool.release(second)
+        pool.close()
+        first.quit.assert_called_once()
+        print("Test passed: warm browser reused and quit when the pool closed.")
+
+def test_closed_pool_quits_released_browser():
+    with patch('driver_factory.webdriver.Chrome') as MockChrome:
+        driver = MagicMock()
+        MockChrome.return_value = driver
+        pool = DriverPool(max_size=1)
+        pool.release(pool.acquire("vas"))
+        driver.quit.assert_called_once()
+        print("Test passed: browser quit when pool is closed.")
+
+def test_pool_caps_running_browsers():
+    with patch('driver_factory.webdriver.Chrome') as MockChrome:
+        MockChrome.side_effect = lambda options: MagicMock()
+        pool = DriverPool(max_size=1)
+        pool.open(warm=3)
+        assert MockChrome.call_count == 1, "Warm-up should not start more browsers than the pool size!"
+        driver = pool.acquire("v2")
+        try:
+            pool.acquire("cimb", timeout=0.1)
+            assert False, "Second browser should not be handed out while the pool is full!"
+        except WebDriverException as e:
+            print(f"acquire() while pool full raised: {e}")
+        pool.release(driver)
+        pool.close()
+
+def test_scheduler_keeps_the_run_browsers_for_the_retry():
+    with patch('driver_factory.webdriver.Chrome') as MockChrome:
+        MockChrome.side_effect = lambda options: MagicMock()
+        pool = DriverPool(max_size=1)
+        outcomes = iter([False, True])
+
+        def run_report():
+            # What a run does with the pool: open it, use a browser, close it
+            pool.open()
+            pool.release(pool.acquire("cimb"))
+            pool.close()
+            return next(outcomes)
+
+        def run_scheduler(job, schedule, stop_event=None, warmup=None, warmup_lead=None, idle=None):
+            # A restart caught up on the missed run (no warm-up), it failed and the retry succeeded
+            assert job() is False and job() is True
+            idle()
+        with patch('generate_report.driver_pool', pool), \
+             patch('generate_report.run_report', run_report), \
+             patch('generate_report.run_scheduler', run_scheduler):
+            generate_report.run_schedule()
+        print(f"Chrome launches: {MockChrome.call_count}")
+        assert MockChrome.call_count == 1, "The retry should reuse the browser the failed run started"
+        assert not pool.is_open
+
+if __name__ == '__main__':
+    test_open_pool_reuses_browser_with_cookies_cleared()
+    test_closed_pool_quits_released_browser()
+    test_pool_caps_running_browsers()
+    test_scheduler_keeps_the_run_browsers_for_the_retry()
@@ -0,0 +1,94 @@
+import sys
+import os
+import io
+import queue
+import logging
+import threading
+import subprocess
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from logger_config import SensitiveDataFilter, BoundedQueueHandler, RedactingQueueListener
+
+SENDGRID_KEY = "SG." + "a" * 22 + "." + "b" * 43
+
+def make_logger(handler):
+    logger = logging.Logger("queue-test", logging.DEBUG)
+    logger.addHandler(handler)
+    return logger
+
+def test_filter_redacts_once_and_skips_lower_levels():
+    redactor = SensitiveDataFilter(logging.INFO)
+    record = logging.LogRecord("t", logging.INFO, __file__, 1, "login password=hunter2 key %s", (SENDGRID_KEY,), None)
+    redactor.filter(record)
+    assert record.getMessage() == "login ***REDACTED*** key ***SENDGRID-KEY-REDACTED***"
+    assert record.redacted
+
+    debug = logging.LogRecord("t", logging.DEBUG, __file__, 1, "username=alice", None, None)
+    redactor.filter(debug)
+    assert debug.msg == "username=alice", "Records below the handler level are not scanned"
+
+def test_listener_formats_and_redacts_off_the_calling_thread():
+    stream = io.StringIO()
+    threads = []
+
+    class RecordingHandler(logging.StreamHandler):
+        def emit(self, record):
+            threads.append(threading.current_thread().name)
+            super().emit(record)
+
+    handler = RecordingHandler(stream)
+    handler.setLevel(logging.INFO)
+    log_queue = queue.Queue(maxsize=100)
+    queue_handler = BoundedQueueHandler(log_queue)
+    queue_handler.setLevel(logging.INFO)
+    listener = RedactingQueueListener(log_queue, [handler], SensitiveDataFilter(logging.INFO))
+    listener.start()
+    logger = make_logger(queue_handler)
+    logger.debug("not queued")
+    logger.info("API_KEY: abc123")
+    listener.stop()
+    assert stream.getvalue() == "***REDACTED***\n"
+    assert threads and threading.current_thread().name not in threads
+    assert queue_handler.stats["enqueued"] == 1
+
+def test_full_queue_drops_debug_and_bounds_warning_wait():
+    log_queue = queue.Queue(maxsize=2)
+    queue_handler = BoundedQueueHandler(log_queue, block_seconds=0.05)
+    logger = make_logger(queue_handler)
+    for i in range(5):
+        logger.debug(f"row {i}")
+    logger.warning("still important")
+    stats = queue_handler.stats
+    print(stats)
+    assert stats["enqueued"] == 2 and stats["dropped"] == 4
+    assert stats["blocked"] == 1 and stats["blocked_seconds"] >= 0.04
+    assert stats["high_water"] == 2
+
+    log_queue.get_nowait()
+    logger.warning("fits now")
+    assert stats["enqueued"] == 3
+
+def test_setup_again_replaces_the_listener():
+    # In a fresh interpreter: setting logging up twice must not leave the first listener running
+    check = (
+        "import atexit, logging, logger_config\n"
+        "hooks = []\n"
+        "register = atexit.register\n"
+        "atexit.register = lambda func, *args: hooks.append(func) or register(func, *args)\n"
+        "logger_config.setup_logger(queue_size=100)\n"
+        "first = logger_config._listener\n"
+        "logger_config.setup_logger(queue_size=100)\n"
+        "assert first._thread is None, 'the first listener is still running'\n"
+        "assert all(getattr(h, 'stream', None) is None for h in first.handlers if hasattr(h, 'baseFilename')), 'file left open'\n"
+        "assert logging.getLogger().handlers == [logger_config._queue_handler]\n"
+        "assert hooks.count(logger_config.stop_logging) == 1, hooks\n"
+    )
+    project = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    completed = subprocess.run([sys.executable, "-c", check], cwd=project, capture_output=True, text=True)
+    print(completed.stderr)
+    assert completed.returncode == 0, completed.stderr
+
+if __name__ == '__main__':
+    test_filter_redacts_once_and_skips_lower_levels()
+    test_listener_formats_and_redacts_off_the_calling_thread()
+    test_full_queue_drops_debug_and_bounds_warning_wait()
+    test_setup_again_replaces_the_listener()
@@ -0,0 +1,93 @@
+import sys
+import os
+import io
+import json
+import time
+import tempfile
+import threading
+from contextlib import redirect_stdout
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from unittest.mock import patch, MagicMock
+import cli
+import timings
+import generate_report
+from memory_monitor import MemoryMonitor
+from balance_store import BalanceStore
+
+def test_peaks_per_source_and_stage():
+    active = {}
+    with patch('memory_monitor._browser_pids', return_value={"vas": os.getpid()}):
+        monitor = MemoryMonitor(lambda: dict(active), interval=0.01, budget_mb=0, trace_heap=True)
+        monitor.start()
+        active["VAS"] = "parse"
+        workbook = [bytearray(1024) for _ in range(20 * 1024)]  # ~20 MB on the Python heap
+        time.sleep(0.1)
+        del workbook
+        active["VAS"] = "logout"
+        time.sleep(0.05)
+        summary = monitor.stop()
+    print(json.dumps(summary, indent=2))
+    vas = summary["sources"]["VAS"]
+    assert summary["peak_rss_mb"] >= vas["peak_rss_mb"] > 0
+    assert vas["stages"]["parse"]["peak_heap_mb"] >= 20
+    assert vas["stages"]["logout"]["peak_heap_mb"] < 20
+    assert vas["browser_rss_mb"] > 0, "The source's browser tree should be counted"
+    assert summary["over_budget"] is False and summary["budget_mb"] is None
+
+def test_run_over_budget_fails_without_email():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BalanceStore(os.path.join(tmp, "balances.db"))
+        send = MagicMock(return_value=True)
+        out = io.StringIO()
+        with patch('balance_store.balance_store', store), \
+             patch('timings.TIMINGS_PATH', os.devnull), \
+             patch('memory_monitor.MEMORY_BUDGET_MB', 1), \
+             patch('generate_report.send_report_email', send), \
+             patch('main.login_and_test_v2', MagicMock(return_value=1.0)), \
+             patch('main2.login_vas', MagicMock(return_value=2.0)), \
+             patch('main3.login_and_get_cimb_balances', MagicMock(return_value=5.0)), \
+             redirect_stdout(out):
+            code = cli.main(["run", "--no-cache"])
+        summary = json.loads(out.getvalue())
+        assert code == cli.EXIT_FAILED
+        assert summary["memory"]["over_budget"] is True and summary["ok"] is False
+        assert summary["reconciliation"] == 2.0, "The balances themselves are fine"
+        send.assert_not_called()
+        store.close()
+
+def monitor_threads():
+    return [thread for thread in threading.enumerate() if thread.name == "memory-monitor"]
+
+def test_failed_run_stops_its_monitor():
+    before = len(monitor_threads())
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BalanceStore(os.path.join(tmp, "balances.db"))
+        with patch('balance_store.balance_store', store), \
+             patch('timings.TIMINGS_PATH', os.devnull), \
+             patch('memory_monitor.enabled', True):
+            # An unknown source in the formula fails before the run starts
+            with patch('sources.RECONCILIATION_FORMULA', "CIMB - KBANK"):
+                for _ in range(3):
+                    try:
+                        generate_report.run_report()
+                        assert False, "An unknown source should fail the run"
+                    except KeyError:
+                        pass
+            # A failure inside the run still ends it
+            with patch('generate_report.render_report', side_effect=RuntimeError("boom")), \
+                 patch('main.login_and_test_v2', MagicMock(return_value=1.0)), \
+                 patch('main2.login_vas', MagicMock(return_value=2.0)), \
+                 patch('main3.login_and_get_cimb_balances', MagicMock(return_value=5.0)):
+                try:
+                    generate_report.run_report(use_cache=False)
+                    assert False, "The error should reach the caller"
+                except RuntimeError:
+                    pass
+        store.close()
+    assert timings._runs == {}, "No run may be left open"
+    assert len(monitor_threads()) == before, "Every run's memory sampler should be stopped"
+
+if __name__ == '__main__':
+    test_peaks_per_source_and_stage()
+    test_run_over_budget_fails_without_email()
+    test_failed_run_stops_its_monitor()
@@ -0,0 +1,186 @@
+import sys
+import os
+import time
+import asyncio
+import json
+import tempfile
+import threading
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from orchestrator import run_blocking, extract_source, extract_sources, DeadlineExceeded
+from sources import BalanceSource, COST_FILE, COST_BROWSER
+from timings import timed_stage, lap, current_run_id
+from balance_store import BalanceStore
+import generate_report
+
+def slow(value, delay):
+    def extractor():
+        time.sleep(delay)
+        return value
+    return extractor
+
+def extract_all(extractors, max_workers, timeout=None, on_result=None):
+    # Plain callables with no declared cost, so only max_workers limits them
+    sources = [BalanceSource(name, extractor, cost=COST_FILE) for name, extractor in extractors.items()]
+    return extract_sources(sources, max_workers, max_workers, timeout, on_result)
+
+def test_deadline_starts_when_a_worker_picks_the_task_up():
+    recorded = []
+    results = asyncio.run(extract_all({"V2": slow(1.0, 0.3), "VAS": slow(2.0, 0.3)}, max_workers=1, timeout=0.5,
+                                      on_result=lambda *args: recorded.append(args)))
+    print(f"results with one worker: {results!r}")
+    assert results["V2"][0] == 1.0 and results["VAS"][0] == 2.0, "Queue time must not count against the deadline"
+    assert [status for *_, status in recorded] == ["ok", "ok"]
+
+def test_deadline_and_extractor_timeouts_are_told_apart():
+    def raises_timeout():
+        raise TimeoutError("download never arrived")
+    recorded = {}
+    results = asyncio.run(extract_all({"CIMB": slow(5.0, 2), "VAS": raises_timeout}, max_workers=2, timeout=0.3,
+                                      on_result=lambda name, *rest: recorded.setdefault(name, rest[-1])))
+    assert results == {"CIMB": (None, None), "VAS": (None, None)}
+    assert recorded == {"CIMB": "timeout", "VAS": "error"}
+
+def test_cancellation_stops_waiting_and_skips_queued_work():
+    started = []
+    recorded = []
+
+    def extractor(name):
+        def run():
+            started.append(name)
+            time.sleep(0.5)
+            return 1.0
+        return run
+
+    async def main():
+        task = asyncio.create_task(extract_all({"V2": extractor("V2"), "VAS": extractor("VAS")}, max_workers=1,
+                                               timeout=5, on_result=lambda *args: recorded.append(args)))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        began = time.monotonic()
+        try:
+            await task
+        except asyncio.CancelledError:
+            return time.monotonic() - began
+        raise AssertionError("extract_all should have been cancelled")
+
+    waited = asyncio.run(main())
+    time.sleep(0.6)
+    print(f"started: {started}, recorded: {recorded}")
+    assert waited < 0.2, "Cancelling should not wait for the running extractor"
+    assert started == ["V2"], "A source that had not started yet must not run after cancellation"
+    assert sorted(status for *_, status in recorded) == ["cancelled", "cancelled"]
+
+def test_one_loop_drives_several_runs():
+    seen = []
+
+    @timed_stage("V2")
+    def v2():
+        seen.append(current_run_id())
+        lap("fetch")
+        time.sleep(0.3)
+        return 100.0
+
+    async def main():
+        first = generate_report.execute_report_async(["V2"], send_email=False, use_cache=False)
+        second = generate_report.execute_report_async(["V2"], send_email=False, use_cache=False)
+        return await asyncio.gather(first, second)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BalanceStore(os.path.join(tmp, "balances.db"))
+        path = os.path.join(tmp, "timings.jsonl")
+        with patch('balance_store.balance_store', store), \
+             patch('timings.TIMINGS_PATH', path), \
+             patch('main.login_and_test_v2', v2):
+            began = time.monotonic()
+            first, second = asyncio.run(main())
+            elapsed = time.monotonic() - began
+        store.close()
+        with open(path) as f:
+            records = [json.loads(line) for line in f]
+    print(f"runs {first['run_id']} and {second['run_id']} took {elapsed:.2f}s together")
+    assert first["run_id"] != second["run_id"]
+    assert first["sources"]["V2"]["balance"] == 100.0 and second["sources"]["V2"]["balance"] == 100.0
+    assert elapsed < 0.55, "Both runs should proceed at the same time"
+    assert sorted(seen) == sorted([first["run_id"], second["run_id"]]), "Each extractor should run in its own run"
+    for run in (first, second):
+        stages = sorted(record["stage"] for record in records if record["type"] == "stage" and record["run_id"] == run["run_id"])
+        summaries = [record for record in records if record["type"] == "run_summary" and record["run_id"] == run["run_id"]]
+        assert stages == ["fetch", "total"], f"Run {run['run_id']} should only have its own stages, got {stages}"
+        assert list(summaries[0]["sources"]) == ["V2"]
+
+def test_run_blocking_raises_deadline_exceeded():
+    async def main():
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            try:
+                await run_blocking(time.sleep, 0.5, executor=executor, timeout=0.1)
+            except DeadlineExceeded:
+                return True
+        return False
+    assert asyncio.run(main())
+
+def test_overrunning_browser_source_keeps_its_slot_until_it_returns():
+    # Stands in for driver_pool: the hung extractor holds its browser until its thread returns
+    browser = threading.BoundedSemaphore(1)
+
+    def hung():
+        with browser:
+            time.sleep(0.6)
+        return 1.0
+
+    def quick():
+        if not browser.acquire(timeout=0.3):
+            return None
+        browser.release()
+        return 2.0
+    recorded = {}
+    sources = [BalanceSource("CIMB", hung, cost=COST_BROWSER, timeout=0.1),
+               BalanceSource("VAS", quick, cost=COST_BROWSER, timeout=0.3)]
+    results = asyncio.run(extract_sources(sources, max_workers=2, browser_slots=1,
+                                          on_result=lambda name, *rest: recorded.setdefault(name, rest[-1])))
+    print(f"results: {results!r}, statuses: {recorded}")
+    assert recorded == {"CIMB": "timeout", "VAS": "ok"}, "VAS should only start once the hung browser is gone"
+    assert results["VAS"][0] == 2.0
+
+def test_run_blocking_on_done_after_the_thread_returns_or_the_call_is_dropped():
+    finished = []
+
+    async def main():
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            running = asyncio.ensure_future(run_blocking(time.sleep, 0.3, executor=executor, timeout=0.05,
+                                                         on_done=lambda: finished.append("ran")))
+            queued = asyncio.ensure_future(run_blocking(time.sleep, 0, executor=executor,
+                                                        on_done=lambda: finished.append("dropped")))
+            await asyncio.sleep(0.02)
+            queued.cancel()
+            try:
+                await running
+            except DeadlineExceeded:
+                pass
+            assert finished == ["dropped"], "The running call has not returned yet"
+        return list(finished)
+    assert asyncio.run(main()) == ["dropped", "ran"]
+
+def test_source_with_several_accounts_reports_each_one():
+    recorded = {}
+    sources = [BalanceSource("CIMB", lambda: {"111": "1,000.50", "222": 2000.0}, cost=COST_FILE),
+               BalanceSource("KBANK", lambda: {"333": 5.0, "444": None}, cost=COST_FILE)]
+    results = asyncio.run(extract_sources(sources, 2, 1, timeout=5, convert=generate_report.safe_float,
+                                          on_result=lambda name, balance, *rest: recorded.setdefault(name, (balance, rest[-1]))))
+    print(f"results: {results!r}, recorded: {recorded}")
+    assert results["CIMB"][0] == 3000.5, "The source's balance is the total of its accounts"
+    assert results["KBANK"] == (None, None), "A missing account means no total"
+    assert recorded["CIMB/111"] == (1000.5, "ok") and recorded["CIMB/222"] == (2000.0, "ok")
+    assert recorded["KBANK"] == (None, "failed") and recorded["KBANK/444"] == (None, "failed")
+    assert recorded["KBANK/333"] == (5.0, "ok")
+
+if __name__ == '__main__':
+    test_deadline_starts_when_a_worker_picks_the_task_up()
+    test_deadline_and_extractor_timeouts_are_told_apart()
+    test_cancellation_stops_waiting_and_skips_queued_work()
+    test_one_loop_drives_several_runs()
+    test_run_blocking_raises_deadline_exceeded()
+    test_overrunning_browser_source_keeps_its_slot_until_it_returns()
+    test_run_blocking_on_done_after_the_thread_returns_or_the_call_is_dropped()
+    test_source_with_several_accounts_reports_each_one()
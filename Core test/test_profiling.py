@@ -0,0 +1,75 @@
+import sys
+import os
+import re
+import time
+import tempfile
+import threading
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from unittest.mock import patch
+import profiling
+import timings
+from timings import start_run, end_run, stage, timed_stage, lap
+
+def busy(seconds):
+    deadline = time.thread_time() + seconds
+    while time.thread_time() < deadline:
+        re.sub(r"\d", "#", "account 7013252356")
+
+@timed_stage("FAKE")
+def fake_extractor():
+    lap("login")
+    time.sleep(0.05)  # Waiting on the portal
+    lap("parse")
+    busy(0.05)
+    return 1.0
+
+def test_run_and_stages_are_profiled():
+    with tempfile.TemporaryDirectory() as tmp, \
+         patch('profiling.enabled', True), \
+         patch('profiling.PROFILE_DIR', tmp), \
+         patch('timings.TIMINGS_PATH', os.devnull):
+        run_id = start_run()
+        worker = threading.Thread(target=fake_extractor)
+        worker.start()
+        worker.join()
+        with stage("report", "email"):
+            busy(0.02)
+        end_run()
+        files = sorted(os.listdir(os.path.join(tmp, run_id)))
+        print(files)
+        # report.email ran on the run's own thread, so it is part of report.run
+        assert files == ["FAKE.login.pstats", "FAKE.parse.pstats", "report.run.pstats", "summary.txt"]
+        with open(os.path.join(tmp, run_id, "summary.txt")) as f:
+            summary = f.read()
+        print(summary)
+        assert "Top 15 functions by cumulative time:" in summary
+        assert "busy" in summary and "FAKE.parse" in summary
+
+def test_nested_stage_is_part_of_the_outer_profile():
+    with tempfile.TemporaryDirectory() as tmp, \
+         patch('profiling.enabled', True), \
+         patch('profiling.PROFILE_DIR', tmp):
+        outer = profiling.start("report", "run")
+        assert outer is not None
+        assert profiling.start("report", "email") is None  # One profiler per thread
+        path = profiling.stop(outer, "run-1")
+        assert os.path.basename(path) == "report.run.pstats"
+        # A stage that runs twice in a run gets a second file
+        again = profiling.stop(profiling.start("report", "run"), "run-1")
+        assert os.path.basename(again) == "report.run.2.pstats"
+
+def test_old_runs_are_pruned_and_disabled_is_free():
+    with tempfile.TemporaryDirectory() as tmp, patch('profiling.PROFILE_DIR', tmp):
+        for i in range(5):
+            os.makedirs(os.path.join(tmp, f"run-{i}"))
+            os.utime(os.path.join(tmp, f"run-{i}"), (1000 + i, 1000 + i))
+        assert sorted(profiling.prune(keep=2)) == ["run-0", "run-1", "run-2"]
+        assert sorted(os.listdir(tmp)) == ["run-3", "run-4"]
+        with patch('profiling.enabled', False):
+            assert profiling.start("report", "run") is None
+            assert profiling.finish_run("run-4") is None
+
+if __name__ == '__main__':
+    test_run_and_stages_are_profiled()
+    test_nested_stage_is_part_of_the_outer_profile()
+    test_old_runs_are_pruned_and_disabled_is_free()
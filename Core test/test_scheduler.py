@@ -0,0 +1,121 @@
+import sys
+import os
+import tempfile
+from datetime import datetime, timedelta, time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytz
+from scheduler import DailySchedule, run_scheduler, sleep_until, RUN, RETRY
+
+BANGKOK_TZ = pytz.timezone("Asia/Bangkok")
+
+def bkk(hour, minute=0, day=10):
+    return BANGKOK_TZ.localize(datetime(2026, 3, day, hour, minute))
+
+class FakeClock:
+    """Wall clock that only moves when the scheduler sleeps (stands in for threading.Event)."""
+
+    def __init__(self, start):
+        self.now = start
+        self.stopped = False
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def wait(self, seconds):
+        self.slept.append(seconds)
+        self.now += timedelta(seconds=seconds)
+        return self.stopped
+
+    def is_set(self):
+        return self.stopped
+
+def make_schedule(path=""):
+    return DailySchedule(run_at=time(2, 1), retry_until=time(9, 1), tz=BANGKOK_TZ, state_path=path)
+
+def test_next_due():
+    schedule = make_schedule()
+    assert schedule.next_due(bkk(1, 30)) == (bkk(2, 1), RUN)
+    # Started after 02:01 (restart): catch up immediately
+    assert schedule.next_due(bkk(5, 17)) == (bkk(5, 17), RUN)
+    # After the retry window nothing runs until tomorrow
+    assert schedule.next_due(bkk(10)) == (bkk(2, 1, day=11), RUN)
+
+    schedule.record(bkk(2, 1), success=False)
+    assert schedule.next_due(bkk(2, 30)) == (bkk(3), RETRY)
+    schedule.record(bkk(8), success=False)
+    assert schedule.next_due(bkk(8, 30)) == (bkk(9), RETRY)
+    schedule.record(bkk(9), success=False)
+    assert schedule.next_due(bkk(9, 0)) == (bkk(2, 1, day=11), RUN), "No retry at or after 09:01"
+
+    schedule.record(bkk(2, 1, day=11), success=True)
+    assert schedule.next_due(bkk(2, 2, day=11)) == (bkk(2, 1, day=12), RUN)
+
+def test_state_survives_restart():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "state.json")
+        schedule = make_schedule(path)
+        schedule.record(bkk(2, 1), success=False)
+        # Process restarts at 05:40 after missing the 03:00-05:00 retries
+        restarted = make_schedule(path)
+        assert restarted.retry_pending
+        due, kind = restarted.next_due(bkk(5, 40))
+        assert kind == RETRY and due <= bkk(5, 40), "Missed retry should run straight away"
+
+        restarted.record(bkk(5, 40), success=True)
+        assert make_schedule(path).next_due(bkk(6)) == (bkk(2, 1, day=11), RUN), "No second email after a restart"
+
+def test_sleep_until_follows_clock_jumps():
+    clock = FakeClock(bkk(1))
+    target = bkk(2, 1)
+    original_wait = clock.wait
+
+    def jumpy_wait(seconds):
+        # First sleep: the wall clock is moved 30 minutes forward by NTP
+        if not clock.slept:
+            clock.now += timedelta(minutes=30)
+        return original_wait(seconds)
+    clock.wait = jumpy_wait
+    assert sleep_until(target, clock, clock, max_sleep=60)
+    assert target <= clock.now < target + timedelta(seconds=1)
+    assert len(clock.slept) < 40, "Sleep should shrink after the clock jumped forward"
+
+def test_run_scheduler_runs_and_retries_on_time():
+    clock = FakeClock(bkk(1))
+    runs, events = [], []
+    outcomes = iter([False, False, True])
+
+    def job():
+        runs.append(clock.now)
+        result = next(outcomes)
+        if result:
+            clock.stopped = True
+        return result
+
+    run_scheduler(job, make_schedule(), now_fn=clock, stop_event=clock,
+                  warmup=lambda: events.append(("warmup", clock.now)),
+                  idle=lambda: events.append(("idle", clock.now)))
+    print(f"runs at: {[r.strftime('%H:%M') for r in runs]}, events: {events}")
+    assert runs == [bkk(2, 1), bkk(3), bkk(4)]
+    assert events[0] == ("warmup", bkk(2, 0))
+    assert len(clock.slept) < 200, "Scheduler should sleep in long chunks, not tick every 15 seconds"
+
+def test_failure_after_window_waits_for_tomorrow():
+    clock = FakeClock(bkk(9, 0))
+    runs = []
+
+    def job():
+        runs.append(clock.now)
+        if len(runs) == 2:
+            clock.stopped = True
+        return False
+
+    run_scheduler(job, make_schedule(), now_fn=clock, stop_event=clock)
+    assert runs == [bkk(9, 0), bkk(2, 1, day=11)]
+
+if __name__ == '__main__':
+    test_next_due()
+    test_state_survives_restart()
+    test_sleep_until_follows_clock_jumps()
+    test_run_scheduler_runs_and_retries_on_time()
+    test_failure_after_window_waits_for_tomorrow()
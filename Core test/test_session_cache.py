@@ -0,0 +1,72 @@
+import sys
+import os
+import time
+import tempfile
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from unittest.mock import patch
+from session_cache import SessionCache
+
+URL = "https://portal.example.com/login"
+COOKIES = [{"name": "JSESSIONID", "value": "abc123secret", "domain": "portal.example.com", "path": "/"}]
+
+def cache_in(tmp, name="sessions", **kwargs):
+    # Sessions in <tmp>/<name>, the generated key outside them in <tmp>/keys
+    return SessionCache(directory=os.path.join(tmp, name), key_file=os.path.join(tmp, "keys", f"{name}.key"), **kwargs)
+
+def test_round_trip_is_encrypted():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = cache_in(tmp)
+        assert cache.save("CIMB", URL, COOKIES, {"main_url": "https://portal.example.com/main"})
+        with open(os.path.join(tmp, "sessions", "cimb.session"), "rb") as f:
+            assert b"abc123secret" not in f.read(), "Cookies must not be stored in plain text"
+        entry = cache.load("CIMB", "https://portal.example.com/other/page")
+        assert entry["cookies"][0]["value"] == "abc123secret"
+        assert entry["data"]["main_url"] == "https://portal.example.com/main"
+        assert oct(os.stat(os.path.join(tmp, "keys", "sessions.key")).st_mode & 0o777) == "0o600"
+        assert os.listdir(os.path.join(tmp, "sessions")) == ["cimb.session"], "The key must not sit next to the sessions"
+
+        # A new process with the same key reads it back
+        assert cache_in(tmp).load("CIMB", URL) is not None
+
+def test_key_is_never_kept_in_the_cache_directory():
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = os.path.join(tmp, "sessions")
+        cache = SessionCache(directory=directory, key_file=os.path.join(directory, "key"))
+        assert cache.save("CIMB", URL, COOKIES) is False and cache.enabled is False
+        assert not os.path.exists(os.path.join(directory, "key"))
+
+def test_session_is_bound_to_origin_and_expires():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = cache_in(tmp, ttl=60)
+        cache.save("VAS", URL, COOKIES)
+        assert cache.load("VAS", "http://127.0.0.1:8000/login") is None, "Other portals must not get the session"
+        with patch('session_cache.time.time', return_value=time.time() + 120):
+            assert cache.load("VAS", URL) is None
+        assert not os.path.exists(os.path.join(tmp, "sessions", "vas.session")), "Expired sessions are discarded"
+
+        with patch.dict(os.environ, {"VAS_SESSION_TTL_SECONDS": "600"}):
+            cache.save("VAS", URL, COOKIES)
+            with patch('session_cache.time.time', return_value=time.time() + 120):
+                assert cache.load("VAS", URL) is not None
+
+def test_unusable_entries_mean_no_session():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = cache_in(tmp)
+        assert cache.save("V2", URL, []) is False, "No cookies, nothing to cache"
+        cache.save("V2", URL, COOKIES)
+        with open(os.path.join(tmp, "sessions", "v2.session"), "wb") as f:
+            f.write(b"garbage")
+        assert cache.load("V2", URL) is None
+        assert cache_in(tmp, enabled=False).save("V2", URL, COOKIES) is False
+
+        # Written with another key
+        other = cache_in(tmp, "other")
+        other.save("V2", URL, COOKIES)
+        os.replace(os.path.join(tmp, "other", "v2.session"), os.path.join(tmp, "sessions", "v2.session"))
+        assert cache.load("V2", URL) is None
+
+if __name__ == '__main__':
+    test_round_trip_is_encrypted()
+    test_key_is_never_kept_in_the_cache_directory()
+    test_session_is_bound_to_origin_and_expires()
+    test_unusable_entries_mean_no_session()
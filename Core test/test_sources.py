@@ -0,0 +1,118 @@
+import sys
+import os
+import time
+import asyncio
+from datetime import date
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from unittest.mock import patch
+import sources
+from sources import (BalanceSource, Formula, plan_sources, resolve_sources, register_source,
+                     COST_HTTP, COST_FILE, COST_BROWSER)
+from orchestrator import extract_sources
+from generate_report import render_report
+
+def test_formula_is_parsed_safely():
+    formula = Formula("CIMB - (V2 + VAS)")
+    assert formula.names == ["CIMB", "V2", "VAS"]
+    assert formula.credits == ["CIMB"] and formula.debits == ["V2", "VAS"]
+    assert formula.evaluate({"CIMB": 1000.0, "V2": 100.0, "VAS": 200.0}) == 700.0
+    assert Formula("KBANK + CIMB - 2 * (V2 - -VAS)").evaluate({"KBANK": 1, "CIMB": 10, "V2": 2, "VAS": 1}) == 5
+    for bad in ("__import__('os').system('true')", "CIMB.real", "CIMB if V2 else VAS", "CIMB -", "V2 ** 2"):
+        try:
+            Formula(bad)
+        except ValueError as e:
+            print(f"rejected {bad!r}: {e}")
+        else:
+            raise AssertionError(f"Formula {bad!r} should be rejected")
+
+def test_plan_runs_cheap_sources_first_and_respects_dependencies():
+    plan = plan_sources([
+        BalanceSource("CIMB", None, cost=COST_BROWSER),
+        BalanceSource("VAS", None, cost=COST_BROWSER, depends_on=["SFTP"]),
+        BalanceSource("V2", None, cost=COST_HTTP),
+        BalanceSource("SFTP", None, cost=COST_FILE, depends_on=["CIMB"]),
+    ])
+    assert [s.name for s in plan] == ["V2", "CIMB", "SFTP", "VAS"]
+    try:
+        plan_sources([BalanceSource("A", None, depends_on=["B"]), BalanceSource("B", None, depends_on=["A"])])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Circular dependencies should be rejected")
+
+def test_resolve_adds_dependencies():
+    with patch.dict(sources._registry, clear=False):
+        register_source(BalanceSource("KBANK", lambda: 1.0, cost=COST_HTTP, depends_on=["V2"]))
+        assert [s.name for s in resolve_sources(["KBANK"])] == ["V2", "KBANK"]
+    assert "KBANK" not in sources._registry
+    assert [s.name for s in resolve_sources()] == ["CIMB", "V2", "VAS"]
+
+def test_v2_holds_a_browser_slot_for_its_fallback():
+    # V2 may fall back to a browser, so only V2_EXTRACT_MODE=http makes it a plain HTTP source
+    assert sources.V2_COST == (COST_HTTP if os.getenv("V2_EXTRACT_MODE", "auto").lower() == "http" else COST_BROWSER)
+    assert sources._registry["V2"].cost == sources.V2_COST
+
+def test_browser_sources_are_capped_and_http_goes_first():
+    started = {}
+
+    def extractor(name, delay=0.2):
+        def run():
+            started[name] = time.monotonic()
+            time.sleep(delay)
+            return 1.0
+        return run
+
+    began = time.monotonic()
+    results = asyncio.run(extract_sources([
+        BalanceSource("B1", extractor("B1"), cost=COST_BROWSER),
+        BalanceSource("B2", extractor("B2"), cost=COST_BROWSER),
+        BalanceSource("H1", extractor("H1"), cost=COST_HTTP),
+    ], max_workers=3, browser_slots=1, timeout=5))
+    offsets = {name: round(at - began, 2) for name, at in started.items()}
+    print(f"start offsets: {offsets}")
+    assert all(balance == 1.0 for balance, _ in results.values())
+    # Worker threads race to their first line, so allow a little slack
+    assert started["H1"] <= min(started["B1"], started["B2"]) + 0.05, "HTTP sources should start first"
+    assert abs(started["B2"] - started["B1"]) >= 0.18, "Only one browser source may run at a time"
+
+def test_failed_dependency_skips_dependent():
+    recorded = {}
+    ran = []
+    results = asyncio.run(extract_sources([
+        BalanceSource("LOGIN", lambda: None, cost=COST_HTTP),
+        BalanceSource("REPORT", lambda: ran.append("REPORT") or 1.0, cost=COST_HTTP, depends_on=["LOGIN"]),
+    ], max_workers=2, browser_slots=1, timeout=5, on_result=lambda name, *rest: recorded.setdefault(name, rest[-1])))
+    assert results["REPORT"] == (None, None) and ran == []
+    assert recorded == {"LOGIN": "failed", "REPORT": "skipped"}
+
+def test_report_uses_configured_formula():
+    formula = Formula("CIMB + KBANK - (V2 + VAS)")
+    results = {"CIMB": (1000.0, None), "KBANK": (500.0, None), "V2": (100.0, None), "VAS": (200.0, None)}
+    balances = {name: balance for name, (balance, _) in results.items()}
+    text, html, ok = render_report(results, date(2026, 3, 10), formula, formula.evaluate(balances))
+    print(text)
+    assert ok
+    assert "KBANK Balance: 500.00 THB" in text and "<td>KBANK</td>" in html
+    assert "CIMB + KBANK - (V2 + VAS) = 1,200.00 THB" in text
+    assert "CIMB + KBANK balance is sufficient. Surplus: 1,200.00 THB." in text
+
+def test_division_by_zero_fails_the_reconciliation():
+    formula = Formula("CIMB / (V2 - VAS)")
+    balances = {"CIMB": 1000.0, "V2": 200.0, "VAS": 200.0}
+    reconciliation = formula.evaluate(balances)
+    assert reconciliation is None, "Dividing by zero should not raise"
+    results = {name: (balance, None) for name, balance in balances.items()}
+    text, html, ok = render_report(results, date(2026, 3, 10), formula, reconciliation)
+    print(text)
+    assert not ok, "A report without a reconciliation must not count as complete"
+    assert "could not be evaluated" in text and "ERROR" not in text
+
+if __name__ == '__main__':
+    test_formula_is_parsed_safely()
+    test_plan_runs_cheap_sources_first_and_respects_dependencies()
+    test_resolve_adds_dependencies()
+    test_v2_holds_a_browser_slot_for_its_fallback()
+    test_browser_sources_are_capped_and_http_goes_first()
+    test_failed_dependency_skips_dependent()
+    test_report_uses_configured_formula()
+    test_division_by_zero_fails_the_reconciliation()
@@ -0,0 +1,61 @@
+import sys
+import os
+import json
+import time
+import tempfile
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from unittest.mock import patch
+import timings
+from timings import start_run, end_run, stage, timed_stage, lap
+
+@timed_stage("VAS")
+def fake_extractor():
+    lap("login")
+    time.sleep(0.05)
+    lap("download")
+    time.sleep(0.1)
+    return 123.45
+
+@timed_stage("CIMB")
+def failing_extractor():
+    lap("login")
+    return None
+
+def test_stage_records_and_summary():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "timings.jsonl")
+        with patch('timings.TIMINGS_PATH', path):
+            run_id = start_run()
+            fake_extractor()
+            failing_extractor()
+            with stage("report", "email"):
+                pass
+            summary = end_run()
+        with open(path) as f:
+            records = [json.loads(line) for line in f]
+    print(f"Run summary: {summary}")
+    stages = {(r["source"], r["stage"]): r for r in records if r["type"] == "stage"}
+    assert all(r["run_id"] == run_id for r in records)
+    assert stages[("VAS", "download")]["duration"] >= 0.1
+    assert stages[("VAS", "total")]["ok"] is True
+    assert stages[("CIMB", "login")]["ok"] is False, "Stage where the extractor gave up should be marked failed!"
+    assert records[-1]["type"] == "run_summary"
+    assert summary["slowest_stage"]["source"] == "VAS" and summary["slowest_stage"]["stage"] == "download"
+    assert set(summary["sources"]["VAS"]["stages"]) == {"login", "download"}
+
+def test_run_summary_has_the_logging_queue_counters_of_the_run():
+    before = {"enqueued": 100, "dropped": 2, "blocked": 1, "blocked_seconds": 0.5, "high_water": 40, "depth": 0, "max_size": 10000}
+    after = dict(before, enqueued=130, dropped=5, blocked_seconds=0.75, high_water=60, depth=3)
+    with patch('timings.TIMINGS_PATH', os.devnull), \
+         patch('timings.log_queue_stats', side_effect=[before, after]), \
+         patch('timings.log_warning') as warning:
+        start_run()
+        summary = end_run()
+    print(f"Logging queue during the run: {summary['log_queue']}")
+    assert summary["log_queue"] == {"enqueued": 30, "dropped": 3, "blocked": 0, "blocked_seconds": 0.25,
+                                    "high_water": 60, "depth": 3, "max_size": 10000}
+    assert any("3 dropped" in call.args[0] for call in warning.call_args_list), "Dropped records should be a warning"
+
+if __name__ == '__main__':
+    test_stage_records_and_summary()
+    test_run_summary_has_the_logging_queue_counters_of_the_run()
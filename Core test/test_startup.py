@@ -0,0 +1,40 @@
+import sys
+import os
+import subprocess
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from startup_report import import_breakdown, format_breakdown, PROJECT_DIR
+
+HEAVY_MODULES = ["sendgrid", "openpyxl", "selenium.webdriver.remote.webdriver", "main", "main2", "main3"]
+
+def test_import_is_lazy_and_side_effect_free():
+    check = (
+        "import sys, logger_config, generate_report\n"
+        "assert logger_config.logger is None, 'importing must not set up logging'\n"
+        f"loaded = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+        "assert not loaded, f'heavy modules imported eagerly: {loaded}'\n"
+        "webdriver = [m for m in sys.modules if m == 'selenium.webdriver' or m.startswith('selenium.webdriver.')]\n"
+        "assert not webdriver, f'selenium webdriver imported eagerly: {webdriver}'\n"
+    )
+    completed = subprocess.run([sys.executable, "-c", check], cwd=PROJECT_DIR, capture_output=True, text=True)
+    print(completed.stdout, completed.stderr)
+    assert completed.returncode == 0, completed.stderr
+    assert "Logger initialized" not in completed.stdout
+
+def test_v2_http_path_does_not_load_the_browser_stack():
+    check = ("import sys, main\n"
+             "assert 'selenium.webdriver.remote.webdriver' not in sys.modules\n")
+    completed = subprocess.run([sys.executable, "-c", check], cwd=PROJECT_DIR, capture_output=True, text=True)
+    assert completed.returncode == 0, completed.stderr
+
+def test_import_breakdown():
+    breakdown = import_breakdown("generate_report")
+    print(format_breakdown(breakdown))
+    assert breakdown["total_ms"] > 0
+    names = [entry["name"] for entry in breakdown["direct"]]
+    assert "logger_config" in names and "sendgrid" not in names
+    assert all(set(entry) == {"name", "self_ms", "cumulative_ms"} for entry in breakdown["slowest"])
+
+if __name__ == '__main__':
+    test_import_is_lazy_and_side_effect_free()
+    test_v2_http_path_does_not_load_the_browser_stack()
+    test_import_breakdown()
@@ -0,0 +1,52 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from unittest.mock import MagicMock
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+import waits
+from waits import wait_until, url_contains, text_as_number
+
+def test_wait_returns_as_soon_as_condition_holds():
+    waits.reset_wait_timings()
+    driver = MagicMock()
+    urls = iter(["https://bank/login", "https://bank/login", "https://bank/returnMain"])
+    type(driver).current_url = property(lambda self: next(urls))
+    result = wait_until(driver, url_contains("returnMain"), timeout=5, poll=0.01, label="test.url")
+    print(f"wait_until() result: {result!r}, timings: {waits.wait_timings}")
+    assert result is True
+    assert waits.wait_timings[-1]["label"] == "test.url" and waits.wait_timings[-1]["ok"]
+    assert waits.wait_timings[-1]["seconds"] < 1, "Wait should stop as soon as the URL matches!"
+
+def test_wait_times_out_and_records_failure():
+    waits.reset_wait_timings()
+    try:
+        wait_until(None, lambda target: False, timeout=0.2, poll=0.05, label="test.never")
+        assert False, "Expected TimeoutException"
+    except TimeoutException:
+        pass
+    print(f"Timings after timeout: {waits.wait_timings}")
+    assert waits.wait_timings[-1]["ok"] is False
+
+def test_zero_balance_still_counts_as_a_number():
+    driver = MagicMock()
+    driver.find_element.return_value.text = "Balance: 0.00 THB"
+    result = wait_until(driver, text_as_number(By.XPATH, "//div"), timeout=1, poll=0.01)
+    print(f"text_as_number() result for zero balance: {result!r}")
+    assert result == 0.0
+
+def test_wait_timings_keep_only_recent_waits():
+    waits.reset_wait_timings()
+    driver = MagicMock()
+    driver.current_url = "https://example.com/dashboard"
+    for index in range(waits.WAIT_TIMINGS_KEPT + 5):
+        wait_until(driver, url_contains("dashboard"), timeout=1, poll=0.01, label=f"test.{index}")
+    print(f"{len(waits.wait_timings)} wait timings kept, oldest {waits.wait_timings[0]['label']}")
+    assert len(waits.wait_timings) == waits.WAIT_TIMINGS_KEPT
+    assert waits.wait_timings[0]["label"] == "test.5"
+
+if __name__ == '__main__':
+    test_wait_returns_as_soon_as_condition_holds()
+    test_wait_times_out_and_records_failure()
+    test_zero_balance_still_counts_as_a_number()
+    test_wait_timings_keep_only_recent_waits()
@@ -0,0 +1,100 @@
+import sys
+import os
+import io
+import json
+import tempfile
+from datetime import date
+from contextlib import redirect_stdout
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from unittest.mock import patch, MagicMock
+import cli
+from balance_store import BalanceStore
+
+def run_cli(store, argv, v2, vas, cimb, send=None):
+    out = io.StringIO()
+    with patch('balance_store.balance_store', store), \
+         patch('timings.TIMINGS_PATH', os.devnull), \
+         patch('generate_report.send_report_email', send or MagicMock(return_value=True)), \
+         patch('main.login_and_test_v2', v2), \
+         patch('main2.login_vas', vas), \
+         patch('main3.login_and_get_cimb_balances', cimb), \
+         redirect_stdout(out):
+        code = cli.main(argv)
+    text = out.getvalue()
+    # stdout carries nothing but the JSON summary (logs go to stderr)
+    summary = json.loads(text) if text else None
+    return code, summary
+
+def test_single_source_run_skips_other_banks():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BalanceStore(os.path.join(tmp, "balances.db"))
+        v2, vas, cimb = MagicMock(return_value=100.0), MagicMock(return_value=200.0), MagicMock(return_value=1000.0)
+        send = MagicMock(return_value=True)
+        code, summary = run_cli(store, ["run", "--sources", "v2"], v2, vas, cimb, send)
+        print(json.dumps(summary, indent=2))
+        assert code == cli.EXIT_OK
+        assert list(summary["sources"]) == ["V2"]
+        assert summary["sources"]["V2"]["balance"] == 100.0 and summary["sources"]["V2"]["status"] == "ok"
+        assert summary["formula"] is None and summary["email"] == "not_sent"
+        vas.assert_not_called()
+        cimb.assert_not_called()
+        send.assert_not_called()  # A partial run must not email a report
+        store.close()
+
+def test_full_run_exit_codes():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BalanceStore(os.path.join(tmp, "balances.db"))
+        ok = lambda value: MagicMock(return_value=value)
+        code, summary = run_cli(store, ["run", "--no-cache"], ok(1.0), ok(2.0), ok(5.0))
+        assert code == cli.EXIT_OK and summary["email"] == "sent"
+        assert summary["reconciliation"] == 2.0
+
+        code, summary = run_cli(store, ["run", "--no-cache"], ok(1.0), ok(2.0), ok(5.0), send=MagicMock(return_value=False))
+        assert code == cli.EXIT_EMAIL_FAILED and summary["email"] == "failed"
+
+        code, summary = run_cli(store, ["run", "--no-cache", "--no-email"], ok(1.0), ok(None), ok(5.0))
+        assert code == cli.EXIT_FAILED
+        assert summary["sources"]["VAS"]["status"] == "failed"
+        store.close()
+
+def test_date_is_passed_to_dated_sources():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BalanceStore(os.path.join(tmp, "balances.db"))
+        vas = MagicMock(return_value=200.0)
+        code, summary = run_cli(store, ["run", "--sources", "vas", "--date", "2026-01-05"],
+                                MagicMock(), vas, MagicMock())
+        assert code == cli.EXIT_OK
+        vas.assert_called_once_with(business_date=date(2026, 1, 5))
+        assert summary["business_date"] == "2026-01-05"
+        assert store.value_on("VAS", "2026-01-05") == 200.0
+        store.close()
+
+def test_past_date_with_live_sources_is_not_emailed():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BalanceStore(os.path.join(tmp, "balances.db"))
+        ok = lambda value: MagicMock(return_value=value)
+        send = MagicMock(return_value=True)
+        code, summary = run_cli(store, ["run", "--date", "2026-01-05", "--no-cache"], ok(1.0), ok(2.0), ok(5.0), send)
+        print(json.dumps(summary, indent=2))
+        assert code == cli.EXIT_OK, "Not emailing a mixed report is not an email failure"
+        assert summary["business_date"] == "2026-01-05" and summary["reconciliation"] == 2.0
+        assert summary["email"] == "not_sent"
+        send.assert_not_called()
+        store.close()
+
+def test_bad_arguments_exit_with_usage_code():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BalanceStore(os.path.join(tmp, "balances.db"))
+        v2 = MagicMock(return_value=1.0)
+        assert run_cli(store, ["run", "--sources", "nope"], v2, MagicMock(), MagicMock())[0] == cli.EXIT_USAGE
+        assert run_cli(store, ["run", "--date", "05/01/2026"], v2, MagicMock(), MagicMock())[0] == cli.EXIT_USAGE
+        assert run_cli(store, ["run", "--date", "2999-01-01"], v2, MagicMock(), MagicMock())[0] == cli.EXIT_USAGE
+        v2.assert_not_called()
+        store.close()
+
+if __name__ == '__main__':
+    test_single_source_run_skips_other_banks()
+    test_full_run_exit_codes()
+    test_date_is_passed_to_dated_sources()
+    test_past_date_with_live_sources_is_not_emailed()
+    test_bad_arguments_exit_with_usage_code()
@@ -0,0 +1,67 @@
+import sys
+import os
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from generate_report import extract_balances
+
+def slow_source(value, delay):
+    def extractor():
+        time.sleep(delay)
+        return value
+    return extractor
+
+def test_sources_run_concurrently():
+    start = time.monotonic()
+    results = extract_balances({
+        "V2": slow_source("1,000.50", 0.5),
+        "VAS": slow_source(2000, 0.5),
+        "CIMB": slow_source("5,000", 0.5),
+    }, max_workers=3, timeout=5)
+    elapsed = time.monotonic() - start
+    print(f"extract_balances() results: {results!r} in {elapsed:.2f}s")
+    assert results["V2"][0] == 1000.5
+    assert results["VAS"][0] == 2000.0
+    assert results["CIMB"][0] == 5000.0
+    assert all(extracted_at is not None for _, extracted_at in results.values())
+    assert elapsed < 1.2, "Sources should not run one after another!"
+    print("Test passed: balances extracted concurrently.")
+
+def test_slow_source_times_out():
+    results = extract_balances({
+        "V2": slow_source("100", 0.1),
+        "CIMB": slow_source("5,000", 3),
+    }, max_workers=2, timeout=0.5)
+    print(f"extract_balances() results with slow CIMB: {results!r}")
+    assert results["V2"][0] == 100.0
+    assert results["CIMB"] == (None, None), "Timed out source should be reported as missing!"
+    print("Test passed: slow source timed out without blocking the others.")
+
+def test_results_are_reported_per_source():
+    recorded = []
+    def failing():
+        raise RuntimeError("portal down")
+    extract_balances({
+        "V2": slow_source("100", 0),
+        "VAS": slow_source(None, 0),
+        "CIMB": failing,
+    }, max_workers=3, timeout=5, on_result=lambda *args: recorded.append(args))
+    statuses = {name: status for name, _, _, _, status in recorded}
+    print(f"on_result() calls: {recorded!r}")
+    assert statuses == {"V2": "ok", "VAS": "failed", "CIMB": "error"}
+    assert all(duration is not None and duration >= 0 for _, _, _, duration, _ in recorded)
+
+def test_zero_limits_are_rejected():
+    # 0 used to fall back to the defaults; it is now an error instead of a silent override
+    for kwargs in ({"max_workers": 0, "timeout": 5}, {"max_workers": 2, "timeout": 0}, {"max_workers": 2, "timeout": -1}):
+        try:
+            extract_balances({"V2": slow_source("100", 0)}, **kwargs)
+        except ValueError as e:
+            print(f"extract_balances({kwargs}) rejected: {e}")
+        else:
+            raise AssertionError(f"extract_balances({kwargs}) should raise ValueError")
+
+if __name__ == '__main__':
+    test_sources_run_concurrently()
+    test_slow_source_times_out()
+    test_results_are_reported_per_source()
+    test_zero_limits_are_rejected()
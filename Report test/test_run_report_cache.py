@@ -0,0 +1,102 @@
+import sys
+import os
+import tempfile
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from unittest.mock import patch, MagicMock
+import pytz
+import generate_report
+from balance_store import BalanceStore
+
+BANGKOK_TZ = pytz.timezone("Asia/Bangkok")
+
+def run_with(store, v2, vas, cimb, **kwargs):
+    with patch('balance_store.balance_store', store), \
+         patch('timings.TIMINGS_PATH', os.devnull), \
+         patch('generate_report.SENDGRID_API_KEY', None), \
+         patch('main.login_and_test_v2', v2), \
+         patch('main2.login_vas', vas), \
+         patch('main3.login_and_get_cimb_balances', cimb):
+        return generate_report.run_report(**kwargs)
+
+def test_retry_only_fetches_failed_source():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BalanceStore(os.path.join(tmp, "balances.db"))
+        v2 = MagicMock(return_value=100.0)
+        vas = MagicMock(return_value=200.0)
+        cimb = MagicMock(return_value=None)
+        assert run_with(store, v2, vas, cimb) is False
+
+        cimb.return_value = 1000.0
+        assert run_with(store, v2, vas, cimb) is True, "Retry should complete the report"
+        print(f"calls: V2={v2.call_count} VAS={vas.call_count} CIMB={cimb.call_count}")
+        assert v2.call_count == 1 and vas.call_count == 1, "Cached sources should not be fetched again!"
+        assert cimb.call_count == 2
+
+        # Everything cached: nothing is fetched at all
+        assert run_with(store, v2, vas, cimb) is True
+        assert (v2.call_count, vas.call_count, cimb.call_count) == (1, 1, 2)
+
+        # use_cache=False re-fetches every source
+        assert run_with(store, v2, vas, cimb, use_cache=False) is True
+        assert (v2.call_count, vas.call_count, cimb.call_count) == (2, 2, 3)
+        store.close()
+
+def test_stale_balances_are_fetched_again():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BalanceStore(os.path.join(tmp, "balances.db"))
+        business_date = (datetime.now(BANGKOK_TZ) - timedelta(days=1)).date()
+        old = datetime.now(BANGKOK_TZ) - timedelta(hours=3)
+        for name in ("V2", "VAS", "CIMB"):
+            store.record(name, 1.0, old, business_date)
+        v2, vas, cimb = MagicMock(return_value=1.0), MagicMock(return_value=2.0), MagicMock(return_value=5.0)
+        with patch('generate_report.RUN_CACHE_MAX_AGE_SECONDS', 3600):
+            assert run_with(store, v2, vas, cimb) is True
+        assert (v2.call_count, vas.call_count, cimb.call_count) == (1, 1, 1), "Stale balances must be re-fetched"
+        assert store.value_on("VAS", business_date) == 2.0
+        store.close()
+
+def test_email_sent_only_when_data_is_complete():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BalanceStore(os.path.join(tmp, "balances.db"))
+        with patch('generate_report.send_report_email') as send:
+            assert run_with(store, MagicMock(return_value=1.0), MagicMock(return_value=None), MagicMock(return_value=5.0)) is False
+            send.assert_not_called()
+            assert run_with(store, MagicMock(return_value=1.0), MagicMock(return_value=2.0), MagicMock(return_value=5.0)) is True
+            send.assert_called_once()
+            text, html, business_date = send.call_args[0]
+            assert "CIMB - (V2 + VAS) = 2.00 THB" in text
+        store.close()
+
+def test_each_cimb_account_is_stored_and_reported():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BalanceStore(os.path.join(tmp, "balances.db"))
+        business_date = (datetime.now(BANGKOK_TZ) - timedelta(days=1)).date()
+        v2, vas = MagicMock(return_value=1.0), MagicMock(return_value=2.0)
+        cimb = MagicMock(return_value={"7013252356": 1000.0, "7013999999": None})
+        with patch('generate_report.send_report_email', MagicMock(return_value=True)) as send:
+            assert run_with(store, v2, vas, cimb) is False
+            assert store.latest("CIMB/7013252356", business_date)["value"] == 1000.0
+            assert store.latest("CIMB/7013999999", business_date, status="failed") is not None
+            send.assert_not_called()
+
+            cimb.return_value = {"7013252356": 1000.0, "7013999999": 500.0}
+            assert run_with(store, v2, vas, cimb) is True
+            # Everything cached: the breakdown comes from the store
+            assert run_with(store, v2, vas, cimb) is True
+            assert cimb.call_count == 2
+            assert send.call_count == 2
+            for call in send.call_args_list:
+                text, html, _ = call[0]
+                print(text)
+                assert "CIMB Balance: 1,500.00 THB" in text
+                assert "  CIMB 7013252356: 1,000.00 THB" in text and "  CIMB 7013999999: 500.00 THB" in text
+                assert "CIMB 7013999999</td><td>500.00" in html
+        assert store.accounts_on("CIMB", business_date) == {"7013252356": 1000.0, "7013999999": 500.0}
+        store.close()
+
+if __name__ == '__main__':
+    test_retry_only_fetches_failed_source()
+    test_stale_balances_are_fetched_again()
+    test_email_sent_only_when_data_is_complete()
+    test_each_cimb_account_is_stored_and_reported()
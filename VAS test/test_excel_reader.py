@@ -0,0 +1,39 @@
+import sys
+import os
+import io
+import tempfile
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from openpyxl import Workbook
+from excel_reader import read_cells
+
+def build_report():
+    # Layout like UserAcccountStatReport: labels in column A, balance in B15
+    workbook = Workbook()
+    sheet = workbook.active
+    for row in range(1, 200):
+        sheet.cell(row=row, column=1, value=f"Label {row}")
+        sheet.cell(row=row, column=2, value=row * 10)
+    sheet["B15"] = "1,234,567.89"
+    sheet["C3"] = "Report Date"
+    return workbook
+
+def test_read_named_cells_from_file():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "UserAcccountStatReport_20250605.xlsx")
+        build_report().save(path)
+        values = read_cells(path, {"balance": "B15", "date_label": "C3", "first_label": "A1"})
+        print(f"read_cells() values: {values!r}")
+        assert values == {"balance": "1,234,567.89", "date_label": "Report Date", "first_label": "Label 1"}
+
+def test_read_cells_from_buffer_and_empty_cell():
+    buffer = io.BytesIO()
+    build_report().save(buffer)
+    buffer.seek(0)
+    values = read_cells(buffer, ["B15", "D20"])
+    print(f"read_cells() values from buffer: {values!r}")
+    assert values["B15"] == "1,234,567.89"
+    assert values["D20"] is None, "Empty cell should be read as None!"
+
+if __name__ == '__main__':
+    test_read_named_cells_from_file()
+    test_read_cells_from_buffer_and_empty_cell()
@@ -2,10 +2,10 @@ import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from unittest.mock import patch, MagicMock
-from main2 import setup_driver
+from driver_factory import setup_driver
 
 def test_setup_driver_download_dir():
-    with patch('main2.Options') as MockOptions, patch('main2.webdriver.Chrome') as MockChrome:
+    with patch('driver_factory.Options') as MockOptions, patch('driver_factory.webdriver.Chrome') as MockChrome:
         mock_options = MagicMock()
         MockOptions.return_value = mock_options
         MockChrome.return_value = MagicMock()  # Prevent real Chrome launch
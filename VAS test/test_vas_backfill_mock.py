@@ -0,0 +1,88 @@
+import sys
+import os
+import re
+import tempfile
+import threading
+from datetime import date
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from unittest.mock import patch, MagicMock
+import main2
+from balance_store import BalanceStore
+from benchmark import build_sample_report
+
+MISSING_DAY = "20250603"  # The portal has no report for this date
+
+def fake_vas(download_dir):
+    """A report page whose result row follows the businessDate that was searched."""
+    driver = MagicMock()
+    searched = {"date": None}
+    downloads = []
+
+    def execute_script(script, *args):
+        date_set = re.search(r"'(\d\d)/(\d\d)/(\d{4})'", script)
+        if date_set:
+            day, month, year = date_set.groups()
+            searched["date"] = year + month + day
+            return None
+        # element_snapshot(): every matching element in one call
+        return [{"index": i, "element": e, "text": e.text} for i, e in enumerate(find_elements(args[0], args[1]))]
+    driver.execute_script.side_effect = execute_script
+
+    def find_elements(by, value):
+        if value != "//table//tr":
+            return [MagicMock()]  # Login form and report page elements
+        if searched["date"] in (None, MISSING_DAY):
+            return []
+        return [MagicMock(text=f"UserAcccountStatReport_{searched['date']}.xlsx Report")]
+    driver.find_elements.side_effect = find_elements
+
+    def wait_for_download(directory, pattern, **kwargs):
+        path = os.path.join(download_dir, pattern.replace("*", ""))
+        file_date = pattern.split("_")[1][:8]
+        with open(path, "wb") as f:
+            f.write(build_sample_report(float(file_date[-2:])))  # Balance = day of month
+        downloads.append((file_date, threading.current_thread().name))
+        return path
+    return driver, wait_for_download, downloads
+
+def test_backfill_logs_in_once_and_stores_every_day():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BalanceStore(os.path.join(tmp, "balances.db"))
+        download_dir = os.path.join(tmp, "downloads")
+        driver, wait_for_download, downloads = fake_vas(download_dir)
+        pool = MagicMock()
+        pool.acquire.return_value = driver
+        parse_threads = []
+        real_parse = main2._parse_report
+
+        def parse_report(path, expected_filename):
+            parse_threads.append(threading.current_thread().name)
+            return real_parse(path, expected_filename)
+
+        with patch('balance_store.balance_store', store), \
+             patch('timings.TIMINGS_PATH', os.devnull), \
+             patch('main2.driver_pool', pool), \
+             patch('main2.wait_for_download', side_effect=wait_for_download), \
+             patch('main2._parse_report', side_effect=parse_report), \
+             patch('main2.SEARCH_TIMEOUT', 0.3):
+            results = main2.backfill_vas(date(2025, 6, 1), date(2025, 6, 5), download_dir=download_dir)
+            print(f"Backfill results: {results}")
+            assert results == {date(2025, 6, 1): 1.0, date(2025, 6, 2): 2.0, date(2025, 6, 3): None,
+                               date(2025, 6, 4): 4.0, date(2025, 6, 5): 5.0}
+            pool.acquire.assert_called_once()
+            logins = [call for call in driver.get.call_args_list if call.args[0] == main2.VAS_URL]
+            assert len(logins) == 1, "Backfill should log in once for the whole range"
+            assert all(name.startswith("vas-parse") for name in parse_threads), "Files should be parsed off the browser thread"
+            assert all(not name.startswith("vas-parse") for _, name in downloads)
+            assert store.value_on("VAS", "2025-06-04") == 4.0
+            assert [a["status"] for a in store.attempts("VAS", "2025-06-03")] == ["failed"]
+            assert os.listdir(download_dir) == [], "Parsed files should be deleted"
+
+            # Only the missing date is fetched again
+            pool.acquire.reset_mock()
+            results = main2.backfill_vas(date(2025, 6, 1), date(2025, 6, 5), download_dir=download_dir)
+            assert list(results) == [date(2025, 6, 3)]
+        store.close()
+
+if __name__ == '__main__':
+    test_backfill_logs_in_once_and_stores_every_day()
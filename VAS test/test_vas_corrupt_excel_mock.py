@@ -4,7 +4,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 from unittest.mock import patch, MagicMock
 from main2 import login_vas
 
-@patch('main2.webdriver.Chrome')
+@patch('driver_factory.webdriver.Chrome')
 def test_corrupt_excel(mock_chrome):
     mock_driver = MagicMock()
     # Simulate normal login, navigation, matching row, and download icon
@@ -17,14 +17,14 @@ def test_corrupt_excel(mock_chrome):
     mock_driver.find_elements.return_value = [matching_row]
     mock_chrome.return_value = mock_driver
 
-    # Patch glob.glob to simulate successful download
-    with patch('main2.glob.glob') as mock_glob, \
-         patch('main2.time.sleep') as mock_sleep, \
-         patch('main2.pd.read_excel') as mock_read_excel:
+    # Patch the download watcher to simulate successful download
+    with patch('main2.wait_for_download') as mock_wait_for_download, \
+         patch('waits.time.sleep') as mock_sleep, \
+         patch('main2.read_cells') as mock_read_cells:
         # Simulate downloaded file present
-        mock_glob.side_effect = lambda pattern: ["downloads/UserAcccountStatReport_20250605.xlsx"]
-        # Simulate pandas raising an error when reading Excel
-        mock_read_excel.side_effect = Exception("Corrupted Excel file")
+        mock_wait_for_download.return_value = "downloads/UserAcccountStatReport_20250605.xlsx"
+        # Simulate the workbook reader raising an error when reading Excel
+        mock_read_cells.side_effect = Exception("Corrupted Excel file")
         result = login_vas()
         print(f"login_vas() result with corrupt Excel: {result!r}")  # Expect None
 
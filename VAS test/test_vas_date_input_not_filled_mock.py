@@ -2,10 +2,18 @@ import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from unittest.mock import patch, MagicMock
+import main2
 from main2 import login_vas
 
-@patch('main2.webdriver.Chrome')
-def test_date_input_not_filled(mock_chrome):
+real_wait_until = main2.wait_until
+
+def short_wait(target, condition, timeout=None, **kwargs):
+    # Nothing ever appears on the mocked page, so give up quickly instead of after the real timeouts
+    return real_wait_until(target, condition, timeout=0.2, **kwargs)
+
+@patch('main2.wait_until', side_effect=short_wait)
+@patch('driver_factory.webdriver.Chrome')
+def test_date_input_not_filled(mock_chrome, mock_wait):
     mock_driver = MagicMock()
     # Simulate normal login and navigation
     mock_driver.get.side_effect = lambda url: None
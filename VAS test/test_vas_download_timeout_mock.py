@@ -4,7 +4,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 from unittest.mock import patch, MagicMock
 from main2 import login_vas
 
-@patch('main2.webdriver.Chrome')
+@patch('driver_factory.webdriver.Chrome')
 def test_download_timeout(mock_chrome):
     mock_driver = MagicMock()
     # Simulate normal login and navigation
@@ -19,11 +19,10 @@ def test_download_timeout(mock_chrome):
     mock_driver.find_elements.return_value = [matching_row]
     mock_chrome.return_value = mock_driver
 
-    # Patch glob.glob to simulate .crdownload never disappears
-    with patch('main2.glob.glob') as mock_glob, \
-         patch('main2.time.sleep') as mock_sleep:
-        # Simulate .crdownload file always present
-        mock_glob.side_effect = lambda pattern: ["downloads/UserAcccountStatReport_20250605.xlsx.crdownload"]
+    # Simulate a .crdownload that never disappears: the download watcher gives up
+    with patch('main2.wait_for_download') as mock_wait_for_download, \
+         patch('waits.time.sleep') as mock_sleep:
+        mock_wait_for_download.side_effect = TimeoutError("UserAcccountStatReport_20250605.xlsx.crdownload still present")
         result = login_vas()
         print(f"login_vas() result with download timeout: {result!r}")  # Expect None
 
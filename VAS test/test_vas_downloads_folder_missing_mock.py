@@ -4,7 +4,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 from unittest.mock import patch, MagicMock
 from main2 import login_vas
 
-@patch('main2.webdriver.Chrome')
+@patch('driver_factory.webdriver.Chrome')
 def test_downloads_folder_missing(mock_chrome):
     mock_driver = MagicMock()
     # Simulate normal login and navigation
@@ -19,15 +19,13 @@ def test_downloads_folder_missing(mock_chrome):
 
     # Patch os.makedirs to ensure folder is (re)created without error
     with patch('main2.os.makedirs') as mock_makedirs, \
-         patch('main2.glob.glob') as mock_glob, \
-         patch('main2.time.sleep') as mock_sleep, \
-         patch('main2.pd.read_excel') as mock_read_excel:
+         patch('main2.wait_for_download') as mock_wait_for_download, \
+         patch('waits.time.sleep') as mock_sleep, \
+         patch('main2.read_cells') as mock_read_cells:
         # Simulate folder missing at first, then created
         mock_makedirs.side_effect = lambda path, exist_ok: print(f"[MOCK] os.makedirs called for: {path}")
-        mock_glob.side_effect = lambda pattern: ["downloads/UserAcccountStatReport_20250605.xlsx"]
-        df = MagicMock()
-        df.iloc.__getitem__.return_value = 12345.67  # Simulate valid float in B15
-        mock_read_excel.return_value = df
+        mock_wait_for_download.return_value = "downloads/UserAcccountStatReport_20250605.xlsx"
+        mock_read_cells.return_value = {"balance": 12345.67}  # Simulate valid float in B15
         result = login_vas()
         print(f"login_vas() result with downloads folder missing: {result!r}")  # Expect float value
 
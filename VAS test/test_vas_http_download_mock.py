@@ -0,0 +1,67 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from unittest.mock import patch, MagicMock
+import main2
+from main2 import login_vas
+from benchmark import start_fixture_server
+from session_cache import SessionCache
+
+def fake_vas(base_url, report_date="20250605", href=None):
+    """A logged-in report page whose result row links to the fixture server's download URL."""
+    driver = MagicMock()
+    driver.current_url = f"{base_url}/vas-web/report/amc_all_report/"
+    host = base_url.split("//")[1].split(":")[0]
+    driver.get_cookies.return_value = [{"name": "vas_session", "value": "ok", "domain": host, "path": "/"}]
+    row = MagicMock(text=f"UserAcccountStatReport_{report_date}.xlsx Report")
+    href = href or f"{base_url}/vas-web/report/download?file=UserAcccountStatReport_{report_date}.xlsx"
+
+    def execute_script(script, *args):
+        if "closest" in script:
+            return href  # Download link behind the icon
+        if "//table//tr" in args:
+            return [{"index": 0, "element": row, "text": row.text}]
+        return None
+    driver.execute_script.side_effect = execute_script
+    return driver, row
+
+def test_report_is_fetched_into_memory():
+    server, base_url = start_fixture_server()
+    try:
+        with patch('driver_factory.webdriver.Chrome') as MockChrome, \
+             patch('main2.VAS_URL', f"{base_url}/vas-web/auth/login"), \
+             patch('main2.session_cache', SessionCache(enabled=False)), \
+             patch('main2.wait_until', return_value=True), \
+             patch('main2.wait_for_download') as wait_for_download, \
+             patch('main2.datetime') as mock_datetime:
+            from datetime import datetime
+            mock_datetime.now.return_value = datetime(2025, 6, 6, 2, 1)
+            driver, row = fake_vas(base_url)
+            MockChrome.return_value = driver
+            result = login_vas()
+            print(f"login_vas() over HTTP: {result!r}")
+            assert result == 1234567.89
+            wait_for_download.assert_not_called()  # Nothing was written to disk
+            icon = row.find_element.return_value
+            icon.click.assert_not_called()
+
+            # A download link off the VAS portal is never fetched; the icon is clicked instead
+            driver, row = fake_vas(base_url, href="https://elsewhere.example/report.xlsx")
+            MockChrome.return_value = driver
+            wait_for_download.side_effect = TimeoutError
+            assert login_vas() is None
+            row.find_element.return_value.click.assert_called_once()
+
+            # HTTP-only mode doesn't fall back to the browser download
+            driver, row = fake_vas(base_url, href=f"{base_url}/vas-web/missing.xlsx")
+            MockChrome.return_value = driver
+            wait_for_download.reset_mock()
+            with patch('main2.VAS_DOWNLOAD_MODE', "http"):
+                assert login_vas() is None
+            wait_for_download.assert_not_called()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+if __name__ == '__main__':
+    test_report_is_fetched_into_memory()
@@ -5,7 +5,7 @@ from unittest.mock import patch, MagicMock
 from selenium.common.exceptions import NoSuchElementException
 from main2 import login_vas
 
-@patch('main2.webdriver.Chrome')
+@patch('driver_factory.webdriver.Chrome')
 def test_invalid_login(mock_chrome):
     mock_driver = MagicMock()
     # Simulate login page interaction, then fail to find a post-login element
@@ -5,9 +5,9 @@ from unittest.mock import patch, MagicMock
 from main2 import login_vas
 
 def test_vas_retry_skips_crdownload():
-    with patch('main2.webdriver.Chrome') as MockChrome, \
-         patch('main2.glob.glob') as mock_glob, \
-         patch('main2.time.sleep') as mock_sleep:
+    with patch('driver_factory.webdriver.Chrome') as MockChrome, \
+         patch('main2.wait_for_download') as mock_wait_for_download, \
+         patch('waits.time.sleep') as mock_sleep:
         mock_driver = MagicMock()
         MockChrome.return_value = mock_driver
         # Simulate normal login, navigation, matching row, and download icon
@@ -18,13 +18,8 @@ def test_vas_retry_skips_crdownload():
         download_icon = MagicMock()
         matching_row.find_element.return_value = download_icon
         mock_driver.find_elements.return_value = [matching_row]
-        # Simulate .crdownload file present, no completed file
-        def fake_glob(pattern):
-            if pattern.endswith('.crdownload'):
-                return ["downloads/UserAcccountStatReport_20250605.xlsx.crdownload"]
-            else:
-                return []
-        mock_glob.side_effect = fake_glob
+        # Simulate .crdownload file present, no completed file: the download watcher times out
+        mock_wait_for_download.side_effect = TimeoutError("only UserAcccountStatReport_20250605.xlsx.crdownload found")
         result = login_vas()
         print(f"login_vas() result with persistent .crdownload: {result!r}")  # Expect None after timeout
 
@@ -5,16 +5,19 @@ from unittest.mock import patch, MagicMock
 from selenium.common.exceptions import TimeoutException
 from main2 import login_vas
 
-@patch('main2.webdriver.Chrome')
+@patch('driver_factory.webdriver.Chrome')
 def test_search_timeout(mock_chrome):
     mock_driver = MagicMock()
     # Simulate normal login and navigation up to search
     mock_driver.get.side_effect = lambda url: None
     mock_driver.find_element.side_effect = [MagicMock(), MagicMock(), MagicMock(), MagicMock(), MagicMock(), MagicMock()]
-    # Simulate WebDriverWait timeout when waiting for table
-    with patch('main2.WebDriverWait') as mock_wait:
-        instance = mock_wait.return_value
-        instance.until.side_effect = TimeoutException("Table did not appear in time")
+    # Simulate a wait timeout when waiting for table
+    with patch('main2.wait_until') as mock_wait:
+        def wait_side_effect(target, condition, timeout=None, poll=None, label=None):
+            if label == "vas.search_results":
+                raise TimeoutException("Table did not appear in time")
+            return True
+        mock_wait.side_effect = wait_side_effect
         mock_chrome.return_value = mock_driver
         result = login_vas()
         print(f"login_vas() result with search timeout: {result!r}")  # Expect None
@@ -0,0 +1,237 @@
+import os
+import sqlite3
+import threading
+from datetime import date, datetime
+import pytz
+# Import our custom logger
+from logger_config import log_debug, log_warning
+from sources import account_source
+
+# Every extraction (successful or not) is kept in a local SQLite file
+BALANCE_DB_PATH = os.getenv("BALANCE_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "balances.db"))
+BANGKOK_TZ = pytz.timezone("Asia/Bangkok")
+
+STATUS_OK = "ok"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS extractions (
+    id            INTEGER PRIMARY KEY,
+    run_id        TEXT,
+    source        TEXT NOT NULL,
+    business_date TEXT NOT NULL,  -- YYYY-MM-DD the balance belongs to
+    extracted_at  TEXT NOT NULL,  -- ISO timestamp, Asia/Bangkok
+    extracted_ts  REAL NOT NULL,  -- same instant as epoch seconds, for ordering
+    value         REAL,
+    duration      REAL,
+    status        TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_extractions_source_date ON extractions (source, business_date, extracted_ts);
+CREATE INDEX IF NOT EXISTS idx_extractions_date ON extractions (business_date, source);
+"""
+_COLUMNS = "run_id, source, business_date, extracted_at, value, duration, status"
+
+def _date_str(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.astimezone(BANGKOK_TZ).date().isoformat() if value.tzinfo else value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return date.fromisoformat(value).isoformat()
+
+def _row(row):
+    if row is None:
+        return None
+    record = dict(row)
+    record["extracted_at"] = datetime.fromisoformat(record["extracted_at"])
+    return record
+
+class BalanceStore:
+    """
+    Indexed history of balance extractions.
+
+    Rows are keyed by (source, business_date); a business date can have several
+    attempts and the latest successful one is "the" balance for that day.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or BALANCE_DB_PATH
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+            log_debug(f"Balance store opened at {self.path}")
+        return self._conn
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def record(self, source, value, extracted_at=None, business_date=None, duration=None, status=STATUS_OK, run_id=None):
+        """Store one extraction attempt. `business_date` defaults to the date of `extracted_at`. Returns the row id."""
+        extracted_at = extracted_at or datetime.now(BANGKOK_TZ)
+        if extracted_at.tzinfo is None:
+            extracted_at = BANGKOK_TZ.localize(extracted_at)
+        business_date = _date_str(business_date) or _date_str(extracted_at)
+        with self._lock:
+            cursor = self._connect().execute(
+                "INSERT INTO extractions (run_id, source, business_date, extracted_at, extracted_ts, value, duration, status) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, source, business_date, extracted_at.isoformat(), extracted_at.timestamp(),
+                 value, round(duration, 3) if duration is not None else None, status))
+            return cursor.lastrowid
+
+    def latest(self, source, business_date=None, status=STATUS_OK):
+        """Most recent extraction of `source` (on `business_date` if given) with `status` (None = any)."""
+        sql = f"SELECT {_COLUMNS} FROM extractions WHERE source = ?"
+        params = [source]
+        if business_date is not None:
+            sql += " AND business_date = ?"
+            params.append(_date_str(business_date))
+        if status is not None:
+            sql += " AND status = ?"
+            params.append(status)
+        sql += " ORDER BY business_date DESC, extracted_ts DESC LIMIT 1"
+        rows = self._query(sql, params)
+        return _row(rows[0]) if rows else None
+
+    def value_on(self, source, business_date):
+        """The balance of `source` for `business_date` (latest successful extraction), or None."""
+        record = self.latest(source, business_date)
+        return record["value"] if record else None
+
+    def history(self, source=None, start=None, end=None, status=STATUS_OK):
+        """
+        Extractions between business dates `start` and `end` (inclusive, either may be
+        None), oldest first. Only the latest matching attempt per source and day is returned.
+        """
+        where, params = [], []
+        if source is not None:
+            where.append("source = ?")
+            params.append(source)
+        if start is not None:
+            where.append("business_date >= ?")
+            params.append(_date_str(start))
+        if end is not None:
+            where.append("business_date <= ?")
+            params.append(_date_str(end))
+        if status is not None:
+            where.append("status = ?")
+            params.append(status)
+        clause = f"WHERE {' AND '.join(where)}" if where else ""
+        # SQLite returns the bare columns from the row holding MAX(extracted_ts)
+        sql = (f"SELECT {_COLUMNS}, MAX(extracted_ts) AS extracted_ts FROM extractions {clause} "
+               "GROUP BY source, business_date ORDER BY business_date, source")
+        records = []
+        for row in self._query(sql, params):
+            record = _row(row)
+            del record["extracted_ts"]
+            records.append(record)
+        return records
+
+    def attempts(self, source=None, business_date=None):
+        """Every attempt (any status) for a source and/or business date, oldest first."""
+        where, params = [], []
+        if source is not None:
+            where.append("source = ?")
+            params.append(source)
+        if business_date is not None:
+            where.append("business_date = ?")
+            params.append(_date_str(business_date))
+        clause = f"WHERE {' AND '.join(where)}" if where else ""
+        return [_row(row) for row in self._query(
+            f"SELECT {_COLUMNS} FROM extractions {clause} ORDER BY extracted_ts", params)]
+
+    def accounts_on(self, source, business_date):
+        """
+        {account: balance} stored as "<source>/<account>" (see sources.account_source) by the run that produced the
+        latest balance of `source` for `business_date` ({} if it has none).
+        """
+        current = self.latest(source, business_date)
+        if current is None or current["run_id"] is None:
+            return {}
+        prefix = account_source(source, "")
+        rows = self._query(
+            "SELECT source, value, MAX(extracted_ts) AS extracted_ts FROM extractions "
+            "WHERE business_date = ? AND run_id = ? AND substr(source, 1, ?) = ? GROUP BY source ORDER BY source",
+            (current["business_date"], current["run_id"], len(prefix), prefix))
+        return {row["source"][len(prefix):]: row["value"] for row in rows}
+
+    def day_over_day(self, source, business_date=None):
+        """
+        Change in `source` between `business_date` (default: the latest day with a balance)
+        and the previous day that has one. Returns None if there is no balance for the day.
+        """
+        current = self.latest(source, business_date)
+        if current is None:
+            return None
+        rows = self._query(
+            f"SELECT {_COLUMNS} FROM extractions WHERE source = ? AND business_date < ? AND status = ? "
+            "ORDER BY business_date DESC, extracted_ts DESC LIMIT 1",
+            (source, current["business_date"], STATUS_OK))
+        previous = _row(rows[0]) if rows else None
+        return {
+            "source": source,
+            "business_date": current["business_date"],
+            "value": current["value"],
+            "previous_date": previous["business_date"] if previous else None,
+            "previous_value": previous["value"] if previous else None,
+            "delta": round(current["value"] - previous["value"], 2) if previous else None,
+        }
+
+# Shared store used by the report
+balance_store = BalanceStore()
+
+def cached_balances(sources, business_date, max_age, now=None):
+    """
+    Successful balances already stored for `business_date` that are at most `max_age`
+    seconds old, as {source: (value, extracted_at)}. Sources without a fresh balance are
+    left out, so the caller only re-fetches those. Store errors mean "nothing cached".
+    """
+    now = now or datetime.now(BANGKOK_TZ)
+    cached = {}
+    for source in sources:
+        try:
+            record = balance_store.latest(source, business_date)
+        except (sqlite3.Error, OSError) as e:
+            log_warning(f"Could not read cached balances from {balance_store.path}: {e}")
+            return {}
+        if record is None or record["value"] is None:
+            continue
+        age = (now - record["extracted_at"]).total_seconds()
+        if 0 <= age <= max_age:
+            cached[source] = (record["value"], record["extracted_at"])
+        else:
+            log_debug(f"Cached {source} balance is {age / 60:.0f} min old; fetching it again.")
+    return cached
+
+def stored_accounts(source, business_date):
+    """BalanceStore.accounts_on() on the shared store; store errors mean no accounts."""
+    try:
+        return balance_store.accounts_on(source, business_date)
+    except (sqlite3.Error, OSError) as e:
+        log_warning(f"Could not read stored {source} accounts from {balance_store.path}: {e}")
+        return {}
+
+def record_extraction(source, value, extracted_at=None, business_date=None, duration=None, status=STATUS_OK, run_id=None):
+    """Write to the shared store without ever failing the caller (the report must still go out)."""
+    try:
+        return balance_store.record(source, value, extracted_at, business_date, duration, status, run_id)
+    except (sqlite3.Error, OSError) as e:
+        log_warning(f"Could not record {source} balance in {balance_store.path}: {e}")
+        return None
@@ -0,0 +1,382 @@
+import os
+import io
+import sys
+import json
+import time
+import glob
+import argparse
+import tempfile
+import resource
+import statistics
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+from openpyxl import Workbook
+# Import our custom logger
+from logger_config import init_logging, log_info, log_success, log_warning, log_error
+import timings
+import main
+import main2
+import main3
+from driver_factory import driver_pool
+from session_cache import session_cache
+from process_tree import process_tree_rss
+from sources import get_source, account_total
+
+# Benchmark the real extractors against recorded pages served from a local HTTP server.
+# Usage: python benchmark.py --repeat 5 --sources v2,vas --output bench.json
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "fixtures")
+CIMB_LOGIN_PAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cimb_login.html")
+SAMPLE_INTERVAL = float(os.getenv("BENCH_SAMPLE_INTERVAL_SECONDS", "0.05"))
+
+# Credentials and values the fixture server expects / serves
+BENCH_USERNAME = "agent@example.com"
+BENCH_PASSWORD = "secret"
+V2_FORM_TOKEN = "k3VtQ9mS2bXo7rPzYcLw1aEfGh4jKuN8"
+CIMB_COMPANY_ID = "IPPSCORP"
+CIMB_ACCOUNT_NUMBERS = ["7013252356", "7013252364"]  # Both accounts on the fixture Account Summary
+VAS_BALANCE = 1234567.89
+
+# CLI source key -> registered BalanceSource name (also the timing source name)
+SOURCES = {"v2": "V2", "vas": "VAS", "cimb": "CIMB"}
+
+def build_sample_report(balance=VAS_BALANCE):
+    """A UserAcccountStatReport-shaped workbook with the balance in B15."""
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet["A1"] = "User Account Statistic Report"
+    for row in range(3, 15):
+        sheet.cell(row=row, column=1, value=f"Agent {row - 2}")
+        sheet.cell(row=row, column=2, value=round(1000.0 * row, 2))
+    sheet["A15"] = "Total"
+    sheet["B15"] = balance
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Serves the recorded V2, VAS and CIMB pages with just enough login/session behaviour."""
+
+    report_bytes = b""
+
+    def _send(self, body, content_type="text/html; charset=utf-8", headers=None):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_file(self, path, content_type="text/html; charset=utf-8"):
+        with open(path, "rb") as f:
+            self._send(f.read(), content_type)
+
+    def _send_fixture(self, name, content_type="text/html; charset=utf-8"):
+        self._send_file(os.path.join(FIXTURES_DIR, name), content_type)
+
+    def _redirect(self, location, cookie=None):
+        self.send_response(302)
+        self.send_header("Location", location)
+        if cookie:
+            self.send_header("Set-Cookie", cookie)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _has_cookie(self, cookie):
+        return cookie in self.headers.get("Cookie", "")
+
+    def _form(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return parse_qs(self.rfile.read(length).decode())
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        path = url.path
+        # V2 agent portal
+        if path == "/agents/login":
+            self._send_fixture("v2_login.html")
+        elif path == "/agents/dashboard":
+            if self._has_cookie("v2_session=ok"):
+                self._send_fixture("v2_dashboard.html")
+            else:
+                self._redirect("/agents/login")
+        # VAS back office
+        elif path == "/vas-web/auth/login":
+            self._send_fixture("vas_login.html")
+        elif not self._has_cookie("vas_session=ok") and path.startswith("/vas-web/"):
+            self._redirect("/vas-web/auth/login")
+        elif path == "/vas-web/home":
+            self._send_fixture("vas_home.html")
+        elif path == "/vas-web/report/amc_all_report/":
+            self._send_fixture("vas_report.html")
+        elif path == "/vas-web/report/download":
+            filename = os.path.basename(query.get("file", ["report.xlsx"])[0])
+            self._send(self.report_bytes,
+                       "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                       {"Content-Disposition": f'attachment; filename="{filename}"'})
+        # CIMB BizChannel
+        elif path == "/corp/common2/login.do":
+            action = query.get("action", ["loginRequest"])[0]
+            if action == "returnMain" and self._has_cookie("cimb_session=ok"):
+                self._send_fixture("cimb_frameset.html")
+            elif action == "logout":
+                self._redirect("/corp/common2/login.do?action=loginRequest", cookie="cimb_session=; Path=/; Max-Age=0")
+            else:
+                self._send_file(CIMB_LOGIN_PAGE, "text/html; charset=iso-8859-1")
+        elif path == "/corp/combined.js.h-264428027.pack":
+            self._send_fixture("cimb_login_stub.js", "application/javascript")
+        elif path in ("/corp/top.html", "/corp/menu.html", "/corp/welcome.html"):
+            self._send_fixture("cimb_" + path.rsplit("/", 1)[1])
+        elif path == "/corp/front/accountsummary.do" and self._has_cookie("cimb_session=ok"):
+            self._send_fixture("cimb_account_summary.html")
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        form = self._form()
+        if path == "/agents/login":
+            if (form.get("_token") == [V2_FORM_TOKEN] and
+                    form.get("email") == [BENCH_USERNAME] and form.get("password") == [BENCH_PASSWORD]):
+                self._redirect("/agents/dashboard", cookie="v2_session=ok; Path=/; HttpOnly")
+            else:
+                self._redirect("/agents/login")
+        elif path == "/vas-web/auth/login":
+            if form.get("username") == [BENCH_USERNAME] and form.get("password") == [BENCH_PASSWORD]:
+                self._redirect("/vas-web/home", cookie="vas_session=ok; Path=/; HttpOnly")
+            else:
+                self._redirect("/vas-web/auth/login")
+        elif path == "/corp/common2/login.do":
+            if form.get("corpId") == [CIMB_COMPANY_ID] and form.get("passwordEncryption") == [BENCH_PASSWORD]:
+                self._redirect("/corp/common2/login.do?action=returnMain", cookie="cimb_session=ok; Path=/; HttpOnly")
+            else:
+                self._redirect("/corp/common2/login.do?action=loginRequest")
+        else:
+            self.send_error(404)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_fixture_server(host="127.0.0.1", port=0):
+    """Start the fixture server in a daemon thread. Returns (server, base_url)."""
+    FixtureHandler.report_bytes = build_sample_report()
+    server = ThreadingHTTPServer((host, port), FixtureHandler)
+    threading.Thread(target=server.serve_forever, name="bench-fixtures", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+def configure_sources(base_url, fixture_credentials=True):
+    """Point the extractors at `base_url` and, for the built-in fixtures, give them the fixture credentials."""
+    main.V2_URL = f"{base_url}/agents/login"
+    main2.VAS_URL = f"{base_url}/vas-web/auth/login"
+    main2.VAS_REPORT_URL = f"{base_url}/vas-web/report/amc_all_report/"
+    main3.CIMB_URL = f"{base_url}/corp/common2/login.do?action=loginRequest"
+    if fixture_credentials:
+        main.USERNAME, main.PASSWORD = BENCH_USERNAME, BENCH_PASSWORD
+        main2.VAS_USERNAME, main2.VAS_PASSWORD = BENCH_USERNAME, BENCH_PASSWORD
+        main3.CIMB_COMPANY_ID, main3.CIMB_USERNAME, main3.CIMB_PASSWORD = CIMB_COMPANY_ID, BENCH_USERNAME, BENCH_PASSWORD
+        main3.CIMB_ACCOUNT_NUMBERS = CIMB_ACCOUNT_NUMBERS
+
+class RssSampler(threading.Thread):
+    """Samples process-tree RSS while a source runs and keeps the peak overall and per active stage."""
+
+    def __init__(self, source, interval=SAMPLE_INTERVAL):
+        super().__init__(name=f"rss-{source}", daemon=True)
+        self.source = source
+        self.interval = interval
+        self.peak = 0
+        self.stage_peaks = {}
+        self._stop_event = threading.Event()
+        self._proc = os.path.isdir("/proc")
+
+    def sample(self):
+        if self._proc:
+            rss = process_tree_rss()
+        else:
+            # ru_maxrss is in KiB on Linux and bytes on macOS; only the peak is available
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+        self.peak = max(self.peak, rss)
+        stage = timings.active_stages().get(self.source)
+        if stage:
+            self.stage_peaks[stage] = max(self.stage_peaks.get(stage, 0), rss)
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.sample()
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.sample()
+
+def _cpu_seconds():
+    # This process plus reaped children (chromedriver/Chrome once they have exited)
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+def _clean_downloads(directory="downloads"):
+    for path in glob.glob(os.path.join(directory, "UserAcccountStatReport_*")):
+        try:
+            os.remove(path)
+        except OSError as e:
+            log_warning(f"Could not remove benchmark download {path}: {e}")
+
+def run_once(key):
+    """Run one extractor once and return its wall time, CPU, peak RSS and per-stage figures."""
+    source = SOURCES[key]
+    extractor = get_source(source).extract
+    timings.start_run(f"bench-{key}-{time.strftime('%H%M%S')}")
+    sampler = RssSampler(source)
+    sampler.start()
+    cpu_started = _cpu_seconds()
+    started = time.perf_counter()
+    error = None
+    value = None
+    try:
+        value = extractor()
+        if isinstance(value, dict):
+            value = account_total(value)  # CIMB: the total of its accounts, as in the report
+    except Exception as e:
+        error = str(e)
+    wall = time.perf_counter() - started
+    cpu = _cpu_seconds() - cpu_started
+    sampler.stop()
+    records = timings.run_records()
+    timings.end_run()
+    if key == "vas":
+        _clean_downloads()
+
+    stages = {}
+    for record in records:
+        if record["source"] != source or record["stage"] == "total":
+            continue
+        data = stages.setdefault(record["stage"], {"wall": 0.0, "cpu": 0.0})
+        data["wall"] += record["duration"]
+        data["cpu"] += record["cpu"] or 0.0
+    for name, data in stages.items():
+        # Stages shorter than the sample interval may have no sample of their own
+        peak = sampler.stage_peaks.get(name)
+        data["peak_rss_mb"] = round(peak / 2**20, 1) if peak else None
+    return {
+        "ok": value is not None,
+        "value": value,
+        "error": error,
+        "wall": wall,
+        "cpu": cpu,
+        "peak_rss_mb": round(sampler.peak / 2**20, 1),
+        "stages": stages,
+    }
+
+def _stats(values):
+    values = [value for value in values if value is not None]
+    if not values:
+        return None
+    return {
+        "min": round(min(values), 3),
+        "median": round(statistics.median(values), 3),
+        "mean": round(statistics.fmean(values), 3),
+        "max": round(max(values), 3),
+    }
+
+def summarize(runs):
+    """Collapse a list of run_once() results into min/median/mean/max per metric and per stage."""
+    stage_names = []
+    for run in runs:
+        stage_names.extend(name for name in run["stages"] if name not in stage_names)
+    return {
+        "runs": len(runs),
+        "ok": sum(1 for run in runs if run["ok"]),
+        "errors": sorted({run["error"] for run in runs if run["error"]}),
+        "values": [run["value"] for run in runs],
+        "wall": _stats([run["wall"] for run in runs]),
+        "cpu": _stats([run["cpu"] for run in runs]),
+        "peak_rss_mb": _stats([run["peak_rss_mb"] for run in runs]),
+        "stages": {
+            name: {
+                metric: _stats([run["stages"][name][metric] for run in runs if name in run["stages"]])
+                for metric in ("wall", "cpu", "peak_rss_mb")
+            }
+            for name in stage_names
+        },
+    }
+
+def run_benchmark(sources=("v2", "vas", "cimb"), repeat=3, base_url=None, warm_pool=False):
+    """
+    Run each source `repeat` times (one at a time, so RSS and CPU can be attributed)
+    against the local fixture server, or against `base_url` if given. Returns the report dict.
+    """
+    unknown = [key for key in sources if key not in SOURCES]
+    if unknown:
+        raise ValueError(f"Unknown source(s): {', '.join(unknown)} (choose from {', '.join(SOURCES)})")
+    server = None
+    if base_url is None:
+        server, base_url = start_fixture_server()
+    configure_sources(base_url, fixture_credentials=server is not None)
+    # Keep benchmark stages out of the production timings file
+    timings_path, timings.TIMINGS_PATH = timings.TIMINGS_PATH, os.devnull
+    # Every run measures a full login; cached sessions would skip it after the first
+    sessions_enabled, session_cache.enabled = session_cache.enabled, False
+    # The first CIMB run learns the Account Summary URL, the rest load it directly (as in production)
+    shortcut_dir = tempfile.TemporaryDirectory()
+    shortcut_path, main3.CIMB_SHORTCUT_PATH = main3.CIMB_SHORTCUT_PATH, os.path.join(shortcut_dir.name, "cimb_shortcut.json")
+    if warm_pool:
+        driver_pool.open(warm=1)
+    try:
+        results = {}
+        for key in sources:
+            runs = []
+            for i in range(repeat):
+                run = run_once(key)
+                log_info(f"Benchmark {key} #{i + 1}: {run['wall']:.2f}s wall, {run['cpu']:.2f}s CPU, "
+                         f"{run['peak_rss_mb']:.0f} MB peak RSS, ok={run['ok']}")
+                runs.append(run)
+            results[key] = summarize(runs)
+        return {
+            "base_url": base_url,
+            "repeat": repeat,
+            "warm_pool": warm_pool,
+            "extract_mode": {"v2": main.V2_EXTRACT_MODE},
+            "sources": results,
+        }
+    finally:
+        if warm_pool:
+            driver_pool.close()
+        timings.TIMINGS_PATH = timings_path
+        session_cache.enabled = sessions_enabled
+        main3.CIMB_SHORTCUT_PATH = shortcut_path
+        shortcut_dir.cleanup()
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+def main_cli(argv=None):
+    init_logging(console=sys.stderr)  # stdout is for the JSON report
+    parser = argparse.ArgumentParser(description="Benchmark the balance extractors against recorded pages.")
+    parser.add_argument("--sources", default=",".join(SOURCES), help="comma-separated sources (default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per source (default: 3)")
+    parser.add_argument("--base-url", help="benchmark against this server instead of the built-in fixtures")
+    parser.add_argument("--warm-pool", action="store_true", help="keep a warm browser in the pool between runs")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    sources = [key.strip().lower() for key in args.sources.split(",") if key.strip()]
+    try:
+        report = run_benchmark(sources, repeat=args.repeat, base_url=args.base_url, warm_pool=args.warm_pool)
+    except ValueError as e:
+        log_error(str(e))
+        return 2
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+        log_success(f"Benchmark report written to {args.output}")
+    else:
+        print(output)
+    return 0 if all(data["ok"] == data["runs"] for data in report["sources"].values()) else 1
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,10 @@
+// Stand-in for /corp/combined.js: just enough of the portal's login script to submit the recorded form
+var checkLoad = "";
+function doLogin(form, event) {
+    if (event && event.keyCode === 13) { onLoginClick(); }
+}
+function onLoginClick() {
+    var form = document.forms["LoginActionForm"];
+    form.onsubmit = null;
+    form.submit();
+}
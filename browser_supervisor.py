@@ -0,0 +1,248 @@
+import os
+import time
+import signal
+import atexit
+import threading
+import weakref
+# Import our custom logger
+from logger_config import log_debug, log_info, log_warning, log_error
+from process_tree import descendants, cmdline, parent, alive
+
+# Keeps track of every Chrome session the pool starts. Each browser is tagged with its
+# owner's pid on the command line, gets a hard lifetime, and is quit with a deadline;
+# whatever survives (or is left behind by a crashed or killed process) is killed by
+# process tree so headless Chrome can't pile up across scheduler runs.
+BROWSER_MAX_LIFETIME = float(os.getenv("BROWSER_MAX_LIFETIME_SECONDS", "1800"))
+SUPERVISOR_INTERVAL = float(os.getenv("BROWSER_SUPERVISOR_INTERVAL_SECONDS", "15"))
+# How long driver.quit() may take before the browser's processes are killed instead
+QUIT_TIMEOUT = float(os.getenv("BROWSER_QUIT_TIMEOUT_SECONDS", "10"))
+# Between SIGTERM and SIGKILL
+KILL_GRACE_SECONDS = 2.0
+
+# Chrome ignores switches it doesn't know, so this only labels the process for reap_orphans()
+BROWSER_MARKER = "--daily-float-report-owner"
+
+def marker_argument():
+    return f"{BROWSER_MARKER}={os.getpid()}"
+
+def _owner(pid):
+    # Owner pid from "--daily-float-report-owner=<pid>", or None for an unmarked process
+    for argument in cmdline(pid):
+        if argument.startswith(BROWSER_MARKER + "="):
+            try:
+                return int(argument.split("=", 1)[1])
+            except ValueError:
+                return None
+    return None
+
+def kill_tree(pid, grace=KILL_GRACE_SECONDS):
+    """SIGTERM `pid` and all its descendants, then SIGKILL whatever is still running after `grace`. Returns the pids signalled."""
+    pids = [p for p in [pid] + descendants(pid) if p != os.getpid() and alive(p)]
+    for p in pids:
+        try:
+            os.kill(p, signal.SIGTERM)
+        except OSError:
+            pass
+    deadline = time.monotonic() + grace
+    while time.monotonic() < deadline and any(alive(p) for p in pids):
+        time.sleep(0.05)
+    for p in pids:
+        if alive(p):
+            try:
+                os.kill(p, signal.SIGKILL)
+            except OSError:
+                pass
+        try:
+            os.waitpid(p, os.WNOHANG)  # Reap our own children (chromedriver) so they don't linger as zombies
+        except (ChildProcessError, OSError):
+            pass
+    return pids
+
+def driver_pid(driver):
+    """The chromedriver pid behind a WebDriver (Chrome runs under it), or None."""
+    pid = getattr(getattr(getattr(driver, "service", None), "process", None), "pid", None)
+    return pid if isinstance(pid, int) else None
+
+class BrowserSupervisor:
+    """
+    Registry of the browsers this process started. A watchdog thread (running while any
+    browser is open) kills sessions older than `max_lifetime`; `on_expire(driver)` lets
+    the pool drop an expired idle browser first. quit() never hangs for more than
+    QUIT_TIMEOUT and kills the browser's process tree if it survives the quit.
+    """
+
+    def __init__(self, max_lifetime=None, interval=None, on_expire=None):
+        self.max_lifetime = BROWSER_MAX_LIFETIME if max_lifetime is None else max_lifetime
+        self.interval = SUPERVISOR_INTERVAL if interval is None else interval
+        self.on_expire = on_expire
+        self._lock = threading.Lock()
+        self._browsers = {}  # driver -> {"source", "pid", "started"}
+        self._retired = weakref.WeakSet()  # Killed by expire() but possibly still handed out
+        self._starting = 0
+        self._watchdog = None
+        self.stats = {"started": 0, "quit": 0, "expired": 0, "killed_trees": 0, "orphans_reaped": 0}
+
+    def starting(self):
+        """Call before launching a browser, so reap_orphans() doesn't take it for a leak before track()."""
+        with self._lock:
+            self._starting += 1
+
+    def track(self, driver, source):
+        with self._lock:
+            self._starting = max(0, self._starting - 1)
+            if driver is None:
+                return
+            self._browsers[driver] = {"source": source, "pid": driver_pid(driver), "started": time.monotonic()}
+            self.stats["started"] += 1
+            if self._watchdog is None or not self._watchdog.is_alive():
+                self._watchdog = threading.Thread(target=self._watch, name="browser-supervisor", daemon=True)
+                self._watchdog.start()
+
+    def assign(self, driver, source):
+        """Record which source is using a (pooled) browser now."""
+        with self._lock:
+            if driver in self._browsers:
+                self._browsers[driver]["source"] = source
+
+    def open_browsers(self):
+        """[{"source", "pid", "age"}] for every browser still open."""
+        now = time.monotonic()
+        with self._lock:
+            return [{"source": r["source"], "pid": r["pid"], "age": round(now - r["started"], 1)}
+                    for r in self._browsers.values()]
+
+    def quit(self, driver):
+        """Quit `driver` (giving up after QUIT_TIMEOUT) and kill whatever is left of its process tree."""
+        with self._lock:
+            if driver in self._retired:
+                # expire() already killed it; its pid may belong to another process by now
+                self._retired.discard(driver)
+                log_debug("Browser was already killed by the supervisor; not quitting it again.")
+                return
+            record = self._browsers.pop(driver, None)
+        self._close(driver, record["pid"] if record else driver_pid(driver))
+
+    def _close(self, driver, pid):
+        # Chrome is re-parented once chromedriver exits, so find the tree before quitting
+        tree = [pid] + descendants(pid) if pid else []
+        errors = []
+
+        def _quit():
+            try:
+                driver.quit()
+            except Exception as e:
+                errors.append(e)
+        quitter = threading.Thread(target=_quit, name="browser-quit", daemon=True)
+        quitter.start()
+        quitter.join(QUIT_TIMEOUT)
+        if quitter.is_alive():
+            log_warning(f"Browser quit did not finish within {QUIT_TIMEOUT:.0f}s; killing its processes.")
+        elif errors:
+            log_error(f"Could not quit browser: {errors[0]}")
+        survivors = [p for p in tree if alive(p)]
+        if survivors:
+            log_warning(f"Browser left {len(survivors)} process(es) running after quit; killing them.")
+            for p in survivors:
+                kill_tree(p)
+        with self._lock:
+            if survivors:
+                self.stats["killed_trees"] += 1
+            self.stats["quit"] += 1
+
+    def expire(self):
+        """Kill every browser older than max_lifetime. Returns how many were killed."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [(driver, record) for driver, record in self._browsers.items()
+                       if now - record["started"] > self.max_lifetime]
+            # Retired, so the pool's later release of an in-use one doesn't quit or kill it again
+            for driver, _ in expired:
+                del self._browsers[driver]
+                self._retired.add(driver)
+        for driver, record in expired:
+            log_error(f"Browser for {record['source']} has been open {now - record['started']:.0f}s "
+                      f"(limit {self.max_lifetime:.0f}s); killing it.")
+            if self.on_expire is not None:
+                self.on_expire(driver)
+            self._close(driver, record["pid"])
+            with self._lock:
+                self.stats["expired"] += 1
+        return len(expired)
+
+    def _watch(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.expire()
+            except Exception as e:
+                log_warning(f"Browser supervisor check failed: {e}")
+            with self._lock:
+                if not self._browsers:
+                    self._watchdog = None
+                    return
+
+    def reap_orphans(self):
+        """
+        Kill marked Chrome trees whose owner process is gone (a crashed or killed run), and
+        ones this process started but no longer tracks. Returns the root pids reaped.
+        """
+        if not os.path.isdir("/proc"):
+            return []
+        with self._lock:
+            starting = self._starting
+            tracked = [record["pid"] for record in self._browsers.values() if record["pid"]]
+        own_tree = set(tracked)
+        for pid in tracked:
+            own_tree.update(descendants(pid))
+        marked = {}
+        for entry in os.listdir("/proc"):
+            if entry.isdigit():
+                owner = _owner(int(entry))
+                if owner is not None:
+                    marked[int(entry)] = owner
+        reaped = []
+        for pid, owner in marked.items():
+            if parent(pid) in marked or pid in own_tree:
+                continue  # Part of a tree handled through its root, or a browser we still use
+            if owner == os.getpid():
+                if starting:
+                    continue  # Possibly a browser that is being started right now
+            elif alive(owner):
+                continue  # Another running instance's browser
+            root = pid
+            launcher = parent(pid)
+            # Take chromedriver down with it (its parent) unless it is still ours and tracked
+            if launcher and launcher != os.getpid() and any("chromedriver" in part for part in cmdline(launcher)[:1]):
+                root = launcher
+            log_warning(f"Reaping leaked browser process tree {root} (owner {owner}).")
+            kill_tree(root)
+            reaped.append(root)
+        with self._lock:
+            self.stats["orphans_reaped"] += len(reaped)
+        return reaped
+
+    def report(self):
+        """Log and return the counters plus the browsers still open (leaks if nothing should be running)."""
+        still_open = self.open_browsers()
+        with self._lock:
+            stats = dict(self.stats)
+        report = dict(stats, open=still_open)
+        log_info(f"Browser supervisor: {stats['started']} started, {stats['quit']} quit, "
+                 f"{stats['expired']} killed after {self.max_lifetime:.0f}s, "
+                 f"{stats['killed_trees']} left processes behind, {stats['orphans_reaped']} orphan tree(s) reaped, "
+                 f"{len(still_open)} still open.")
+        for browser in still_open:
+            log_debug(f"Open browser: {browser['source']} (pid {browser['pid']}, {browser['age']:.0f}s old)")
+        return report
+
+    def shutdown(self):
+        """Quit every browser still tracked (e.g. at exit); each one is reported as a leak."""
+        with self._lock:
+            leaked = list(self._browsers.items())
+        for driver, record in leaked:
+            log_warning(f"Browser for {record['source']} was never released; quitting it at exit.")
+            self.quit(driver)
+
+# Shared supervisor for the browser pool
+browser_supervisor = BrowserSupervisor()
+atexit.register(browser_supervisor.shutdown)
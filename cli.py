@@ -0,0 +1,147 @@
+import sys
+import json
+import argparse
+import asyncio
+from datetime import date
+# Import our custom logger
+from logger_config import init_logging, log_error, log_success
+import profiling
+from sources import registered_sources
+from generate_report import execute_report_async, default_business_date, run_schedule
+
+# Command-line entry point:
+#   python cli.py run [--sources v2,vas] [--date YYYY-MM-DD] [--no-email] [--no-cache] [--output FILE] [--profile]
+#   python cli.py schedule [--profile]
+#   python cli.py backfill-vas --start YYYY-MM-DD [--end YYYY-MM-DD] [--force] [--output FILE] [--profile]
+#   python cli.py bench [benchmark.py options]
+
+# Exit codes
+EXIT_OK = 0
+EXIT_FAILED = 1       # A requested balance (or backfill date) could not be extracted
+EXIT_USAGE = 2        # Bad arguments (unknown source, invalid date)
+EXIT_EMAIL_FAILED = 3 # Every balance is in but the email did not go out
+
+def parse_sources(text):
+    """Map "v2,vas" to registered source names (case-insensitive). Raises ValueError for unknown names."""
+    known = {source.name.lower(): source.name for source in registered_sources()}
+    names = []
+    for key in (part.strip().lower() for part in text.split(",")):
+        if not key:
+            continue
+        if key not in known:
+            raise ValueError(f"Unknown source {key!r} (choose from {', '.join(sorted(known))})")
+        if known[key] not in names:
+            names.append(known[key])
+    if not names:
+        raise ValueError("--sources needs at least one source")
+    return names
+
+def parse_date(text):
+    try:
+        business_date = date.fromisoformat(text)
+    except ValueError:
+        raise ValueError(f"Invalid --date {text!r} (expected YYYY-MM-DD)") from None
+    if business_date > default_business_date():
+        raise ValueError(f"--date {text} has no closed business day yet")
+    return business_date
+
+def exit_code(summary, send_email):
+    if not summary["ok"]:
+        return EXIT_FAILED
+    if send_email and summary["formula"] is not None and summary["email"] == "failed":
+        return EXIT_EMAIL_FAILED
+    return EXIT_OK
+
+def write_json(data, path, label):
+    output = json.dumps(data, indent=2)
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+        log_success(f"{label} written to {path}")
+    else:
+        print(output)
+
+def run_command(args):
+    try:
+        names = parse_sources(args.sources) if args.sources else None
+        business_date = parse_date(args.date) if args.date else None
+    except ValueError as e:
+        log_error(str(e))
+        return EXIT_USAGE
+
+    summary = asyncio.run(execute_report_async(
+        names, business_date, send_email=not args.no_email, use_cache=not args.no_cache))
+    write_json(summary, args.output, "Run summary")
+    return exit_code(summary, not args.no_email)
+
+def backfill_vas_command(args):
+    try:
+        start = parse_date(args.start)
+        end = parse_date(args.end) if args.end else default_business_date()
+    except ValueError as e:
+        log_error(str(e))
+        return EXIT_USAGE
+    if start > end:
+        log_error(f"--start {start} is after --end {end}")
+        return EXIT_USAGE
+
+    # The VAS extractor (and Selenium) is only loaded for this command
+    from main2 import backfill_vas
+    results = backfill_vas(start, end, skip_existing=not args.force)
+    write_json({day.isoformat(): value for day, value in results.items()}, args.output, "Backfill summary")
+    return EXIT_OK if None not in results.values() else EXIT_FAILED
+
+def schedule_command(args):
+    try:
+        run_schedule()
+    except KeyboardInterrupt:
+        pass
+    return EXIT_OK
+
+def bench_command(args):
+    # The benchmark's fixture server and samplers are only needed here
+    import benchmark
+    return benchmark.main_cli(args.bench_args)
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="Daily float report.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run the report once and print a JSON summary")
+    run.add_argument("--sources", help="comma-separated sources to extract, e.g. v2,vas (default: all; "
+                                       "a partial run is not reconciled or emailed)")
+    run.add_argument("--date", help="business date YYYY-MM-DD (default: yesterday, Asia/Bangkok)")
+    run.add_argument("--no-email", action="store_true", help="do not send the email")
+    run.add_argument("--no-cache", action="store_true", help="re-fetch balances already stored for the date")
+    run.add_argument("--output", help="write the JSON summary here instead of stdout")
+    run.set_defaults(handler=run_command)
+
+    schedule = commands.add_parser("schedule", help="run the daily scheduler (what generate_report.py does)")
+    schedule.set_defaults(handler=schedule_command)
+
+    backfill = commands.add_parser("backfill-vas", help="store the VAS balance for a range of business dates (one login)")
+    backfill.add_argument("--start", required=True, help="first business date YYYY-MM-DD")
+    backfill.add_argument("--end", help="last business date YYYY-MM-DD (default: yesterday)")
+    backfill.add_argument("--force", action="store_true", help="fetch dates that already have a stored balance too")
+    backfill.add_argument("--output", help="write the JSON summary here instead of stdout")
+    backfill.set_defaults(handler=backfill_vas_command)
+
+    for command in (run, schedule, backfill):
+        command.add_argument("--profile", action="store_true",
+                             help="write cProfile stats per run and stage (same as PROFILE_RUNS=1)")
+
+    bench = commands.add_parser("bench", help="benchmark the extractors (options as for benchmark.py)", add_help=False)
+    bench.add_argument("bench_args", nargs=argparse.REMAINDER)
+    bench.set_defaults(handler=bench_command)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    # stdout carries the JSON summary, so console logs go to stderr (the scheduler keeps PM2's stdout log)
+    init_logging(console=sys.stdout if args.command == "schedule" else sys.stderr)
+    if getattr(args, "profile", False):
+        profiling.enabled = True
+    return args.handler(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+import re
+from selenium.webdriver.common.by import By
+# Import our custom logger
+from logger_config import log_debug
+
+# Read many elements in one WebDriver round trip: a single execute_script returns the
+# text, requested attributes and position of every match (plus the element itself, so
+# the caller can still click it) instead of one .text / .get_attribute call per element.
+
+_SNAPSHOT_JS = """
+var by = arguments[0], value = arguments[1], attributes = arguments[2], elements = [];
+if (by === "xpath") {
+    var found = document.evaluate(value, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    for (var i = 0; i < found.snapshotLength; i++) elements.push(found.snapshotItem(i));
+} else if (by === "tag name") {
+    elements = Array.prototype.slice.call(document.getElementsByTagName(value));
+} else {
+    // "css selector" as is; id, name and class name become CSS the way find_elements does it
+    var selector = value;
+    if (by === "class name") selector = "." + CSS.escape(value);
+    else if (by === "id" || by === "name") selector = "[" + by + '="' + value.replace(/["\\\\]/g, "\\\\$&") + '"]';
+    elements = Array.prototype.slice.call(document.querySelectorAll(selector));
+}
+return elements.map(function (element, index) {
+    var box = element.getBoundingClientRect();
+    var item = {index: index, element: element, x: Math.round(box.left), y: Math.round(box.top),
+                text: (element.innerText || element.textContent || "").trim()};
+    attributes.forEach(function (name) { item[name] = element.getAttribute(name); });
+    return item;
+});
+"""
+# Locators the script above understands (the same ones find_elements turns into CSS itself)
+SUPPORTED_BY = (By.XPATH, By.CSS_SELECTOR, By.ID, By.NAME, By.CLASS_NAME, By.TAG_NAME)
+
+def element_snapshot(driver, by, value, attributes=()):
+    """
+    Every element matching (by, value) in the current frame as a list of dicts:
+    {"index", "element", "text", "x", "y", <each attribute>}. The lookup runs in the page
+    in one call; if the page can't run the script, the elements are read one by one as
+    before. Raises ValueError for a `by` not in SUPPORTED_BY (e.g. By.LINK_TEXT).
+    """
+    if by not in SUPPORTED_BY:
+        raise ValueError(f"element_snapshot() does not support {by!r} (use one of {', '.join(SUPPORTED_BY)})")
+    try:
+        snapshot = driver.execute_script(_SNAPSHOT_JS, by, value, list(attributes))
+    except Exception as e:
+        log_debug(f"In-page snapshot of {value} failed ({e}); reading elements one by one.")
+        snapshot = None
+    if isinstance(snapshot, list):
+        return snapshot
+    items = []
+    for index, element in enumerate(driver.find_elements(by, value)):
+        text = element.text
+        item = {"index": index, "element": element, "text": text.strip() if isinstance(text, str) else "", "x": None, "y": None}
+        for name in attributes:
+            item[name] = element.get_attribute(name)
+        items.append(item)
+    return items
+
+# Leading account number of an account-summary link, e.g. "7013252356 /THB   Some Company"
+ACCOUNT_NUMBER = re.compile(r"\s*(\d[\d-]{5,}\d)")
+
+def normalize_account(number):
+    return number.replace("-", "").strip()
+
+def account_index(anchors):
+    """
+    {account number: snapshot of the link after it} for an account-summary page, where each
+    account link is followed by its balance link. Numbers are stored without dashes.
+    """
+    index = {}
+    for position, anchor in enumerate(anchors[:-1]):
+        match = ACCOUNT_NUMBER.match(anchor["text"])
+        if match:
+            index.setdefault(normalize_account(match.group(1)), anchors[position + 1])
+    return index
@@ -0,0 +1,157 @@
+import os
+import time
+import errno
+import select
+import struct
+import fnmatch
+import zipfile
+import ctypes
+import ctypes.util
+# Import our custom logger
+from logger_config import log_debug, log_warning
+
+# Suffixes browsers use while a download is still being written
+PARTIAL_SUFFIXES = (".crdownload", ".part", ".tmp", ".download")
+
+# Adaptive polling (used when inotify is not available)
+MIN_POLL = 0.05
+MAX_POLL = 1.0
+
+# inotify constants from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0x00000800
+IN_CLOEXEC = 0x00080000
+_EVENT_HEADER = struct.Struct("iIII")
+
+class _Inotify:
+    """Minimal inotify wrapper (Linux only) that wakes up when files in a directory change."""
+
+    def __init__(self, directory):
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if self._libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, f"inotify_add_watch failed for {directory}")
+
+    def wait(self, timeout):
+        """Block until something changes in the directory or `timeout` passes. Returns True on change."""
+        readable, _, _ = select.select([self.fd], [], [], max(0, timeout))
+        if not readable:
+            return False
+        # Drain the queued events; we only need to know that something happened
+        while True:
+            try:
+                data = os.read(self.fd, 64 * (_EVENT_HEADER.size + 256))
+            except OSError as e:
+                if e.errno == errno.EAGAIN:
+                    break
+                raise
+            if not data:
+                break
+        return True
+
+    def close(self):
+        os.close(self.fd)
+
+def _open_inotify(directory):
+    if os.name != "posix" or not os.path.isdir(directory):
+        return None
+    try:
+        return _Inotify(directory)
+    except (OSError, AttributeError) as e:
+        log_debug(f"inotify unavailable for {directory} ({e}); using adaptive polling.")
+        return None
+
+def is_valid_xlsx(path):
+    """
+    An .xlsx is a zip: check the local file header and that the central directory is complete.
+    `path` may also be a seekable file-like object (e.g. a report downloaded into memory).
+    """
+    try:
+        if hasattr(path, "read"):
+            path.seek(0)
+            valid = path.read(4) == b"PK\x03\x04" and zipfile.is_zipfile(path)
+            path.seek(0)
+            return valid
+        with open(path, "rb") as f:
+            if f.read(4) != b"PK\x03\x04":
+                return False
+        return zipfile.is_zipfile(path)
+    except OSError:
+        return False
+
+def _candidates(directory, pattern, since):
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return []
+    names = {entry.name for entry in entries}
+    found = []
+    for entry in entries:
+        if not entry.is_file() or entry.name.endswith(PARTIAL_SUFFIXES):
+            continue
+        if any(entry.name + suffix in names for suffix in PARTIAL_SUFFIXES):
+            continue  # Chrome pre-creates the final name while the .crdownload is still growing
+        if not fnmatch.fnmatch(entry.name, pattern):
+            continue
+        stat = entry.stat()
+        if since is not None and stat.st_mtime < since:
+            continue
+        found.append((entry.path, stat.st_size))
+    return found
+
+def wait_for_download(directory, pattern="*", timeout=30, since=None, stable_for=0.3, validate=None):
+    """
+    Wait until a file matching `pattern` has finished downloading into `directory`
+    and return its path. A file counts as finished once it has no partial-download
+    companion, its size has not changed for `stable_for` seconds and `validate(path)`
+    (if given, e.g. is_valid_xlsx) passes. Uses inotify where available and falls
+    back to adaptive polling. Raises TimeoutError after `timeout` seconds.
+    """
+    start = time.monotonic()
+    deadline = start + timeout
+    watcher = _open_inotify(directory)
+    interval = MIN_POLL
+    seen = {}  # path -> (size, monotonic time the size was first seen)
+    try:
+        while True:
+            now = time.monotonic()
+            changed = False
+            pending = False
+            for path, size in _candidates(directory, pattern, since):
+                previous = seen.get(path)
+                if previous is None or previous[0] != size:
+                    seen[path] = (size, now)
+                    changed = True
+                    pending = True
+                elif size > 0 and now - previous[1] >= stable_for:
+                    if validate is None or validate(path):
+                        log_debug(f"[WAIT] download {os.path.basename(path)} complete after {now - start:.2f}s "
+                                  f"({'inotify' if watcher else 'polling'})")
+                        return path
+                    pending = True  # Size is stable but content is not valid yet; keep watching
+                else:
+                    pending = True
+
+            remaining = deadline - now
+            if remaining <= 0:
+                raise TimeoutError(f"No finished download matching {pattern} in {directory} after {timeout:.0f}s")
+            if watcher is not None:
+                # Re-check stability without an event if a candidate is waiting to settle
+                watcher.wait(min(remaining, stable_for if pending else remaining))
+            else:
+                interval = MIN_POLL if changed else min(interval * 2, MAX_POLL)
+                time.sleep(min(interval, stable_for if pending else interval, remaining))
+    finally:
+        if watcher is not None:
+            try:
+                watcher.close()
+            except OSError as e:
+                log_warning(f"Could not close inotify watcher: {e}")
@@ -0,0 +1,229 @@
+import os
+import threading
+# Import our custom logger
+from logger_config import log_info, log_debug, log_success, log_error, log_warning
+from browser_supervisor import browser_supervisor, marker_argument, driver_pid
+
+# Maximum number of Chrome processes (idle + in use) the pool will run at once
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "3"))
+# How long a source waits for a free browser before giving up
+BROWSER_ACQUIRE_TIMEOUT = float(os.getenv("BROWSER_ACQUIRE_TIMEOUT_SECONDS", "300"))
+
+def _import_selenium():
+    # Selenium's webdriver stack is imported when the first browser starts, so runs that
+    # never need one (V2 over HTTP, cached balances) don't pay for it
+    global webdriver, Options
+    if "webdriver" not in globals():
+        from selenium import webdriver
+    if "Options" not in globals():
+        from selenium.webdriver.chrome.options import Options
+
+def __getattr__(name):
+    # driver_factory.webdriver / driver_factory.Options (e.g. as patch targets) load Selenium on first access
+    if name in ("webdriver", "Options"):
+        _import_selenium()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Setup Chrome WebDriver (shared by all extractors)
+def setup_driver(download_dir=None):
+    _import_selenium()
+    options = Options()
+    options.add_argument("--headless")  # Enable headless mode
+    options.add_argument("--window-size=1920,1080")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+
+    # Set up Chrome preferences
+    prefs = {
+        "credentials_enable_service": False,
+        "profile.password_manager_enabled": False,
+        "profile.password_manager_leak_detection": False
+    }
+    if download_dir:
+        prefs["download.default_directory"] = os.path.abspath(download_dir)
+        prefs["download.prompt_for_download"] = False
+        prefs["directory_upgrade"] = True
+        prefs["safebrowsing.enabled"] = True
+    options.add_experimental_option("prefs", prefs)
+
+    # Optional: disable the popup warning UI entirely
+    options.add_argument("--disable-notifications")
+    options.add_argument("--disable-infobars")
+    options.add_argument("--disable-popup-blocking")
+    # Tag the browser with this process's pid so a leaked one can be found after a crash
+    options.add_argument(marker_argument())
+
+    return webdriver.Chrome(options=options)
+
+def start_tracked_driver(source, download_dir=None):
+    """setup_driver() registered with the browser supervisor (lifetime limit, leak reaping)."""
+    browser_supervisor.starting()
+    driver = None
+    try:
+        driver = setup_driver(download_dir=download_dir)
+        return driver
+    finally:
+        browser_supervisor.track(driver, source)
+
+class DriverPool:
+    """
+    Pool of warm Chrome sessions shared by the extractors.
+
+    While the pool is open, released browsers have their cookies and cache cleared
+    and are handed to the next source instead of being quit. While it is closed,
+    acquire() starts a throwaway browser and release() quits it, as before.
+    """
+
+    def __init__(self, max_size=BROWSER_POOL_SIZE, supervisor=None):
+        self.max_size = max_size
+        self.supervisor = supervisor or browser_supervisor
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._idle = []
+        self._in_use = {}
+        self._open_count = 0
+
+    @property
+    def is_open(self):
+        return self._open_count > 0
+
+    def open(self, warm=0):
+        """Open the pool (reentrant) and optionally pre-start `warm` browsers."""
+        with self._lock:
+            self._open_count += 1
+            first_open = self._open_count == 1
+        if first_open:
+            # Browsers left behind by a crashed or killed earlier run
+            self.supervisor.reap_orphans()
+        if warm:
+            self.warm(warm)
+
+    def close(self):
+        """Close one level of open(); the last close quits every idle browser."""
+        with self._lock:
+            self._open_count = max(0, self._open_count - 1)
+            if self._open_count:
+                return
+            idle, self._idle = self._idle, []
+        for driver in idle:
+            self._quit(driver)
+        if idle:
+            log_info(f"Browser pool closed. Quit {len(idle)} idle browser(s).")
+        self.supervisor.report()
+
+    def warm(self, count):
+        """Start up to `count` browsers in parallel so the next sources skip Chrome startup."""
+        with self._lock:
+            count = min(count, self.max_size - len(self._idle) - len(self._in_use))
+        if count <= 0:
+            return
+        started = []
+
+        def _start():
+            try:
+                started.append(start_tracked_driver("warm"))
+            except Exception as e:
+                log_warning(f"Could not pre-start browser: {e}")
+
+        threads = [threading.Thread(target=_start, name=f"warm-{i}") for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with self._lock:
+            self._idle.extend(started)
+        log_success(f"Browser pool warmed with {len(started)} browser(s).")
+
+    def acquire(self, source, download_dir=None, timeout=None):
+        """Hand out a clean browser for `source`, waiting for a free slot if the pool is at capacity."""
+        timeout = BROWSER_ACQUIRE_TIMEOUT if timeout is None else timeout
+        if not self._slots.acquire(timeout=timeout):
+            from selenium.common.exceptions import WebDriverException
+            raise WebDriverException(f"No browser available for {source} after {timeout:.0f}s (pool size {self.max_size})")
+        try:
+            driver = None
+            with self._lock:
+                if self.is_open and self._idle:
+                    driver = self._idle.pop()
+            if driver is not None:
+                log_debug(f"Reusing warm browser for {source}.")
+                self.supervisor.assign(driver, source)
+                if download_dir:
+                    self._set_download_dir(driver, download_dir)
+            else:
+                driver = start_tracked_driver(source, download_dir=download_dir)
+            with self._lock:
+                self._in_use[driver] = source
+            return driver
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, driver):
+        """Return a browser to the pool (cookies reset) or quit it if the pool is closed or it is broken."""
+        with self._lock:
+            source = self._in_use.pop(driver, None)
+        if source is None:
+            log_warning("Released a browser that was not handed out by the pool.")
+            self._quit(driver)
+            return
+        try:
+            if self.is_open and self._reset(driver):
+                with self._lock:
+                    self._idle.append(driver)
+                log_debug(f"Browser from {source} returned to pool.")
+            else:
+                self._quit(driver)
+        finally:
+            self._slots.release()
+
+    def discard_idle(self, driver):
+        """Take an idle browser out of the pool (the supervisor is about to kill it). True if it was idle."""
+        with self._lock:
+            if driver in self._idle:
+                self._idle.remove(driver)
+                return True
+        return False
+
+    def browser_pids(self):
+        """{source: chromedriver pid} for the browsers handed out right now (Chrome runs under chromedriver)."""
+        with self._lock:
+            in_use = list(self._in_use.items())
+        pids = {}
+        for driver, source in in_use:
+            pid = driver_pid(driver)
+            if pid is not None:
+                pids[source] = pid
+        return pids
+
+    def _reset(self, driver):
+        # Give the next source a fresh context: no cookies, cache or open pages from the last one
+        try:
+            for handle in driver.window_handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(driver.window_handles[0])
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+            driver.get("about:blank")
+            return True
+        except Exception as e:
+            log_warning(f"Could not reset browser for reuse, quitting it: {e}")
+            return False
+
+    def _set_download_dir(self, driver, download_dir):
+        driver.execute_cdp_cmd("Browser.setDownloadBehavior", {
+            "behavior": "allow",
+            "downloadPath": os.path.abspath(download_dir),
+        })
+
+    def _quit(self, driver):
+        # Quit with a deadline; processes that survive it are killed
+        self.supervisor.quit(driver)
+
+# Shared pool used by all extractors
+driver_pool = DriverPool()
+# An expired idle browser must not be handed out again; one in use fails its source, which releases it
+browser_supervisor.on_expire = driver_pool.discard_idle
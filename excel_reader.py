@@ -0,0 +1,42 @@
+def read_cells(source, cells, sheet=None):
+    """
+    Read a few cells from an .xlsx file (path or file-like object) in a single
+    streaming pass. `cells` is either a list of addresses (["B15"]) or a mapping of
+    names to addresses ({"balance": "B15"}); the result is keyed the same way.
+    Rows after the last requested cell are never parsed.
+    """
+    # openpyxl is imported on first use so importing the VAS extractor stays cheap
+    from openpyxl import load_workbook
+    from openpyxl.utils.cell import coordinate_from_string, column_index_from_string
+
+    if not isinstance(cells, dict):
+        cells = {address: address for address in cells}
+    if not cells:
+        return {}
+
+    # Resolve "B15" -> (15, 2) once, then only scan the bounding box of the requested cells
+    positions = {}
+    for name, address in cells.items():
+        column, row = coordinate_from_string(address.upper())
+        positions[name] = (row, column_index_from_string(column))
+    min_row = min(row for row, _ in positions.values())
+    max_row = max(row for row, _ in positions.values())
+    min_col = min(col for _, col in positions.values())
+    max_col = max(col for _, col in positions.values())
+
+    wanted = {}
+    for name, position in positions.items():
+        wanted.setdefault(position, []).append(name)
+
+    values = {name: None for name in cells}
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet] if sheet else workbook.active
+        rows = worksheet.iter_rows(min_row=min_row, max_row=max_row, min_col=min_col, max_col=max_col, values_only=True)
+        for row_number, row in enumerate(rows, start=min_row):
+            for col_number, value in enumerate(row, start=min_col):
+                for name in wanted.get((row_number, col_number), ()):
+                    values[name] = value
+    finally:
+        workbook.close()
+    return values
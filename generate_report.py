@@ -1,30 +1,37 @@
 import os
-import certifi
-# Patch for SSL certificate errors with SendGrid
-os.environ['SSL_CERT_FILE'] = certifi.where()
-os.environ['REQUESTS_CA_BUNDLE'] = certifi.where()
-# If you still get SSL errors, try running this script with Python 3.10–3.12, as some newer/older versions may have SSL bugs.
+import glob
 from dotenv import load_dotenv
-import sendgrid
-from sendgrid.helpers.mail import Mail
-import schedule
-import time as time_module
 from datetime import datetime, timedelta, time
 import pytz
 import logging
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 # Import our custom logger
-from logger_config import log_info, log_debug, log_success, log_error, log_warning, log_wait
-
-# Import the real extraction functions
-from main import login_and_test_v2
-from main2 import login_vas
-from main3 import login_and_get_cimb_balance
+from logger_config import init_logging, log_info, log_debug, log_success, log_error, log_warning, log_wait
+from driver_factory import driver_pool, BROWSER_POOL_SIZE
+from timings import start_run, end_run, stage, over_memory_budget
+import memory_monitor
+from scheduler import DailySchedule, run_scheduler
+from balance_store import record_extraction, cached_balances, stored_accounts
+from orchestrator import extract_sources, run_blocking
+# The balance sources (V2, VAS, CIMB) and the reconciliation formula live in sources.py
+from sources import as_sources, resolve_sources, reconciliation_formula, COST_BROWSER, ACCOUNT_SEPARATOR
 
 load_dotenv()
 SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY")
 FROM_EMAIL = os.getenv("SENDGRID_FROM_EMAIL")
 TO_EMAIL = [email.strip() for email in os.getenv("SENDGRID_TO_EMAIL", "").split(",") if email.strip()]
 
+BANGKOK_TZ = pytz.timezone("Asia/Bangkok")
+
+# Concurrent extraction settings (set EXTRACT_MAX_WORKERS=1 to extract one source at a time)
+EXTRACT_MAX_WORKERS = int(os.getenv("EXTRACT_MAX_WORKERS", "3"))
+EXTRACT_TIMEOUT_SECONDS = float(os.getenv("EXTRACT_TIMEOUT_SECONDS", "300"))
+# Balances already extracted for the business date are reused by retries while younger than this (0 = always re-fetch)
+RUN_CACHE_MAX_AGE_SECONDS = float(os.getenv("RUN_CACHE_MAX_AGE_SECONDS", "28800"))
+# Deadline for handing the email to SendGrid
+EMAIL_TIMEOUT_SECONDS = float(os.getenv("EMAIL_TIMEOUT_SECONDS", "60"))
+
 def safe_float(val):
     try:
         if isinstance(val, str):
@@ -33,27 +40,181 @@ def safe_float(val):
     except Exception:
         return None
 
-def run_report():
-    import pytz
-    BANGKOK_TZ = pytz.timezone("Asia/Bangkok")
+async def extract_balances_async(sources, max_workers=None, timeout=None, on_result=None, business_date=None):
+    """
+    Extract every source as an asyncio task (blocking work runs in a thread pool) and
+    collect each result as soon as its source finishes. `sources` is a list of
+    BalanceSources, or {name: extractor} for ad-hoc sources (treated as browser sources).
+    HTTP sources start first and at most BROWSER_POOL_SIZE browser sources run at once.
+    Returns {name: (balance, extracted_at)}; a source that fails or runs longer than its
+    timeout (default `timeout` seconds) is reported as (None, None).
+    `on_result(name, balance, extracted_at, duration, status)` is called once per source
+    with status "ok", "failed", "error", "timeout", "cancelled" or "skipped".
+    Raises ValueError if `max_workers` or `timeout` is not positive.
+    """
+    sources = as_sources(sources)
+    max_workers = EXTRACT_MAX_WORKERS if max_workers is None else max_workers
+    timeout = EXTRACT_TIMEOUT_SECONDS if timeout is None else timeout
+    if max_workers < 1:
+        raise ValueError(f"max_workers must be at least 1, got {max_workers}")
+    if timeout <= 0:
+        raise ValueError(f"Extraction timeout must be positive, got {timeout}")
+    return await extract_sources(sources, max_workers, driver_pool.max_size, timeout, on_result,
+                                 convert=safe_float, business_date=business_date)
+
+def extract_balances(extractors, max_workers=None, timeout=None, on_result=None):
+    """Blocking wrapper around extract_balances_async()."""
+    return asyncio.run(extract_balances_async(extractors, max_workers, timeout, on_result))
+
+def default_business_date():
+    # The report covers the previous day (Asia/Bangkok)
+    return (datetime.now(BANGKOK_TZ) - timedelta(days=1)).date()
+
+async def execute_report_async(names=None, business_date=None, send_email=True, use_cache=True):
+    """
+    One report run as a coroutine: reuse cached balances, extract the rest concurrently,
+    then send the email and clean up downloads side by side as soon as the data is complete.
+    `names` limits the run to some sources (plus their dependencies); such a partial run
+    never reconciles or sends the email. Returns a JSON-friendly summary of the run.
+    Several runs can share one event loop.
+    """
+    formula = reconciliation_formula()
+    # Every source the reconciliation formula needs (plus their dependencies), or just the requested ones.
+    # Resolved before the run starts: an unknown source must not leave a run (and its memory sampler) open.
+    sources = resolve_sources(formula.names if names is None else names)
+    names = [source.name for source in sources]
+    partial = not set(formula.names) <= set(names)
+    run_id = start_run()
+    try:
+        log_info(f"Starting report run {run_id}")
+        # Every extraction is stored against the business date (default: yesterday)
+        business_date = business_date or default_business_date()
+        if business_date != default_business_date():
+            live = [source.name for source in sources if not source.dated]
+            if live:
+                log_warning(f"{', '.join(live)} can only read the live balance; it is recorded against {business_date}.")
+                # Today's balances next to an earlier day's report would not reconcile anything
+                if send_email and not partial:
+                    log_warning(f"Not emailing the {business_date} report: it would mix live {', '.join(live)} balances with that day's.")
+                send_email = False
+
+        outcomes = {name: {"status": None, "duration": None} for name in names}
+        # {source: {account: balance}} for sources made of several accounts (CIMB)
+        accounts = {}
+
+        def _store(name, balance, extracted_at, duration, status):
+            source, _, account = name.partition(ACCOUNT_SEPARATOR)
+            if account:
+                accounts.setdefault(source, {})[account] = balance
+            else:
+                outcomes[name] = {"status": status, "duration": round(duration, 3) if duration is not None else None}
+            record_extraction(name, balance, extracted_at, business_date, duration, status, run_id)
 
-    log_info("Extracting V2 balance...")
-    V2_balance = safe_float(login_and_test_v2())
-    V2_time = datetime.now(BANGKOK_TZ) if V2_balance is not None else None
-    if V2_balance is not None:
-        log_success(f"Extracted V2 Balance: {V2_balance:,.2f} THB at {V2_time.strftime('%Y-%m-%d %H:%M:%S %Z')}")
+        # Reuse balances an earlier attempt already got for this business date; only fetch the rest
+        results = {name: (None, None) for name in names}
+        if use_cache and RUN_CACHE_MAX_AGE_SECONDS > 0:
+            cached = cached_balances(names, business_date, RUN_CACHE_MAX_AGE_SECONDS)
+            for name, (balance, extracted_at) in cached.items():
+                log_info(f"Using cached {name} balance: {balance:,.2f} THB from {extracted_at.strftime('%Y-%m-%d %H:%M:%S %Z')}")
+                outcomes[name]["status"] = "cached"
+                stored = stored_accounts(name, business_date)
+                if stored:
+                    accounts[name] = stored
+            results.update(cached)
+        pending = [source for source in sources if results[source.name][0] is None]
+
+        if pending:
+            # Keep browsers warm for the duration of the run; the scheduler may hold the pool open across retries
+            needs_browser = any(source.cost == COST_BROWSER for source in pending)
+            if needs_browser:
+                driver_pool.open()
+            try:
+                results.update(await extract_balances_async(pending, on_result=_store, business_date=business_date))
+            finally:
+                if needs_browser:
+                    driver_pool.close()
+        else:
+            log_info("All balances are cached for this business date; nothing to extract.")
+
+        balances = {name: balance for name, (balance, _) in results.items()}
+        # Evaluated once: the same value goes into the report and the run summary
+        reconciliation = formula.evaluate(balances) if not partial and None not in balances.values() else None
+        report, html_report, all_balances_ok = render_report(results, business_date, formula, reconciliation, accounts)
+        log_info("Report generated:")
+        logging.info(report)
+
+        # A run that went over MEMORY_BUDGET_MB fails like a missing balance; the retry reuses the stored balances
+        over_budget = over_memory_budget(run_id)
+
+        # Hand the email over as soon as the data is complete; cleanup runs alongside it.
+        # Own executor so a hung SendGrid call cannot hold up the end of the run.
+        email_status = "not_sent"
+        executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="deliver")
+        try:
+            cleanup = run_blocking(cleanup_downloads, executor=executor)
+            if all_balances_ok and send_email and not over_budget:
+                email = run_blocking(send_report_email, report, html_report, business_date,
+                                     executor=executor, timeout=EMAIL_TIMEOUT_SECONDS)
+                _, sent = await asyncio.gather(cleanup, email, return_exceptions=True)
+                if isinstance(sent, Exception):
+                    log_error(f"Failed to send email: {sent}")
+                email_status = "sent" if sent is True else "failed"
+            else:
+                if partial:
+                    log_info(f"Partial run ({', '.join(names)}): no reconciliation, email not sent.")
+                elif over_budget:
+                    log_error(f"Run exceeded the memory budget ({memory_monitor.MEMORY_BUDGET_MB:.0f} MB). Email not sent.")
+                elif not send_email:
+                    log_info("Email disabled for this run.")
+                elif None not in balances.values():
+                    log_error(f"Reconciliation formula {formula} could not be evaluated. Email not sent.")
+                else:
+                    # One or more balances are missing, so email will not be sent
+                    log_error("One or more balances missing. Email not sent due to incomplete data.")
+                await cleanup
+        finally:
+            executor.shutdown(wait=False)
 
-    log_info("Extracting VAS balance...")
-    VAS_balance = safe_float(login_vas())
-    VAS_time = datetime.now(BANGKOK_TZ) if VAS_balance is not None else None
-    if VAS_balance is not None:
-        log_success(f"Extracted VAS Balance: {VAS_balance:,.2f} THB at {VAS_time.strftime('%Y-%m-%d %H:%M:%S %Z')}")
+        summary = {
+            "run_id": run_id,
+            "business_date": business_date.isoformat(),
+            "sources": {
+                name: {
+                    "balance": balance,
+                    "extracted_at": extracted_at.isoformat() if extracted_at else None,
+                    **outcomes[name],
+                    **({"accounts": accounts[name]} if name in accounts else {}),
+                }
+                for name, (balance, extracted_at) in results.items()
+            },
+            "formula": None if partial else str(formula),
+            "reconciliation": reconciliation,
+            "email": email_status,
+            "ok": None not in balances.values() and (partial or reconciliation is not None) and not over_budget,
+        }
+    finally:
+        timing = end_run(run_id)
+    summary["memory"] = timing.get("memory")
+    return summary
 
-    log_info("Extracting CIMB balance...")
-    CIMB_balance = safe_float(login_and_get_cimb_balance())
-    CIMB_time = datetime.now(BANGKOK_TZ) if CIMB_balance is not None else None
-    if CIMB_balance is not None:
-        log_success(f"Extracted CIMB Balance: {CIMB_balance:,.2f} THB at {CIMB_time.strftime('%Y-%m-%d %H:%M:%S %Z')}")
+async def run_report_async(use_cache=True):
+    """The scheduled run: every source, with email. Returns True if every balance was available."""
+    return (await execute_report_async(use_cache=use_cache))["ok"]
+
+def run_report(use_cache=True):
+    return asyncio.run(run_report_async(use_cache))
+
+def render_report(results, business_date, formula, reconciliation, accounts=None):
+    """
+    Build the plain-text and HTML report from {name: (balance, extracted_at)} (in report
+    order), the reconciliation formula and its value (None if it could not be evaluated).
+    `accounts` ({name: {account: balance}}) lists each account of a source made of
+    several, under the source's total. Returns (text, html, all_balances_ok).
+    """
+    balances = {name: balance for name, (balance, _) in results.items()}
+    # Only broken down when there is more than one account (or one is missing)
+    breakdown = {name: parts for name, parts in (accounts or {}).items()
+                 if len(parts) > 1 or None in parts.values()}
 
     # Use a single report generated timestamp for the email (Asia/Bangkok time)
     report_generated_time = datetime.now(BANGKOK_TZ)
@@ -61,21 +222,21 @@ def run_report():
 
     report = f"""
 Daily Float Reconciliation Report\nReport generated at: {report_generated_str}\n\n"""
-    if CIMB_balance is not None:
-        report += f"CIMB Balance: {CIMB_balance:,.2f} THB\n"
-    else:
-        report += f"CIMB Balance: ERROR\n"
-    if V2_balance is not None:
-        report += f"V2 Balance: {V2_balance:,.2f} THB\n"
-    else:
-        report += f"V2 Balance: ERROR\n"
-    if VAS_balance is not None:
-        report += f"VAS Balance: {VAS_balance:,.2f} THB\n"
-    else:
-        report += f"VAS Balance: ERROR\n"
+    for name, balance in balances.items():
+        if balance is not None:
+            report += f"{name} Balance: {balance:,.2f} THB\n"
+        else:
+            report += f"{name} Balance: ERROR\n"
+        for account, value in breakdown.get(name, {}).items():
+            report += f"  {name} {account}: {f'{value:,.2f} THB' if value is not None else 'NOT FOUND'}\n"
 
-    report_date = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
+    report_date = business_date.strftime('%Y-%m-%d')
 
+    rows = ""
+    for name, balance in balances.items():
+        rows += f"""      <tr><td>{name}</td><td>{(f"{balance:,.2f}" if balance is not None else '<span class="error">ERROR</span>')}</td></tr>\n"""
+        for account, value in breakdown.get(name, {}).items():
+            rows += f"""      <tr><td>&nbsp;&nbsp;{name} {account}</td><td>{(f"{value:,.2f}" if value is not None else '<span class="error">NOT FOUND</span>')}</td></tr>\n"""
     html_report = f'''
 <html>
   <head>
@@ -94,62 +255,70 @@ Daily Float Reconciliation Report\nReport generated at: {report_generated_str}\n
     <p><b>Report generated at: {report_generated_str}</b></p>
     <table class="report-table">
       <tr><th>Account</th><th>Balance (THB)</th></tr>
-      <tr><td>CIMB</td><td>{(f"{CIMB_balance:,.2f}" if CIMB_balance is not None else '<span class="error">ERROR</span>')}</td></tr>
-      <tr><td>V2</td><td>{(f"{V2_balance:,.2f}" if V2_balance is not None else '<span class="error">ERROR</span>')}</td></tr>
-      <tr><td>VAS</td><td>{(f"{VAS_balance:,.2f}" if VAS_balance is not None else '<span class="error">ERROR</span>')}</td></tr>
-    </table>
+{rows}    </table>
 '''
 
-    all_balances_ok = None not in (CIMB_balance, V2_balance, VAS_balance)
+    # A partial run (some of the formula's sources not requested) cannot be reconciled
+    missing = [name for name in formula.names if name not in balances]
+    all_balances_ok = not missing and None not in balances.values() and reconciliation is not None
 
     if all_balances_ok:
-        result = CIMB_balance - (V2_balance + VAS_balance)
-        report += f"\nCIMB - (V2 + VAS) = {result:,.2f} THB\n\n"
+        result = reconciliation
+        account = " + ".join(formula.credits)
+        floats = " and ".join(formula.debits)
+        report += f"\n{formula} = {result:,.2f} THB\n\n"
         if result >= 0:
-            summary = f"CIMB balance is sufficient. Surplus: {result:,.2f} THB."
-            html_report += f'<p class="ok">CIMB - (V2 + VAS) = {result:,.2f} THB</p>'
-            html_report += f'<p class="ok">CIMB balance is sufficient. Surplus: {result:,.2f} THB.</p>'
+            summary = f"{account} balance is sufficient. Surplus: {result:,.2f} THB."
+            html_report += f'<p class="ok">{formula} = {result:,.2f} THB</p>'
+            html_report += f'<p class="ok">{account} balance is sufficient. Surplus: {result:,.2f} THB.</p>'
         else:
-            summary = f"Warning: Combined V2 and VAS float exceeds CIMB account by {abs(result):,.2f} THB!"
-            html_report += f'<p class="warn">CIMB - (V2 + VAS) = {result:,.2f} THB</p>'
-            html_report += f'<p class="warn">Warning: Combined V2 and VAS float exceeds CIMB account by {abs(result):,.2f} THB!</p>'
+            summary = f"Warning: Combined {floats} float exceeds {account} account by {abs(result):,.2f} THB!"
+            html_report += f'<p class="warn">{formula} = {result:,.2f} THB</p>'
+            html_report += f'<p class="warn">Warning: Combined {floats} float exceeds {account} account by {abs(result):,.2f} THB!</p>'
         report += summary
+    elif not missing and None not in balances.values():
+        report += f"\nThe reconciliation formula {formula} could not be evaluated. Please check logs.\n"
+        html_report += f'<p class="error">The reconciliation formula {formula} could not be evaluated. Please check logs.</p>'
+    elif missing:
+        report += f"\nPartial run: {formula} also needs {', '.join(missing)}. No reconciliation.\n"
+        html_report += f'<p>Partial run: {formula} also needs {", ".join(missing)}. No reconciliation.</p>'
     else:
         report += "\nOne or more balances could not be extracted. Please check logs.\n"
         html_report += '<p class="error">One or more balances could not be extracted. Please check logs.</p>'
 
     html_report += '</body></html>'
+    return report, html_report, all_balances_ok
 
-    log_info("Report generated:")
-    logging.info(report)
-
+def send_report_email(report, html_report, business_date):
     # --- Send email via SendGrid ---
-    # First, check if all balances were successfully retrieved
-    if None not in (CIMB_balance, V2_balance, VAS_balance):
-        # If all balances are present, then check for SendGrid credentials
-        if SENDGRID_API_KEY and FROM_EMAIL and TO_EMAIL:
-            sg = sendgrid.SendGridAPIClient(api_key=SENDGRID_API_KEY.strip('"'))
-            message = Mail(
-                from_email=FROM_EMAIL,
-                to_emails=TO_EMAIL,
-                subject=f"Daily Float Reconciliation Report for {report_date}",
-                plain_text_content=report,
-                html_content=html_report
-            )
-            try:
-                response = sg.send(message)
-                log_success(f"Email sent! Status code: {response.status_code}")
-            except Exception as e:
-                log_error(f"Failed to send email: {e}")
-        else:
-            # Credentials missing, so email cannot be sent
-            log_error("SendGrid credentials not set. Email not sent due to missing credentials.")
-    else:
-        # One or more balances are missing, so email will not be sent
-        log_error("One or more balances missing. Email not sent due to incomplete data.")
+    if not (SENDGRID_API_KEY and FROM_EMAIL and TO_EMAIL):
+        # Credentials missing, so email cannot be sent
+        log_error("SendGrid credentials not set. Email not sent due to missing credentials.")
+        return False
+    # SendGrid and certifi are only imported when an email actually goes out
+    import certifi
+    # Patch for SSL certificate errors with SendGrid
+    os.environ['SSL_CERT_FILE'] = certifi.where()
+    os.environ['REQUESTS_CA_BUNDLE'] = certifi.where()
+    # If you still get SSL errors, try running this script with Python 3.10–3.12, as some newer/older versions may have SSL bugs.
+    import sendgrid
+    from sendgrid.helpers.mail import Mail
+    report_date = business_date.strftime('%Y-%m-%d')
+    sg = sendgrid.SendGridAPIClient(api_key=SENDGRID_API_KEY.strip('"'))
+    message = Mail(
+        from_email=FROM_EMAIL,
+        to_emails=TO_EMAIL,
+        subject=f"Daily Float Reconciliation Report for {report_date}",
+        plain_text_content=report,
+        html_content=html_report
+    )
+    with stage("report", "email"):
+        response = sg.send(message)
+    log_success(f"Email sent! Status code: {response.status_code}")
+    return True
 
+def cleanup_downloads():
     # --- Clean up downloads directory ---
-    import glob
     downloads_dir = os.path.join(os.path.dirname(__file__), "downloads")
     for file_path in glob.glob(os.path.join(downloads_dir, "*")):
         try:
@@ -158,91 +327,42 @@ Daily Float Reconciliation Report\nReport generated at: {report_generated_str}\n
         except Exception as e:
             log_error(f"Could not delete {file_path}: {e}")
 
-    return all_balances_ok
+def run_schedule(stop_event=None):
+    """Run the report every day until `stop_event` is set (or forever)."""
+    # Always use Asia/Bangkok time for scheduling (see BANGKOK_TZ above).
+    # The scheduler sleeps until the next due instant: the daily run at 02:01, or after a
+    # failure the next full hour until 09:01. Missed runs are caught up after a restart.
+    schedule = DailySchedule(run_at=time(2, 1), retry_until=time(9, 1), tz=BANGKOK_TZ)
+    log_info("Scheduler started.")
+
+    # Pre-start browsers shortly before the scheduled run and keep them warm for retries
+    pool = {"held": False}
+
+    def warm_up():
+        if not pool["held"]:
+            driver_pool.open(warm=BROWSER_POOL_SIZE)
+            pool["held"] = True
+
+    def scheduled_run():
+        # Hold the pool across the run (not just after it), so the run's own close() leaves
+        # its browsers idle and the retries reuse them; released once nothing is due today
+        if not pool["held"]:
+            driver_pool.open()
+            pool["held"] = True
+        return run_report()
+
+    def release_browsers():
+        # Nothing left to run today
+        if pool["held"]:
+            driver_pool.close()
+            pool["held"] = False
+
+    try:
+        run_scheduler(scheduled_run, schedule, stop_event=stop_event, warmup=warm_up,
+                      warmup_lead=timedelta(seconds=60), idle=release_browsers)
+    finally:
+        release_browsers()
 
 if __name__ == "__main__":
-    # --- Restore this code for real scheduling
-    # Always use Asia/Bangkok time for scheduling
-    BANGKOK_TZ = pytz.timezone("Asia/Bangkok")
-    log_info("Scheduler started. Waiting for next run at 2:01 Asia/Bangkok time...")
-    
-    last_run_date = None
-    last_failed_retry_datetime = None
-    retry_on_failure = False
-    
-    # Define the daily scheduled run time (10:00)
-    SCHEDULED_RUN_HOUR = 2
-    SCHEDULED_RUN_MINUTE = 1
-    
-    # Define retry window end time (09:00)
-    RETRY_END_HOUR = 9
-    RETRY_END_MINUTE = 1
-    
-    # Define minimum time between retries (1 hour)
-    RETRY_INTERVAL = timedelta(hours=1)
-    
-    while True:
-        now_bangkok = datetime.now(BANGKOK_TZ)
-        current_date = now_bangkok.date()
-        
-        # Create datetime objects for comparisons
-        scheduled_time = BANGKOK_TZ.localize(datetime.combine(
-            current_date, 
-            time(SCHEDULED_RUN_HOUR, SCHEDULED_RUN_MINUTE)
-        ))
-        
-        retry_end_time = BANGKOK_TZ.localize(datetime.combine(
-            current_date,
-            time(RETRY_END_HOUR, RETRY_END_MINUTE)
-        ))
-        
-        # Check if it's time for the daily scheduled run
-        is_scheduled_run_time = (
-            now_bangkok.time().hour == SCHEDULED_RUN_HOUR and
-            now_bangkok.time().minute == SCHEDULED_RUN_MINUTE and
-            (last_run_date is None or last_run_date != current_date)
-        )
-        
-        # Normal daily run at 2:01
-        if is_scheduled_run_time:
-            log_info(f"Starting scheduled daily run at {now_bangkok.strftime('%Y-%m-%d %H:%M:%S')}")
-            success = run_report()
-            if success:
-                last_run_date = current_date
-                retry_on_failure = False
-                log_success("Scheduled report completed successfully")
-            else:
-                retry_on_failure = True
-                last_failed_retry_datetime = now_bangkok
-                log_warning("Report run failed. Will retry in one hour.")
-
-        # Handle retry logic
-        elif retry_on_failure:
-            # Check if we're within retry window and enough time has passed since last attempt
-            time_for_retry = (
-                now_bangkok.time().minute == 0 and  # Only retry on the hour
-                last_failed_retry_datetime is not None and
-                (now_bangkok - last_failed_retry_datetime) >= RETRY_INTERVAL
-            )
-            
-            # Check if we're still before the retry cutoff time
-            within_retry_window = now_bangkok < retry_end_time
-            
-            if time_for_retry and within_retry_window:
-                log_info(f"Retrying extraction at {now_bangkok.strftime('%H:%M')}...")
-                success = run_report()
-                if success:
-                    last_run_date = current_date
-                    retry_on_failure = False
-                    log_success("Retry attempt completed successfully")
-                else:
-                    last_failed_retry_datetime = now_bangkok
-                    log_warning("Retry attempt failed. Will try again in one hour.")
-            
-            # If we've passed the retry window end time, stop retrying until next day
-            elif now_bangkok >= retry_end_time:
-                log_warning(f"Maximum retry window reached (after {RETRY_END_HOUR:02d}:{RETRY_END_MINUTE:02d}). Will not retry until next scheduled run.")
-                retry_on_failure = False
-
-        log_debug(f"Current time: {now_bangkok.strftime('%Y-%m-%d %H:%M:%S')} - Waiting for next check...")
-        time_module.sleep(15)
\ No newline at end of file
+    init_logging()
+    run_schedule()
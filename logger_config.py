@@ -1,59 +1,140 @@
 import os
 import logging
 import sys # Import sys for stdout/stderr
+import threading
+import time
+import queue
+import atexit
 from datetime import datetime
 import pytz
 import re
-from logging.handlers import RotatingFileHandler # Import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener # Import RotatingFileHandler
+
+# Define your log directory and file path
+# Using PM2's default log directory is generally a good idea for applications
+# managed by PM2, or you can specify another path.
+# For daily-float-report, your logs are in /home/ubuntu/.pm2/logs/
+LOG_DIR = "/home/ubuntu/.pm2/logs"
+APP_NAME = "daily-float-report"
+LOG_FILE_PATH = os.path.join(LOG_DIR, f"{APP_NAME}.log") # Combined log file
+
+# Queue-based logging: the calling thread only puts the record on a bounded queue and a
+# background listener redacts, formats and writes it (0 = write in the calling thread)
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# How long a WARNING or higher may wait for room on a full queue before it is dropped
+LOG_QUEUE_BLOCK_SECONDS = float(os.getenv("LOG_QUEUE_BLOCK_SECONDS", "1.0"))
+# Per-element DEBUG dumps of VAS table rows and CIMB links; each line costs a browser round trip
+LOG_PAGE_DUMPS = os.getenv("LOG_PAGE_DUMPS", "0").lower() in ("1", "true", "yes")
 
 class SensitiveDataFilter(logging.Filter):
     """Filter that redacts sensitive information from log messages"""
 
-    def __init__(self):
-        super().__init__()
-        # Patterns to look for in log messages
-        self.patterns = [
-            # Passwords and credentials
-            (re.compile(r'\b(password|PASSWORD)\s*[=:]\s*["\']?([^"\',\s]+)["\']?', re.IGNORECASE), '***REDACTED***'),
-            (re.compile(r'\b(username|USERNAME)\s*[=:]\s*["\']?([^"\',\s]+)["\']?', re.IGNORECASE), '***REDACTED***'),
-            (re.compile(r'\b(api_key|API_KEY|apikey)\s*[=:]\s*["\']?([^"\',\s]+)["\']?', re.IGNORECASE), '***REDACTED***'),
+    # All patterns in one precompiled regex, so each message is scanned once
+    PATTERN = re.compile(
+        # Passwords and credentials
+        r'(?P<credential>\b(?:password|username|api_key|apikey)\s*[=:]\s*["\']?[^"\',\s]+["\']?)'
+        # SendGrid API key pattern
+        r'|(?P<sendgrid>\bSG\.[a-zA-Z0-9\-_]{22}\.[a-zA-Z0-9\-_]{43}\b)',
+        re.IGNORECASE)
+    REPLACEMENTS = {"credential": '***REDACTED***', "sendgrid": '***SENDGRID-KEY-REDACTED***'}
+    # Balance numbers (optionally)
+    # (re.compile(r'\b(Balance|balance):\s*([0-9,.]+)\s*THB\b'), r'\1: ***REDACTED*** THB'),
 
-            # SendGrid API key pattern
-            (re.compile(r'\b(SG\.[a-zA-Z0-9\-_]{22}\.[a-zA-Z0-9\-_]{43})\b'), '***SENDGRID-KEY-REDACTED***'),
+    def __init__(self, level=logging.NOTSET):
+        super().__init__()
+        # Records below this level are never written, so they are not scanned
+        self.level = level
 
-            # Balance numbers (optionally)
-            # (re.compile(r'\b(Balance|balance):\s*([0-9,.]+)\s*THB\b'), r'\1: ***REDACTED*** THB'),
-        ]
+    def redact(self, text):
+        return self.PATTERN.sub(lambda match: self.REPLACEMENTS[match.lastgroup], text)
 
     def filter(self, record):
-        if hasattr(record, 'msg') and isinstance(record.msg, str):
-            # Apply each pattern to the message
-            for pattern, replacement in self.patterns:
-                record.msg = pattern.sub(replacement, record.msg)
-
-            # Also redact in formatted message if it already exists
-            if hasattr(record, 'message'):
-                for pattern, replacement in self.patterns:
-                    record.message = pattern.sub(replacement, record.message)
+        if record.levelno < self.level or getattr(record, "redacted", False):
+            return True
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        if isinstance(record.msg, str):
+            record.msg = self.redact(record.msg)
+        record.redacted = True  # Several handlers may share the record; scan it only once
         return True
 
-def setup_logger():
+class BoundedQueueHandler(QueueHandler):
     """
-    Configure a global logger with console output (stdout for INFO, stderr for ERROR)
-    and file output.
+    Puts records on a bounded queue for the listener thread. When the queue is full,
+    records below WARNING are dropped at once (the scrape never waits for DEBUG output)
+    and WARNING or higher wait up to `block_seconds` for room. See log_queue_stats().
     """
-    # Define your log directory and file path
-    # Using PM2's default log directory is generally a good idea for applications
-    # managed by PM2, or you can specify another path.
-    # For daily-float-report, your logs are in /home/ubuntu/.pm2/logs/
-    LOG_DIR = "/home/ubuntu/.pm2/logs"
-    APP_NAME = "daily-float-report"
-    LOG_FILE_PATH = os.path.join(LOG_DIR, f"{APP_NAME}.log") # Combined log file
 
+    def __init__(self, log_queue, block_seconds=LOG_QUEUE_BLOCK_SECONDS):
+        super().__init__(log_queue)
+        self.block_seconds = block_seconds
+        self._stats_lock = threading.Lock()
+        self.stats = {"enqueued": 0, "dropped": 0, "blocked": 0, "blocked_seconds": 0.0, "high_water": 0}
+
+    def prepare(self, record):
+        # Only freeze the message here; redaction and formatting happen on the listener thread
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record):
+        blocked = None
+        try:
+            self.queue.put_nowait(record)
+            queued = True
+        except queue.Full:
+            queued = False
+            if record.levelno >= logging.WARNING:
+                started = time.monotonic()
+                try:
+                    self.queue.put(record, timeout=self.block_seconds)
+                    queued = True
+                except queue.Full:
+                    pass
+                blocked = time.monotonic() - started
+        depth = self.queue.qsize()
+        with self._stats_lock:
+            self.stats["enqueued" if queued else "dropped"] += 1
+            if blocked is not None:
+                self.stats["blocked"] += 1
+                self.stats["blocked_seconds"] += blocked
+            if depth > self.stats["high_water"]:
+                self.stats["high_water"] = depth
+
+class RedactingQueueListener(QueueListener):
+    """Writes queued records to the real handlers, redacting each record once first."""
+
+    def __init__(self, log_queue, handlers, redactor):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.redactor = redactor
+
+    def prepare(self, record):
+        self.redactor.filter(record)
+        return record
+
+def setup_logger(queue_size=None, console=None):
+    """
+    Configure a global logger with console output (stdout for INFO, stderr for ERROR)
+    and file output. `console` moves the INFO output to another stream, e.g. sys.stderr
+    for commands that print JSON on stdout. With a `queue_size` (default LOG_QUEUE_SIZE)
+    the handlers run on a background listener thread behind a bounded queue.
+    """
+    queue_size = LOG_QUEUE_SIZE if queue_size is None else queue_size
+    console = sys.stdout if console is None else console
     # Ensure the log directory exists
     if not os.path.exists(LOG_DIR):
         os.makedirs(LOG_DIR)
 
+    global _queue_handler, _listener, _atexit_registered
+    # Set up again in the same process: flush and stop the previous listener (and close its files) first
+    previous, _listener, _queue_handler = _listener, None, None
+    if previous is not None:
+        previous.stop()
+        for handler in previous.handlers:
+            handler.close()
+
     # Configure root logger
     logger = logging.getLogger()
     logger.setLevel(logging.DEBUG) # Set the lowest level you want to capture anywhere
@@ -78,25 +159,25 @@ def setup_logger():
     # Create formatter with timezone-aware datetime
     formatter = TimezoneFormatter('[%(asctime)s] [%(levelname)s] %(message)s',
                                   datefmt='%Y-%m-%d %H:%M:%S %Z')
-
-    sensitive_filter = SensitiveDataFilter()
+    handlers = []
 
     # --- Console Handler for INFO and above to STDOUT (PM2's .out.log) ---
-    console_handler_stdout = logging.StreamHandler(sys.stdout)
+    console_handler_stdout = logging.StreamHandler(console)
     console_handler_stdout.setLevel(logging.INFO) # Only INFO and higher to stdout
     console_handler_stdout.setFormatter(formatter)
-    console_handler_stdout.addFilter(sensitive_filter)
-    logger.addHandler(console_handler_stdout)
+    handlers.append(console_handler_stdout)
 
     # --- Console Handler for ERROR and above to STDERR (PM2's .err.log) ---
-    console_handler_stderr = logging.StreamHandler(sys.stderr)
-    console_handler_stderr.setLevel(logging.ERROR) # Only ERROR and CRITICAL to stderr
-    console_handler_stderr.setFormatter(formatter)
-    console_handler_stderr.addFilter(sensitive_filter)
-    logger.addHandler(console_handler_stderr)
+    # (not needed when the INFO output already goes to stderr)
+    if console is not sys.stderr:
+        console_handler_stderr = logging.StreamHandler(sys.stderr)
+        console_handler_stderr.setLevel(logging.ERROR) # Only ERROR and CRITICAL to stderr
+        console_handler_stderr.setFormatter(formatter)
+        handlers.append(console_handler_stderr)
 
     # --- File Handler for comprehensive logging to a dedicated file ---
     # This will log all levels (DEBUG and higher) to your specified log file.
+    file_error = None
     try:
         file_handler = RotatingFileHandler(
             LOG_FILE_PATH,
@@ -105,36 +186,118 @@ def setup_logger():
         )
         file_handler.setLevel(logging.DEBUG) # Log all levels to the file
         file_handler.setFormatter(formatter)
-        file_handler.addFilter(sensitive_filter)
-        logger.addHandler(file_handler)
-        logging.info(f"Logger initialized. All logs (DEBUG+) will be written to: {LOG_FILE_PATH}")
+        handlers.append(file_handler)
     except Exception as e:
+        file_error = e
+
+    if queue_size > 0:
+        # Callers only enqueue; DEBUG records are not even queued unless some handler writes them
+        log_queue = queue.Queue(maxsize=queue_size)
+        _queue_handler = BoundedQueueHandler(log_queue)
+        _queue_handler.setLevel(min(handler.level for handler in handlers))
+        logger.addHandler(_queue_handler)
+        _listener = RedactingQueueListener(log_queue, handlers, SensitiveDataFilter(_queue_handler.level))
+        _listener.start()
+        if not _atexit_registered:
+            atexit.register(stop_logging)
+            _atexit_registered = True
+    else:
+        for handler in handlers:
+            handler.addFilter(SensitiveDataFilter(handler.level))
+            logger.addHandler(handler)
+
+    if file_error is None:
+        logging.info(f"Logger initialized. All logs (DEBUG+) will be written to: {LOG_FILE_PATH}")
+    else:
         # If file logging fails (e.g., permissions), log to stderr and console only
-        logger.error(f"Failed to initialize file logger at {LOG_FILE_PATH}: {e}", exc_info=True)
+        logger.error(f"Failed to initialize file logger at {LOG_FILE_PATH}: {file_error}",
+                     exc_info=(type(file_error), file_error, file_error.__traceback__))
         logger.warning("File logging disabled. Using console logging only (stdout for INFO, stderr for ERROR).")
 
     logging.info("Logger setup complete.") # This will go to .out.log now
     return logger
 
+def log_queue_stats():
+    """
+    Backpressure figures for the logging queue: current and maximum depth, records
+    enqueued and dropped, how often (and how long) callers waited for room.
+    None when logging is synchronous.
+    """
+    if _queue_handler is None:
+        return None
+    with _queue_handler._stats_lock:
+        stats = dict(_queue_handler.stats)
+    stats["blocked_seconds"] = round(stats["blocked_seconds"], 3)
+    stats["depth"] = _queue_handler.queue.qsize()
+    stats["max_size"] = _queue_handler.queue.maxsize
+    return stats
+
+def stop_logging():
+    """Flush the queue and write from the calling thread from now on (runs at exit)."""
+    global _queue_handler, _listener
+    with _init_lock:
+        if _listener is None:
+            return
+        listener, queue_handler = _listener, _queue_handler
+        _listener = _queue_handler = None
+    listener.stop()
+    root = logging.getLogger()
+    root.removeHandler(queue_handler)
+    for handler in listener.handlers:
+        handler.addFilter(SensitiveDataFilter(handler.level))
+        root.addHandler(handler)
+    if queue_handler.stats["dropped"]:
+        logging.warning(f"Logging queue dropped {queue_handler.stats['dropped']} record(s) while full "
+                        f"(capacity {queue_handler.queue.maxsize}).")
+
+_queue_handler = None
+_listener = None
+_atexit_registered = False
+logger = None
+_init_lock = threading.Lock()
+
+def init_logging(console=None):
+    """
+    Configure logging once. Entry points (generate_report, cli, the extractors' __main__
+    blocks) call this at startup; importing this module no longer touches LOG_DIR.
+    The log_* helpers below also call it on first use, so library callers still get output.
+    `console` is the stream for INFO console output (default stdout; see setup_logger()).
+    """
+    global logger
+    if logger is None:
+        with _init_lock:
+            if logger is None:
+                logger = setup_logger(console=console)
+    return logger
+
 # Define custom log functions for maintaining the style used in the codebase
-# These will use the root logger configured above
+# These will use the root logger configured by init_logging()
 def log_info(message):
+    if logger is None:
+        init_logging()
     logging.info(f"{message}")
 
 def log_debug(message):
+    if logger is None:
+        init_logging()
     logging.debug(f"{message}")
 
 def log_success(message):
+    if logger is None:
+        init_logging()
     logging.info(f"[SUCCESS] {message}") # Success is typically an info level
 
 def log_error(message):
+    if logger is None:
+        init_logging()
     logging.error(f"{message}")
 
 def log_warning(message):
+    if logger is None:
+        init_logging()
     logging.warning(f"{message}")
 
 def log_wait(message):
+    if logger is None:
+        init_logging()
     logging.info(f"[WAIT] {message}") # Wait is typically an info level
-
-# Setup logger when importing this module
-logger = setup_logger()
\ No newline at end of file
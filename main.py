@@ -1,32 +1,184 @@
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-import time
 import os
+from html.parser import HTMLParser
+from urllib.parse import urljoin
 from dotenv import load_dotenv
 # Import our custom logger
-from logger_config import log_info, log_debug, log_success, log_error, log_warning, log_wait
+from logger_config import init_logging, log_info, log_debug, log_success, log_error, log_warning, log_wait
+from waits import wait_until, element_present, text_as_number
+from driver_factory import driver_pool
+from http_client import get_session, HTTP_TIMEOUT
+from timings import timed_stage, lap
+from session_cache import session_cache, jar_cookies, restore_jar, browser_cookies, restore_browser, SESSION_CHECK_TIMEOUT
 
 # Load credentials from .env file
 load_dotenv()
 USERNAME = os.getenv("V2_USERNAME")
 PASSWORD = os.getenv("V2_PASSWORD")
+V2_URL = os.getenv("V2_URL", "https://v2.ipps.co.th/agents/login")
+# auto = HTTP fast path first, browser only if it fails; http = HTTP only; browser = Selenium only
+V2_EXTRACT_MODE = os.getenv("V2_EXTRACT_MODE", "auto").lower()
 
-# Setup Chrome WebDriver
-def setup_driver():
-    options = Options()
-    options.add_argument("--headless")  # Enable headless mode
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    return webdriver.Chrome(options=options)
+# E-Money balance div on the dashboard, e.g. "Balance: 241.67 THB"
+BALANCE_XPATH = "//div[contains(@class, 'd-flex') and .//div[text()='E-Money']]//div[contains(text(), 'Balance:')]"
+BALANCE_TIMEOUT = float(os.getenv("V2_BALANCE_TIMEOUT_SECONDS", "10"))
 
-# Login to V2 system
+class V2PageParser(HTMLParser):
+    """
+    Lightweight parser for the V2 login and dashboard pages. Collects the login form
+    (action and hidden fields such as the CSRF token) and the E-Money balance text,
+    i.e. the same element BALANCE_XPATH matches in the browser.
+    """
+    VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.form_action = None
+        self.form_fields = {}
+        self.balance_text = None
+        self._in_form = False
+        self._stack = []  # [tag, is_d_flex_div, collected texts]
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "form" and self.form_action is None:
+            self._in_form = True
+            self.form_action = attrs.get("action") or ""
+        elif tag == "input" and self._in_form and attrs.get("type") == "hidden" and attrs.get("name"):
+            self.form_fields[attrs["name"]] = attrs.get("value") or ""
+        if tag not in self.VOID_TAGS:
+            is_d_flex = tag == "div" and "d-flex" in (attrs.get("class") or "").split()
+            self._stack.append([tag, is_d_flex, []])
+
+    def handle_endtag(self, tag):
+        if tag == "form":
+            self._in_form = False
+        # Pop up to the matching tag so unclosed elements don't break the stack
+        while self._stack:
+            open_tag, is_d_flex, texts = self._stack.pop()
+            if is_d_flex and self.balance_text is None and "E-Money" in texts:
+                self.balance_text = next((text for text in texts if text.startswith("Balance:")), None)
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        text = data.strip()
+        if not text:
+            return
+        for open_tag, is_d_flex, texts in self._stack:
+            if is_d_flex:
+                texts.append(text)
+
+def parse_balance_text(text):
+    """'Balance: 241.67 THB' -> 241.67"""
+    return float(text.replace("Balance:", "").replace("THB", "").replace(",", "").strip())
+
+def resume_v2_http(session):
+    """Read the dashboard with the cached V2 session, if there is one and it is still logged in."""
+    cached = session_cache.load("V2", V2_URL)
+    if cached is None or not cached["data"].get("dashboard_url"):
+        return None
+    lap("session_resume")
+    try:
+        restore_jar(session.cookies, cached["cookies"])
+        response = session.get(cached["data"]["dashboard_url"], timeout=HTTP_TIMEOUT)
+        dashboard = V2PageParser()
+        dashboard.feed(response.text)
+    except Exception as e:
+        log_info(f"Could not reuse cached V2 session ({e}); logging in.")
+        session.cookies.clear()
+        return None
+    if not response.ok or dashboard.balance_text is None:
+        log_info("Cached V2 session is no longer valid; logging in.")
+        session_cache.discard("V2")
+        session.cookies.clear()
+        return None
+    balance_value = parse_balance_text(dashboard.balance_text)
+    # Saving again keeps the expiry in step with the portal's idle timeout
+    session_cache.save("V2", V2_URL, jar_cookies(session.cookies), {"dashboard_url": response.url})
+    log_success(f"Extracted E-Money Balance with cached session: {balance_value} THB")
+    return balance_value
+
+# Login to V2 over plain HTTP and read the balance from the dashboard HTML (no browser)
+def login_and_test_v2_http():
+    session = get_session("v2")
+    try:
+        session.cookies.clear()  # Start every login from a clean session
+        balance_value = resume_v2_http(session)
+        if balance_value is not None:
+            return balance_value
+        lap("http_login")
+        log_info("Fetching V2 login page over HTTP...")
+        response = session.get(V2_URL, timeout=HTTP_TIMEOUT)
+        response.raise_for_status()
+        login_page = V2PageParser()
+        login_page.feed(response.text)
+
+        form = dict(login_page.form_fields)
+        form.update({"email": USERNAME, "password": PASSWORD})
+        action = urljoin(response.url, login_page.form_action or "")
+        log_info("Posting V2 login credentials over HTTP...")
+        response = session.post(action, data=form, timeout=HTTP_TIMEOUT, headers={"Referer": response.url})
+        response.raise_for_status()
+
+        lap("parse")
+        dashboard = V2PageParser()
+        dashboard.feed(response.text)
+        if dashboard.balance_text is None:
+            log_warning(f"E-Money balance not found in V2 page after login ({response.url}).")
+            return None
+        balance_value = parse_balance_text(dashboard.balance_text)
+        session_cache.save("V2", V2_URL, jar_cookies(session.cookies), {"dashboard_url": response.url})
+        log_success(f"Extracted E-Money Balance over HTTP: {balance_value} THB")
+        return balance_value
+
+    except Exception as e:
+        log_warning(f"V2 HTTP fast path failed: {e}")
+        return None
+
+# Get the V2 balance, using the browser only when the HTTP fast path fails
+@timed_stage("V2")
 def login_and_test_v2():
-    driver = setup_driver()
+    if V2_EXTRACT_MODE != "browser":
+        balance_value = login_and_test_v2_http()
+        if balance_value is not None or V2_EXTRACT_MODE == "http":
+            return balance_value
+        log_warning("Falling back to browser login for V2...")
+    return login_and_test_v2_browser()
+
+def resume_v2_browser(driver):
+    """Open the dashboard with the cached V2 session in the browser; None if it has to log in."""
+    cached = session_cache.load("V2", V2_URL)
+    if cached is None or not cached["data"].get("dashboard_url"):
+        return None
+    lap("session_resume")
+    try:
+        restore_browser(driver, V2_URL, cached["cookies"])
+        driver.get(cached["data"]["dashboard_url"])
+        balance_value = wait_until(driver, text_as_number(By.XPATH, BALANCE_XPATH), timeout=SESSION_CHECK_TIMEOUT,
+                                   label="v2.session_resume")
+    except Exception:
+        log_info("Cached V2 session is no longer valid; logging in.")
+        session_cache.discard("V2")
+        driver.delete_all_cookies()
+        return None
+    session_cache.save("V2", V2_URL, browser_cookies(driver), {"dashboard_url": driver.current_url})
+    log_success(f"Extracted E-Money Balance with cached session: {balance_value} THB")
+    return balance_value
+
+# Login to V2 system in a browser
+def login_and_test_v2_browser():
+    driver = None
     try:
+        lap("driver_startup")
+        driver = driver_pool.acquire("v2")
+        balance_value = resume_v2_browser(driver)
+        if balance_value is not None:
+            return balance_value
+        lap("login")
         log_info("Opening browser and navigating to login page...")
-        driver.get("https://v2.ipps.co.th/agents/login")
-        time.sleep(2)
+        driver.get(V2_URL)
+        wait_until(driver, element_present(By.ID, "email"), timeout=10, label="v2.login_form")
 
         log_info("Filling in login credentials...")
         driver.find_element(By.ID, "email").send_keys(USERNAME)
@@ -34,17 +186,11 @@ def login_and_test_v2():
 
         log_info("Clicking login button...")
         driver.find_element(By.XPATH, "//button[@type='submit' and contains(., 'Login')]").click()
-        time.sleep(3)
-
-        # Get E-Money balance using precise structure
-        balance_element = driver.find_element(
-            By.XPATH,
-            "//div[contains(@class, 'd-flex') and .//div[text()='E-Money']]//div[contains(text(), 'Balance:')]"
-        )
 
-        text = balance_element.text.strip()  # e.g. "Balance: 241.67 THB"
-        balance_str = text.replace("Balance:", "").replace("THB", "").strip()
-        balance_value = float(balance_str)
+        # Get E-Money balance as soon as the dashboard renders it
+        lap("balance")
+        balance_value = wait_until(driver, text_as_number(By.XPATH, BALANCE_XPATH), timeout=BALANCE_TIMEOUT, label="v2.balance")
+        session_cache.save("V2", V2_URL, browser_cookies(driver), {"dashboard_url": driver.current_url})
 
         log_success(f"Extracted E-Money Balance: {balance_value} THB")
         return balance_value  # <-- Return the value
@@ -53,8 +199,10 @@ def login_and_test_v2():
         log_error(f"Error during login or scraping: {e}")
         return None
     finally:
-        driver.quit()
+        if driver is not None:
+            driver_pool.release(driver)
 
 # Run the test
 if __name__ == "__main__":
+    init_logging()
     login_and_test_v2()
@@ -1,153 +1,367 @@
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from datetime import datetime, timedelta
-import time
+import io
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
 from dotenv import load_dotenv
-import pandas as pd  # For parsing Excel
-import glob  # For finding downloaded files
 # Import our custom logger
-from logger_config import log_info, log_debug, log_success, log_error, log_warning, log_wait
+from logger_config import init_logging, log_info, log_debug, log_success, log_error, log_warning, log_wait
+from waits import wait_until, element_present, url_not_contains
+from download_watcher import wait_for_download, is_valid_xlsx
+from driver_factory import driver_pool
+from excel_reader import read_cells
+from dom_snapshot import element_snapshot
+from timings import timed_stage, lap, stage, start_run, end_run
+import balance_store
+from balance_store import record_extraction
+from http_client import get_session, HTTP_TIMEOUT
+from session_cache import session_cache, browser_cookies, restore_browser, restore_jar, origin_of, SESSION_CHECK_TIMEOUT
 
 # Load environment variables
 load_dotenv()
 VAS_USERNAME = os.getenv("VAS_USERNAME")
 VAS_PASSWORD = os.getenv("VAS_PASSWORD")
+VAS_URL = os.getenv("VAS_URL", "https://va-vasbo.ipps.co.th/vas-web/auth/login")
+VAS_REPORT_URL = os.getenv("VAS_REPORT_URL", urljoin(VAS_URL, "../report/amc_all_report/"))
+DOWNLOAD_TIMEOUT = float(os.getenv("VAS_DOWNLOAD_TIMEOUT_SECONDS", "30"))
+SEARCH_TIMEOUT = 10
+# auto = fetch the report over HTTP with the browser's cookies, clicking the icon only if that fails;
+# http = HTTP only; browser = click the icon and wait for Chrome to save the file
+VAS_DOWNLOAD_MODE = os.getenv("VAS_DOWNLOAD_MODE", "auto").lower()
+# Larger responses are not a report; stop reading rather than hold them in memory
+MAX_REPORT_BYTES = int(float(os.getenv("VAS_MAX_REPORT_MB", "50")) * 1024 * 1024)
+# Cells read from the UserAcccountStatReport workbook (name -> address)
+REPORT_CELLS = {"balance": "B15"}
 
-# Setup Chrome WebDriver with custom download directory
-def setup_driver(download_dir=None):
-    options = Options()
-    options.add_argument("--headless")  # Enable headless mode
-    options.add_argument("--window-size=1920,1080")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-
-    # Set up Chrome preferences
-    prefs = {
-        "credentials_enable_service": False,
-        "profile.password_manager_enabled": False,
-        "profile.password_manager_leak_detection": False
-    }
-    if download_dir:
-        prefs["download.default_directory"] = os.path.abspath(download_dir)
-        prefs["download.prompt_for_download"] = False
-        prefs["directory_upgrade"] = True
-        prefs["safebrowsing.enabled"] = True
-    options.add_experimental_option("prefs", prefs)
-
-    # Optional: disable the popup warning UI entirely
-    options.add_argument("--disable-notifications")
-    options.add_argument("--disable-infobars")
-    options.add_argument("--disable-popup-blocking")
-
-    return webdriver.Chrome(options=options)
-
-# Login to VAS and select previous day's report and download/parse report
-def login_vas():
-    download_dir = "downloads"
-    os.makedirs(download_dir, exist_ok=True)
-    driver = setup_driver(download_dir=download_dir)
+def _login(driver):
+    log_info("Navigating to VAS login...")
+    driver.get(VAS_URL)
+    wait_until(driver, element_present(By.ID, "usernameforshow"), timeout=10, label="vas.login_form")
+
+    driver.find_element(By.ID, "usernameforshow").send_keys(VAS_USERNAME)
+    driver.find_element(By.ID, "passwordforshow").send_keys(VAS_PASSWORD)
+    driver.find_element(By.ID, "buttonforshow").click()
+    wait_until(driver, url_not_contains("/auth/login"), timeout=15, label="vas.login")
+
+def _resume_session(driver):
+    """Open the report page with the cached VAS session. False if there is none or it has expired."""
+    cached = session_cache.load("VAS", VAS_URL)
+    if cached is None:
+        return False
     try:
-        log_info("Navigating to VAS login...")
-        driver.get("https://va-vasbo.ipps.co.th/vas-web/auth/login")
-        time.sleep(2)
+        restore_browser(driver, VAS_URL, cached["cookies"])
+        driver.get(VAS_REPORT_URL)
+        # An expired session is redirected to the login page instead
+        wait_until(driver, element_present(By.ID, "businessDate"), timeout=SESSION_CHECK_TIMEOUT, label="vas.session_resume")
+    except Exception:
+        log_info("Cached VAS session is no longer valid; logging in.")
+        session_cache.discard("VAS")
+        driver.delete_all_cookies()
+        return False
+    log_success("Reusing cached VAS session; skipped login.")
+    return True
+
+def _save_session(driver):
+    session_cache.save("VAS", VAS_URL, browser_cookies(driver))
+
+def _open_report_page(driver):
+    log_info("Redirecting to report page...")
+    driver.get(VAS_REPORT_URL)
+    wait_until(driver, element_present(By.ID, "businessDate"), timeout=10, label="vas.report_page")
 
-        driver.find_element(By.ID, "usernameforshow").send_keys(VAS_USERNAME)
-        driver.find_element(By.ID, "passwordforshow").send_keys(VAS_PASSWORD)
-        driver.find_element(By.ID, "buttonforshow").click()
-        time.sleep(3)
+def _search(driver, report_date):
+    # The report page takes the business date as dd/mm/yyyy
+    log_info(f"Selecting report date: {report_date.strftime('%d/%m/%Y')}")
+    date_input = driver.find_element(By.ID, "businessDate")
+    driver.execute_script(f"arguments[0].value = '{report_date.strftime('%d/%m/%Y')}'", date_input)
 
-        log_info("Redirecting to report page...")
-        driver.get("https://va-vasbo.ipps.co.th/vas-web/report/amc_all_report/")
-        time.sleep(2)
+    # Click Search
+    search_button = driver.find_element(By.XPATH, "//button[contains(text(), 'Search')]")
+    search_button.click()
+    log_success(f"Search triggered for {report_date.isoformat()}.")
 
-        # Select previous day's date
-        yesterday = (datetime.now() - timedelta(days=1)).strftime("%d/%m/%Y")
-        log_info(f"Selecting report date: {yesterday}")
+# URL behind a download icon: its link's href, or a quoted URL in the icon's or link's onclick
+_REPORT_URL_JS = """
+var icon = arguments[0], link = icon.closest ? icon.closest("a") : null, candidates = [];
+if (link && link.getAttribute("href")) candidates.push(link.getAttribute("href"));
+[icon, link].forEach(function (element) {
+    var onclick = element && element.getAttribute("onclick"), match;
+    if (onclick && (match = onclick.match(/['"]([^'"\\s]*(?:\\.do|\\.xlsx|download|\\/)[^'"\\s]*)['"]/))) candidates.push(match[1]);
+});
+for (var i = 0; i < candidates.length; i++) {
+    var candidate = candidates[i].trim();
+    if (candidate && candidate.charAt(0) !== "#" && !/^javascript:/i.test(candidate)) return new URL(candidate, document.baseURI).href;
+}
+return null;
+"""
+
+def _report_url(driver, download_icon):
+    """The report's download URL on the VAS portal, read from the page in one call; None if the icon has none."""
+    try:
+        url = driver.execute_script(_REPORT_URL_JS, download_icon)
+    except Exception as e:
+        log_debug(f"Could not read the report link: {e}")
+        return None
+    if not isinstance(url, str) or origin_of(url) != origin_of(VAS_URL):
+        return None
+    return url
+
+def _fetch_report(driver, url, expected_filename):
+    """
+    GET the report with the browser's session cookies on the pooled VAS HTTP session and
+    stream it into memory. Returns a BytesIO holding the workbook, or None.
+    """
+    session = get_session("vas")
+    session.cookies.clear()
+    restore_jar(session.cookies, browser_cookies(driver))
+    try:
+        with session.get(url, stream=True, timeout=HTTP_TIMEOUT, headers={"Referer": driver.current_url}) as response:
+            response.raise_for_status()
+            if "text/html" in response.headers.get("Content-Type", ""):
+                # The portal answers an expired session with its login page
+                log_warning(f"VAS returned a web page instead of {expected_filename} ({response.url}).")
+                return None
+            buffer = io.BytesIO()
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                buffer.write(chunk)
+                if buffer.tell() > MAX_REPORT_BYTES:
+                    log_error(f"{expected_filename} is larger than {MAX_REPORT_BYTES // (1024 * 1024)} MB; giving up.")
+                    return None
+    except Exception as e:
+        log_warning(f"HTTP download of {expected_filename} failed: {e}")
+        return None
+    if not is_valid_xlsx(buffer):
+        log_error(f"Downloaded {expected_filename} is not a valid .xlsx ({len(buffer.getvalue())} bytes).")
+        return None
+    log_success(f"Downloaded {expected_filename} into memory ({len(buffer.getvalue())} bytes).")
+    return buffer
+
+def _parse_report(path, expected_filename):
+    # Stream the Excel file (path or in-memory buffer) just far enough to read cell B15
+    try:
+        value = read_cells(path, REPORT_CELLS)["balance"]
+        if value is None:
+            log_error(f"Cell {REPORT_CELLS['balance']} is empty in {expected_filename}")
+            return None
+        log_success(f"Extracted VAS Balance: {value} THB")
+        return value
+    except Exception as e:
+        log_error(f"Error parsing Excel file: {e}")
+        return None
+
+# Login to VAS and select previous day's report (or `business_date`'s) and download/parse report
+@timed_stage("VAS")
+def login_vas(business_date=None):
+    download_dir = "downloads"
+    os.makedirs(download_dir, exist_ok=True)
+    driver = None
+    try:
+        lap("driver_startup")
+        driver = driver_pool.acquire("vas", download_dir=download_dir)
+        lap("login")
+        if not _resume_session(driver):
+            _login(driver)
+            _save_session(driver)
 
-        date_input = driver.find_element(By.ID, "businessDate")
-        driver.execute_script(f"arguments[0].value = '{yesterday}'", date_input)
+            lap("navigation")
+            _open_report_page(driver)
 
-        # Click Search
-        search_button = driver.find_element(By.XPATH, "//button[contains(text(), 'Search')]")
-        search_button.click()
-        log_success("Search triggered for previous day.")
+        # Select previous day's date unless a business date was asked for
+        report_date = business_date or (datetime.now() - timedelta(days=1)).date()
+        lap("search")
+        _search(driver, report_date)
 
         # Wait for the result to appear
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.XPATH, "//td[contains(text(), '.csv') or contains(text(), 'Report')]") )
-        )
+        wait_until(driver, EC.presence_of_element_located((By.XPATH, "//td[contains(text(), '.csv') or contains(text(), 'Report')]")),
+                   timeout=10, label="vas.search_results")
         log_success("Report result appeared (next step: download).")
 
         # Step 1: Build expected filename
-        file_date = (datetime.now() - timedelta(days=1)).strftime("%Y%m%d")
+        file_date = report_date.strftime("%Y%m%d")
         expected_filename = f"UserAcccountStatReport_{file_date}.xlsx"
 
-        # Step 2: Find all rows in the report table
-        rows = driver.find_elements(By.XPATH, "//table//tr")
+        # Step 2: Read all rows of the report table (text and element) in one round trip
+        rows = element_snapshot(driver, By.XPATH, "//table//tr")
 
         # DEBUG: Print all table row texts
         log_debug("Table rows found:")
-        for idx, row in enumerate(rows):
-            log_debug(f"Row {idx}: {row.text}")
+        for row in rows:
+            log_debug(f"Row {row['index']}: {row['text']}")
         # Save screenshot for visual debug
         driver.save_screenshot('vas_report_table.png')
 
         downloaded = False
+        report = None  # In-memory workbook when fetched over HTTP
         # Relaxed matching: look for report prefix and date
-        file_date = (datetime.now() - timedelta(days=1)).strftime("%Y%m%d")
+        file_date = report_date.strftime("%Y%m%d")
         for row in rows:
             try:
-                if ("UserAcccountStatReport" in row.text and file_date in row.text):
-                    log_success(f"Found row with report (partial match): {row.text}")
-                    # Find the download icon and click it, wait until clickable
-                    download_icon = row.find_element(By.XPATH, ".//i[contains(@class, 'fa-file-o')]")
-                    WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.XPATH, ".//i[contains(@class, 'fa-file-o')]") ))
-                    download_icon.click()
+                if ("UserAcccountStatReport" in row["text"] and file_date in row["text"]):
+                    log_success(f"Found row with report (partial match): {row['text']}")
+                    download_icon = row["element"].find_element(By.XPATH, ".//i[contains(@class, 'fa-file-o')]")
+                    # Fetch the report over HTTP with the browser's cookies: no file on disk, no .crdownload polling
+                    url = _report_url(driver, download_icon) if VAS_DOWNLOAD_MODE != "browser" else None
+                    if url is not None:
+                        lap("download")
+                        report = _fetch_report(driver, url, expected_filename)
+                    if report is None and VAS_DOWNLOAD_MODE == "http":
+                        log_error(f"Could not download {expected_filename} over HTTP.")
+                        return None
+                    if report is None:
+                        if url is not None:
+                            log_warning("Falling back to a browser download...")
+                        # Click the download icon once it is clickable
+                        wait_until(driver, EC.element_to_be_clickable((By.XPATH, ".//i[contains(@class, 'fa-file-o')]")),
+                                   timeout=10, label="vas.download_icon")
+                        download_started = time.time()
+                        download_icon.click()
+                        log_info("Downloading report...")
                     downloaded = True
-                    log_info("Downloading report...")
                     break
             except Exception as e:
                 continue
         # Only print and return error if NO row was found
         if not downloaded:
             log_error(f"Could not find report row for {expected_filename}")
-            driver.quit()
             return None
 
-        # Step 3: Wait for the file to finish downloading
-        downloaded_file_path = os.path.join(download_dir, expected_filename)
-        timeout = 30  # seconds
-        waited = 0
-        while waited < timeout:
-            # Check if file exists and is not a .crdownload
-            if os.path.exists(downloaded_file_path) and not any(glob.glob(downloaded_file_path + ".crdownload")):
-                log_success(f"Download complete: {downloaded_file_path}")
-                break
-            time.sleep(1)
-            waited += 1
-        else:
-            log_error(f"Download timed out for {expected_filename}")
-            driver.quit()
-            return None
+        if report is None:
+            # Step 3: Wait for the file to finish downloading (also matches renamed copies like "..._20250605 (1).xlsx")
+            lap("download")
+            try:
+                report = wait_for_download(download_dir, f"UserAcccountStatReport_{file_date}*.xlsx",
+                                           timeout=DOWNLOAD_TIMEOUT, since=download_started - 1,
+                                           validate=is_valid_xlsx)
+                log_success(f"Download complete: {report}")
+            except TimeoutError:
+                log_error(f"Download timed out for {expected_filename}")
+                return None
 
-        # Step 4: Parse Excel file to extract value from cell B15
-        try:
-            df = pd.read_excel(downloaded_file_path, header=None)  # Read without headers for fixed cell
-            value = df.iloc[14, 1]  # Row 15 (index 14), Column B (index 1)
-            log_success(f"Extracted VAS Balance: {value} THB")
-            return value
-        except Exception as e:
-            log_error(f"Error parsing Excel file: {e}")
-            return None
+        # Step 4: Stream the Excel file just far enough to read cell B15
+        lap("parse")
+        return _parse_report(report, expected_filename)
 
+    except Exception as e:
+        log_error(f"Error during VAS login or report download: {e}")
+        return None
     finally:
-        driver.quit()
+        if driver is not None:
+            driver_pool.release(driver)
+
+def _report_row(driver, file_date):
+    # The result row for one business date, e.g. "UserAcccountStatReport_20250605.xlsx | Report | <icon>"
+    for row in element_snapshot(driver, By.XPATH, "//table//tr"):
+        if "UserAcccountStatReport" in row["text"] and file_date in row["text"]:
+            return row["element"]
+    return None
+
+def _download_report(driver, report_date, download_dir):
+    """
+    Search one business date on the open report page and return the report: an in-memory
+    buffer if it could be fetched over HTTP, otherwise the path of the file Chrome saved.
+    """
+    file_date = report_date.strftime("%Y%m%d")
+    _search(driver, report_date)
+    # Rows from the previous date stay on the page until the search returns, so wait for this date's row
+    row = wait_until(driver, lambda d: _report_row(d, file_date), timeout=SEARCH_TIMEOUT, label="vas.search_results")
+    download_icon = row.find_element(By.XPATH, ".//i[contains(@class, 'fa-file-o')]")
+    url = _report_url(driver, download_icon) if VAS_DOWNLOAD_MODE != "browser" else None
+    if url is not None:
+        report = _fetch_report(driver, url, f"UserAcccountStatReport_{file_date}.xlsx")
+        if report is not None:
+            return report
+    if VAS_DOWNLOAD_MODE == "http":
+        raise RuntimeError(f"could not download the {file_date} report over HTTP")
+    download_started = time.time()
+    download_icon.click()
+    return wait_for_download(download_dir, f"UserAcccountStatReport_{file_date}*.xlsx",
+                             timeout=DOWNLOAD_TIMEOUT, since=download_started - 1, validate=is_valid_xlsx)
+
+def backfill_vas(start, end, skip_existing=True, download_dir="downloads"):
+    """
+    Fetch the VAS report for every business date from `start` to `end` (inclusive) in one
+    login and store each balance in the balance store. Each report is parsed (and a saved file deleted)
+    on a worker thread while the browser downloads the next date. Dates that already have
+    a stored balance are skipped unless `skip_existing` is False. Returns {date: balance or None}.
+    """
+    dates = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+    if skip_existing:
+        dates = [day for day in dates if balance_store.balance_store.value_on("VAS", day) is None]
+    if not dates:
+        log_info("VAS backfill: every date in the range is already stored.")
+        return {}
+    log_info(f"VAS backfill: {len(dates)} business date(s) from {dates[0]} to {dates[-1]}")
+    os.makedirs(download_dir, exist_ok=True)
+    run_id = start_run()
+    results = {}
+    parsing = {}
+
+    def _parse_and_store(report, report_date, started):
+        on_disk = isinstance(report, str)
+        name = os.path.basename(report) if on_disk else f"UserAcccountStatReport_{report_date.strftime('%Y%m%d')}.xlsx"
+        with stage("VAS", "parse"):
+            value = _parse_report(report, name)
+        record_extraction("VAS", value, business_date=report_date, duration=time.monotonic() - started,
+                          status="ok" if value is not None else "failed", run_id=run_id)
+        if on_disk:
+            try:
+                os.remove(report)
+            except OSError as e:
+                log_warning(f"Could not delete {report}: {e}")
+        return value
+
+    parser = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vas-parse")
+    driver = None
+    try:
+        with stage("VAS", "driver_startup"):
+            driver = driver_pool.acquire("vas", download_dir=download_dir)
+        with stage("VAS", "login"):
+            if not _resume_session(driver):
+                _login(driver)
+                _save_session(driver)
+                _open_report_page(driver)
+        for report_date in dates:
+            started = time.monotonic()
+            try:
+                with stage("VAS", "download"):
+                    report = _download_report(driver, report_date, download_dir)
+            except Exception as e:
+                log_error(f"VAS backfill: no report for {report_date}: {e}")
+                results[report_date] = None
+                record_extraction("VAS", None, business_date=report_date, duration=time.monotonic() - started,
+                                  status="failed", run_id=run_id)
+                # Start the next date from a fresh page; log in again if the session has expired
+                driver.get(VAS_REPORT_URL)
+                if "/auth/login" in driver.current_url:
+                    log_warning("VAS session expired during backfill; logging in again.")
+                    _login(driver)
+                    _save_session(driver)
+                _open_report_page(driver)
+                continue
+            # Parse this file while the browser fetches the next one
+            parsing[report_date] = parser.submit(_parse_and_store, report, report_date, started)
+    except Exception as e:
+        log_error(f"VAS backfill stopped: {e}")
+    finally:
+        try:
+            for report_date, future in parsing.items():
+                results[report_date] = future.result()
+            parser.shutdown()
+            if driver is not None:
+                driver_pool.release(driver)
+        finally:
+            end_run(run_id)
+
+    for report_date in dates:
+        results.setdefault(report_date, None)
+    fetched = sum(value is not None for value in results.values())
+    log_info(f"VAS backfill: {fetched} of {len(dates)} business date(s) stored.")
+    return dict(sorted(results.items()))
 
 # Run
 if __name__ == "__main__":
+    init_logging()
     login_vas()
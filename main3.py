@@ -1,209 +1,349 @@
 import os
+import re
+import json
 import time
+from urllib.parse import urljoin
 from dotenv import load_dotenv
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 # Import our custom logger
-from logger_config import log_info, log_debug, log_success, log_error, log_warning, log_wait
+from logger_config import init_logging, log_info, log_debug, log_success, log_error, log_warning, log_wait, LOG_PAGE_DUMPS
+from waits import wait_until, url_contains, element_present
+from driver_factory import driver_pool
+from timings import timed_stage, lap
+from dom_snapshot import element_snapshot, account_index, normalize_account
+from session_cache import session_cache, browser_cookies, restore_browser, origin_of, SESSION_CHECK_TIMEOUT
 
 # Load environment variables
 load_dotenv()
 CIMB_COMPANY_ID = os.getenv("CIMB_COMPANY_ID")
 CIMB_USERNAME = os.getenv("CIMB_USERNAME")
 CIMB_PASSWORD = os.getenv("CIMB_PASSWORD")
+CIMB_URL = os.getenv("CIMB_URL", "https://www.bizchannel.cimbthai.com/corp/common2/login.do?action=loginRequest")
+CIMB_ACCOUNT_NUMBER = os.getenv("CIMB_ACCOUNT_NUMBER", "7013252356")
+# Comma-separated accounts read from one Account Summary page; the report's CIMB balance is their total
+CIMB_ACCOUNT_NUMBERS = [n.strip() for n in os.getenv("CIMB_ACCOUNT_NUMBERS", CIMB_ACCOUNT_NUMBER).split(",") if n.strip()]
+# Where the Account Summary URL learned from the menu is kept ("" = always click through the menu)
+CIMB_SHORTCUT_PATH = os.getenv("CIMB_SHORTCUT_PATH",
+                               os.path.join(os.path.dirname(os.path.abspath(__file__)), "cimb_shortcut.json"))
+# How long a shortcut load may take before falling back to the menu clicks
+CIMB_SHORTCUT_TIMEOUT = float(os.getenv("CIMB_SHORTCUT_TIMEOUT_SECONDS", "10"))
 
-# Setup Chrome WebDriver (reuse logic from main2.py)
-def setup_driver(download_dir=None):
-    options = Options()
-    options.add_argument("--headless")  # Enable headless mode
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    prefs = {
-        "credentials_enable_service": False,
-        "profile.password_manager_enabled": False,
-        "profile.password_manager_leak_detection": False
-    }
-    if download_dir:
-        prefs["download.default_directory"] = os.path.abspath(download_dir)
-        prefs["download.prompt_for_download"] = False
-        prefs["directory_upgrade"] = True
-        prefs["safebrowsing.enabled"] = True
-    options.add_experimental_option("prefs", prefs)
-    options.add_argument("--disable-notifications")
-    options.add_argument("--disable-infobars")
-    options.add_argument("--disable-popup-blocking")
-    return webdriver.Chrome(options=options)
-
-# CIMB login and balance extraction (stub - update selectors as needed)
-def login_and_get_cimb_balance():
-    driver = setup_driver()
+# A URL in a menu link's onclick, e.g. goPage('/corp/front/accountsummary.do?action=accountSummaryRequest')
+ONCLICK_URL = re.compile(r"""['"]([^'"\s]*(?:\.do|\.jsp|\.html?|/)[^'"\s]*)['"]""")
+
+def _login(driver):
+    """Log in through the login page and wait for the frameset menu. False if the dashboard never appears."""
+    log_info("Navigating to CIMB login page...")
+    driver.get(CIMB_URL)
+    wait_until(driver, element_present(By.ID, "corpId"), timeout=10, label="cimb.login_form")
+    log_debug(f"Page title after loading login page: {driver.title}")
+    log_debug(f"Current URL: {driver.current_url}")
+
+    log_info("You may now manually press LOGOUT in the browser. Wait at least 10 seconds after the dashboard appears before logging out to ensure all debug info is printed.")
+
+    # Fill in CIMB login form with explicit error handling
+    try:
+        company_field = driver.find_element(By.ID, "corpId")
+        log_info("Found company ID field.")
+    except Exception as e:
+        log_error(f"Could not find company ID field (corpId): {e}")
+        return False
+    try:
+        user_field = driver.find_element(By.ID, "userName")
+        log_info("Found username field.")
+    except Exception as e:
+        log_error(f"Could not find username field (userName): {e}")
+        return False
+    try:
+        password_field = driver.find_element(By.ID, "passwordEncryption")
+        log_info("Found password field.")
+    except Exception as e:
+        log_error(f"Could not find password field (passwordEncryption): {e}")
+        return False
+    try:
+        login_button = driver.find_element(By.NAME, "submit1")
+        log_info("Found login button.")
+    except Exception as e:
+        log_error(f"Could not find login button (submit1): {e}")
+        return False
+    # Now fill and submit
+    company_field.send_keys(CIMB_COMPANY_ID)
+    user_field.send_keys(CIMB_USERNAME)
+    password_field.send_keys(CIMB_PASSWORD)
+    login_button.click()
+    log_info("Login submitted, waiting for dashboard...")
+    log_info("Login submitted, waiting for dashboard to load...")
     try:
-        log_info("Navigating to CIMB login page...")
-        driver.get("https://www.bizchannel.cimbthai.com/corp/common2/login.do?action=loginRequest")
-        time.sleep(2)
-        log_debug(f"Page title after loading login page: {driver.title}")
-        log_debug(f"Current URL: {driver.current_url}")
+        # Wait for URL to change to 'returnMain'
+        wait_until(driver, url_contains("returnMain"), timeout=60, label="cimb.dashboard_url")
+        log_success("URL changed to dashboard. Now waiting for frameset...")
+        # Wait for menuFrame to appear
+        wait_until(driver, element_present(By.NAME, "menuFrame"), timeout=60, label="cimb.frameset")
+        log_success("Frameset loaded, proceeding to frame navigation.")
+        log_wait("Dashboard loaded. Waiting for the menu to render...")
+        wait_until(driver, element_present(By.XPATH, "//div[contains(text(), 'Account Service')]", frame="menuFrame"),
+                   timeout=30, label="cimb.menu")
+    except Exception:
+        log_error("Dashboard did not load after login. Stopping.")
+        return False
+    return True
 
-        log_info("You may now manually press LOGOUT in the browser. Wait at least 10 seconds after the dashboard appears before logging out to ensure all debug info is printed.")
+def _resume_session(driver):
+    """Open the frameset with the cached CIMB session, skipping the login page and the returnMain wait."""
+    cached = session_cache.load("CIMB", CIMB_URL)
+    if cached is None or not cached["data"].get("main_url"):
+        return False
+    try:
+        restore_browser(driver, CIMB_URL, cached["cookies"])
+        driver.get(cached["data"]["main_url"])
+        wait_until(driver, element_present(By.XPATH, "//div[contains(text(), 'Account Service')]", frame="menuFrame"),
+                   timeout=SESSION_CHECK_TIMEOUT, label="cimb.session_resume")
+    except Exception:
+        log_info("Cached CIMB session is no longer valid; logging in.")
+        session_cache.discard("CIMB")
+        driver.delete_all_cookies()
+        return False
+    log_success("Reusing cached CIMB session; skipped login.")
+    return True
 
-        # Fill in CIMB login form with explicit error handling
-        try:
-            company_field = driver.find_element(By.ID, "corpId")
-            log_info("Found company ID field.")
-        except Exception as e:
-            log_error(f"Could not find company ID field (corpId): {e}")
-            return
-        try:
-            user_field = driver.find_element(By.ID, "userName")
-            log_info("Found username field.")
-        except Exception as e:
-            log_error(f"Could not find username field (userName): {e}")
-            return
-        try:
-            password_field = driver.find_element(By.ID, "passwordEncryption")
-            log_info("Found password field.")
-        except Exception as e:
-            log_error(f"Could not find password field (passwordEncryption): {e}")
-            return
-        try:
-            login_button = driver.find_element(By.NAME, "submit1")
-            log_info("Found login button.")
-        except Exception as e:
-            log_error(f"Could not find login button (submit1): {e}")
-            return
-        # Now fill and submit
-        company_field.send_keys(CIMB_COMPANY_ID)
-        user_field.send_keys(CIMB_USERNAME)
-        password_field.send_keys(CIMB_PASSWORD)
-        login_button.click()
-        log_info("Login submitted, waiting for dashboard...")
-        log_info("Login submitted, waiting for dashboard to load...")
+def account_summary_target(link, base_url):
+    """
+    The absolute Account Summary URL behind the menu link snapshot `link` (its href, or a
+    URL in its onclick), or None. Only targets on the CIMB portal itself are accepted.
+    """
+    candidates = [link.get("href") or ""]
+    candidates += ONCLICK_URL.findall(link.get("onclick") or "")
+    for candidate in candidates:
+        candidate = candidate.strip()
+        if not candidate or candidate.startswith(("#", "javascript:")):
+            continue
+        target = urljoin(base_url, candidate)
+        if origin_of(target) == origin_of(CIMB_URL):
+            return target
+    return None
+
+def load_shortcut():
+    """The Account Summary URL learned on an earlier run for this portal, or None."""
+    if not CIMB_SHORTCUT_PATH or not os.path.exists(CIMB_SHORTCUT_PATH):
+        return None
+    try:
+        with open(CIMB_SHORTCUT_PATH, encoding="utf-8") as f:
+            shortcut = json.load(f)
+    except (OSError, ValueError) as e:
+        log_warning(f"Could not read CIMB shortcut from {CIMB_SHORTCUT_PATH}: {e}")
+        return None
+    if shortcut.get("origin") != origin_of(CIMB_URL):
+        return None
+    return shortcut.get("target")
+
+def save_shortcut(target):
+    if not CIMB_SHORTCUT_PATH:
+        return
+    shortcut = {"origin": origin_of(CIMB_URL), "target": target,
+                "learned_at": time.strftime("%Y-%m-%dT%H:%M:%S%z")}
+    try:
+        tmp_path = CIMB_SHORTCUT_PATH + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(shortcut, f)
+        os.replace(tmp_path, CIMB_SHORTCUT_PATH)
+        log_debug(f"Learned CIMB Account Summary URL: {target}")
+    except OSError as e:
+        log_warning(f"Could not save CIMB shortcut to {CIMB_SHORTCUT_PATH}: {e}")
+
+def discard_shortcut():
+    try:
+        os.remove(CIMB_SHORTCUT_PATH)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        log_warning(f"Could not remove CIMB shortcut {CIMB_SHORTCUT_PATH}: {e}")
+
+def _open_account_summary_directly(driver, target, account_numbers):
+    """Load `target` straight into mainFrame and wait for the account list. False if it doesn't show up."""
+    try:
+        driver.switch_to.default_content()
+        driver.execute_script("window.frames['mainFrame'].location.href = arguments[0];", target)
+        wait_until(driver, element_present(By.XPATH, f"//a[contains(text(), '{account_numbers[0]}')]", frame="mainFrame"),
+                   timeout=CIMB_SHORTCUT_TIMEOUT, label="cimb.account_summary_shortcut")
+    except Exception as e:
+        log_info(f"Account Summary shortcut did not load ({type(e).__name__}); using the menu.")
+        discard_shortcut()
+        return False
+    log_success("Opened Account Summary directly; skipped the menu clicks.")
+    return True
+
+def _open_account_summary_via_menu(driver, account_numbers):
+    """Expand the menu and click 'Account Summary', learning its URL for the next run."""
+    # 1. Switch to menuFrame to click menu items
+    driver.switch_to.default_content()
+    driver.switch_to.frame("menuFrame")
+    log_info("Switched to menuFrame.")
+    # Click 'Account Service & Information Management'
+    menu_div = driver.find_element(By.XPATH, "//div[contains(text(), 'Account Service')]")
+    menu_div.click()
+    log_success("Clicked 'Account Service & Information Management' menu.")
+    log_wait("Clicked Account Service & Information Management. Waiting for Account Summary link...")
+    wait_until(driver, element_present(By.ID, "subs8"), timeout=15, label="cimb.account_summary_link")
+    # Print all <a> links in menuFrame after expanding menu (LOG_PAGE_DUMPS=1)
+    if LOG_PAGE_DUMPS:
+        log_debug("Links in menuFrame after expanding menu:")
+        for link in element_snapshot(driver, By.TAG_NAME, "a", ("href",)):
+            log_debug(f"Link {link['index']}: '{link['text']}' | href={link['href']}")
+    # Remember where 'Account Summary' goes, so the next run can load it directly
+    try:
+        for link in element_snapshot(driver, By.CSS_SELECTOR, "#subs8", ("href", "onclick")):
+            target = account_summary_target(link, driver.execute_script("return document.baseURI;"))
+            if target:
+                save_shortcut(target)
+                break
+        else:
+            log_debug("Account Summary link has no usable href or onclick URL; not learning a shortcut.")
+    except Exception as e:
+        log_debug(f"Could not learn the Account Summary URL: {e}")
+    # Click 'Account Summary' using its id
+    account_summary_link = driver.find_element(By.ID, "subs8")
+    account_summary_link.click()
+    log_success("Clicked 'Account Summary' link.")
+    log_wait("Clicked Account Summary. Waiting for the account list...")
+    wait_until(driver, element_present(By.XPATH, f"//a[contains(text(), '{account_numbers[0]}')]", frame="mainFrame"),
+               timeout=30, label="cimb.account_summary")
+
+def parse_account_summary(links, account_numbers):
+    """
+    {account number: available balance or None} for every account in `account_numbers`,
+    read from one snapshot of the Account Summary links (each account link is followed
+    by its balance link).
+    """
+    # Account number -> balance link, built once from the snapshot
+    index = account_index(links)
+    others = [number for number in index if number not in {normalize_account(n) for n in account_numbers}]
+    if others:
+        log_debug(f"Account Summary also lists: {', '.join(others)}")
+    balances = {}
+    for acct_number in account_numbers:
+        balance_link = index.get(normalize_account(acct_number))
+        if balance_link is None:
+            # Link text without a leading account number: fall back to a substring match
+            for idx, link in enumerate(links[:-1]):
+                if acct_number in link["text"]:
+                    balance_link = links[idx + 1]
+                    break
+        balances[acct_number] = None
+        if balance_link is None:
+            log_error(f"Could not find account {acct_number} or its balance link.")
+            continue
+        log_info(f"Found account {acct_number}, balance link at index {balance_link['index']}")
+        balance_text = balance_link["text"].replace(',', '')
         try:
-            # Wait for URL to change to 'returnMain'
-            WebDriverWait(driver, 60).until(
-                EC.url_contains("returnMain")
-            )
-            log_success("URL changed to dashboard. Now waiting for frameset...")
-            # Wait for menuFrame to appear
-            WebDriverWait(driver, 60).until(
-                lambda d: len(d.find_elements(By.NAME, "menuFrame")) > 0
-            )
-            log_success("Frameset loaded, proceeding to frame navigation.")
-            log_wait("Dashboard loaded. Waiting 5 seconds...")
-            time.sleep(5)
-        except Exception:
-            log_error("Dashboard did not load after login. Stopping.")
-            return None
+            balances[acct_number] = float(balance_text)
+            log_success(f"Extracted CIMB Available Balance for {acct_number}: {balances[acct_number]} THB")
+        except ValueError as e:
+            log_error(f"Could not parse balance '{balance_text}' for {acct_number} as float: {e}")
+    return balances
+
+def _extract_balances(account_numbers):
+    """Log in (or resume) once and read every account in `account_numbers`. None if the dashboard never loads."""
+    driver = None
+    try:
+        lap("driver_startup")
+        driver = driver_pool.acquire("cimb")
+        lap("login")
+        if not _resume_session(driver):
+            if not _login(driver):
+                return None
+        main_url = driver.current_url
 
         # --- Frame switching logic ---
-        cimb_balance = None
+        lap("navigation")
+        balances = {number: None for number in account_numbers}
         try:
-            # 1. Switch to menuFrame to click menu items
-            driver.switch_to.default_content()
-            driver.switch_to.frame("menuFrame")
-            log_wait("Switched to menuFrame. Waiting 5 seconds...")
-            time.sleep(5)
-            # Click 'Account Service & Information Management'
-            menu_div = driver.find_element(By.XPATH, "//div[contains(text(), 'Account Service')]")
-            menu_div.click()
-            log_success("Clicked 'Account Service & Information Management' menu.")
-            log_wait("Clicked Account Service & Information Management. Waiting 5 seconds...")
-            time.sleep(5)
-            # Print all <a> links in menuFrame after expanding menu
-            links = driver.find_elements(By.TAG_NAME, "a")
-            log_debug("Links in menuFrame after expanding menu:")
-            for idx, link in enumerate(links):
-                log_debug(f"Link {idx}: '{link.text.strip()}' | href={link.get_attribute('href')}")
-            # Click 'Account Summary' using its id
-            account_summary_link = driver.find_element(By.ID, "subs8")
-            account_summary_link.click()
-            log_success("Clicked 'Account Summary' link.")
-            log_wait("Clicked Account Summary. Waiting 10 seconds...")
-            time.sleep(10)
+            # Load the Account Summary URL learned on an earlier run; click through the menu if that fails
+            target = load_shortcut()
+            if target is None or not _open_account_summary_directly(driver, target, account_numbers):
+                _open_account_summary_via_menu(driver, account_numbers)
         except Exception:
             log_error("Could not find or click the menu or Account Summary in menuFrame.")
         try:
             # 2. Switch to mainFrame to extract account and balance
+            lap("parse")
             driver.switch_to.default_content()
             driver.switch_to.frame("mainFrame")
-            log_wait("Switched to mainFrame. Printing all <a> elements for debug...")
-            links = driver.find_elements(By.TAG_NAME, "a")
-            for idx, link in enumerate(links):
-                log_debug(f"Link {idx}: text='{link.text.strip()}', onclick='{link.get_attribute('onclick')}'")
-            log_wait("Now waiting up to 60 seconds for balance element...")
-            wait_start = time.time()
-            acct_number = os.getenv("CIMB_ACCOUNT_NUMBER", "7013252356")
-            cimb_balance = None
+            log_wait("Switched to mainFrame. Reading account links...")
+            # Text, href, onclick and position of every link in one round trip
+            links = element_snapshot(driver, By.TAG_NAME, "a", ("href", "onclick"))
+            for link in links:
+                log_debug(f"Link {link['index']}: text='{link['text']}', onclick='{link['onclick']}'")
             error_occurred = False
             try:
-                # Extraction block
-                acct_idx = None
-                for idx, link in enumerate(links):
-                    if acct_number in link.text:
-                        acct_idx = idx
-                        log_info(f"Found account link at index {acct_idx}: {link.text}")
-                        break
-                if acct_idx is not None and acct_idx + 1 < len(links):
-                    balance_link = links[acct_idx + 1]
-                    balance_text = balance_link.text.strip().replace(',', '')
-                    try:
-                        cimb_balance = float(balance_text)
-                        log_success(f"Extracted CIMB Available Balance for {acct_number}: {cimb_balance} THB")
-                    except Exception as e:
-                        log_error(f"Could not parse balance '{balance_text}' as float: {e}")
-                        error_occurred = True
-                    log_wait("Extracted balance. Waiting 5 seconds...")
-                    time.sleep(5)
-                else:
-                    log_error(f"Could not find account {acct_number} or its balance link.")
-                    error_occurred = True
+                balances = parse_account_summary(links, account_numbers)
+                error_occurred = None in balances.values()
             except Exception as e:
                 log_error(f"Error during extraction: {e}")
                 error_occurred = True
             finally:
-                # Logout logic
-                logout_success = False
-                for frame_name in ["topFrame", None]:
-                    try:
-                        driver.switch_to.default_content()
-                        if frame_name:
-                            driver.switch_to.frame(frame_name)
-                        log_info(f"[LOGOUT] Searching for logout link in {frame_name or 'default content'}...")
-                        logout_link = WebDriverWait(driver, 5).until(
-                            EC.element_to_be_clickable((By.XPATH, "//a[contains(@href, 'action=logout') or @onclick='logout()']"))
-                        )
-                        logout_link.click()
-                        log_success(f"Clicked logout link in {frame_name or 'default content'}.")
-                        # Wait for login page to reappear (by URL or login field)
-                        driver.switch_to.default_content()
-                        WebDriverWait(driver, 10).until(
-                            EC.presence_of_element_located((By.ID, "corpId"))
-                        )
-                        log_success("Logout confirmed: Login page detected.")
-                        logout_success = True
-                        break
-                    except Exception as e:
-                        log_warning(f"Could not find/click logout link in {frame_name or 'default content'}: {e}")
-                if not logout_success:
-                    log_warning("Logout could not be confirmed. Please check your session manually.")
-            if error_occurred:
-                return None
+                # Keep the session for the next run if it can be cached; otherwise log out
+                lap("logout")
+                if not error_occurred and session_cache.save("CIMB", CIMB_URL, browser_cookies(driver), {"main_url": main_url}):
+                    log_info("CIMB session cached for the next run; not logging out.")
+                else:
+                    # Logging out ends any cached session too
+                    session_cache.discard("CIMB")
+                    logout_success = False
+                    for frame_name in ["topFrame", None]:
+                        try:
+                            driver.switch_to.default_content()
+                            if frame_name:
+                                driver.switch_to.frame(frame_name)
+                            log_info(f"[LOGOUT] Searching for logout link in {frame_name or 'default content'}...")
+                            logout_link = wait_until(driver, EC.element_to_be_clickable((By.XPATH, "//a[contains(@href, 'action=logout') or @onclick='logout()']")),
+                                                     timeout=5, label="cimb.logout_link")
+                            logout_link.click()
+                            log_success(f"Clicked logout link in {frame_name or 'default content'}.")
+                            # Wait for login page to reappear (by URL or login field)
+                            driver.switch_to.default_content()
+                            wait_until(driver, element_present(By.ID, "corpId"), timeout=10, label="cimb.logout")
+                            log_success("Logout confirmed: Login page detected.")
+                            logout_success = True
+                            break
+                        except Exception as e:
+                            log_warning(f"Could not find/click logout link in {frame_name or 'default content'}: {e}")
+                    if not logout_success:
+                        log_warning("Logout could not be confirmed. Please check your session manually.")
         except Exception:
             log_error("Could not find or extract the account or balance in mainFrame.")
-        return cimb_balance
+        return balances
 
     except Exception as e:
         log_error(f"Error during CIMB login or scraping: {e}")
     finally:
-        # Do NOT close the browser automatically so user can inspect manually
-        pass
+        # Logged out above; hand the browser back to the pool (quit if the pool is closed)
+        if driver is not None:
+            driver_pool.release(driver)
+
+@timed_stage("CIMB")
+def login_and_get_cimb_balances(account_numbers=None):
+    """{account number: available balance or None} for every configured account, from one login."""
+    return _extract_balances(list(account_numbers or CIMB_ACCOUNT_NUMBERS))
+
+# CIMB login and balance extraction: the total of all configured accounts (the report's
+# CIMB source uses login_and_get_cimb_balances() so each account is stored and shown)
+@timed_stage("CIMB")
+def login_and_get_cimb_balance():
+    balances = _extract_balances(CIMB_ACCOUNT_NUMBERS)
+    if not balances or None in balances.values():
+        return None
+    if len(balances) > 1:
+        log_info("CIMB balances: " + ", ".join(f"{number}={balance:,.2f}" for number, balance in balances.items()))
+    return sum(balances.values())
 
 if __name__ == "__main__":
-    balance = login_and_get_cimb_balance()
-    if balance is not None:
-        log_success(f"CIMB Available Balance: {balance:,.2f} THB")
-    else:
+    init_logging()
+    balances = login_and_get_cimb_balances()
+    for number, balance in (balances or {}).items():
+        if balance is not None:
+            log_success(f"CIMB Available Balance for {number}: {balance:,.2f} THB")
+        else:
+            log_error(f"No CIMB balance found for {number}.")
+    if not balances:
         log_error("No CIMB balance found.")
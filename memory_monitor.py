@@ -0,0 +1,161 @@
+import os
+import sys
+import threading
+# Import our custom logger
+from logger_config import log_debug, log_error, log_warning
+from process_tree import process_table, child_map, tree_rss
+
+# Memory accounting for a report run: a background thread samples the resident memory
+# of this process plus its chromedriver/Chrome children, each source's own browser, and
+# (with MEMORY_TRACEMALLOC=1) the Python heap. Peaks are kept per source and per stage.
+MEMORY_MONITOR_ENABLED = os.getenv("MEMORY_MONITOR", "1").lower() not in ("0", "false", "no")
+MEMORY_SAMPLE_SECONDS = float(os.getenv("MEMORY_SAMPLE_SECONDS", "0.5"))
+# tracemalloc slows allocation-heavy code (Excel parsing) down, so heap tracing is opt-in
+MEMORY_TRACEMALLOC = os.getenv("MEMORY_TRACEMALLOC", "0").lower() in ("1", "true", "yes")
+# Fail the run if the process tree's RSS goes above this (0 = no budget)
+MEMORY_BUDGET_MB = float(os.getenv("MEMORY_BUDGET_MB", "0"))
+
+enabled = MEMORY_MONITOR_ENABLED
+
+def _browser_pids():
+    # {source: chromedriver pid} from the browser pool, if an extractor has loaded it (Selenium is never imported here)
+    driver_factory = sys.modules.get("driver_factory")
+    if driver_factory is None:
+        return {}
+    return driver_factory.driver_pool.browser_pids()
+
+def _mb(value):
+    return round(value / 2**20, 1) if value else None
+
+class MemoryMonitor(threading.Thread):
+    """
+    Samples memory every `interval` seconds until stop(). For each sample the process-tree
+    RSS and Python heap count towards the run's peak and towards every source and stage
+    running at that moment. Each source's own browser (chromedriver and its Chrome
+    processes) is counted separately. Stages shorter than the interval may have no sample.
+    """
+
+    def __init__(self, active_stages, interval=None, budget_mb=None, trace_heap=None):
+        super().__init__(name="memory-monitor", daemon=True)
+        self.active_stages = active_stages
+        self.interval = MEMORY_SAMPLE_SECONDS if interval is None else interval
+        self.budget = (MEMORY_BUDGET_MB if budget_mb is None else budget_mb) * 2**20
+        self.trace_heap = MEMORY_TRACEMALLOC if trace_heap is None else trace_heap
+        self.peak_rss = 0
+        self.peak_heap = 0
+        self.sources = {}
+        self.over_budget = False
+        self._started_tracing = False
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._proc = os.path.isdir("/proc")
+
+    def start(self):
+        if self.trace_heap:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+        super().start()
+
+    def _heap(self):
+        """(current, peak since the last sample) of the traced Python heap, in bytes."""
+        if not self.trace_heap:
+            return 0, 0
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            return 0, 0
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        return current, peak
+
+    def sample(self):
+        if self._proc:
+            processes = process_table()
+            children = child_map(processes)
+            rss = tree_rss(processes, children, os.getpid())
+            browsers = {source.upper(): tree_rss(processes, children, pid) for source, pid in _browser_pids().items()}
+        else:
+            import resource
+            # ru_maxrss is in KiB on Linux and bytes on macOS; only the peak is available
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+            browsers = {}
+        # The run's peak includes spikes between samples; stages get the heap size at their own samples
+        heap, heap_peak = self._heap()
+        with self._lock:
+            self.peak_rss = max(self.peak_rss, rss)
+            self.peak_heap = max(self.peak_heap, heap_peak)
+            for source, stage in self.active_stages().items():
+                data = self.sources.setdefault(source, {"rss": 0, "heap": 0, "browser": 0, "stages": {}})
+                stage_data = data["stages"].setdefault(stage, {"rss": 0, "heap": 0, "browser": 0})
+                for target in (data, stage_data):
+                    target["rss"] = max(target["rss"], rss)
+                    target["heap"] = max(target["heap"], heap)
+                    target["browser"] = max(target["browser"], browsers.get(source, 0))
+        if self.budget and rss > self.budget and not self.over_budget:
+            self.over_budget = True
+            log_error(f"Memory budget exceeded: {_mb(rss)} MB RSS (budget {_mb(self.budget)} MB) "
+                      f"while running {self.active_stages() or 'no stage'}.")
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.sample()
+            except Exception as e:
+                log_warning(f"Memory sample failed: {e}")
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        """Stop sampling (with one final sample) and return summary()."""
+        self._stop_event.set()
+        self.join()
+        try:
+            self.sample()
+        except Exception as e:
+            log_warning(f"Memory sample failed: {e}")
+        if self._started_tracing:
+            import tracemalloc
+            tracemalloc.stop()
+        return self.summary()
+
+    def summary(self):
+        """Peaks in MB for the run, each source and each stage, plus the budget outcome."""
+        with self._lock:
+            return {
+                "peak_rss_mb": _mb(self.peak_rss),
+                "peak_heap_mb": _mb(self.peak_heap),
+                "budget_mb": _mb(self.budget),
+                "over_budget": self.over_budget,
+                "sources": {
+                    source: {
+                        "peak_rss_mb": _mb(data["rss"]),
+                        "peak_heap_mb": _mb(data["heap"]),
+                        "browser_rss_mb": _mb(data["browser"]),
+                        "stages": {
+                            stage: {"peak_rss_mb": _mb(s["rss"]), "peak_heap_mb": _mb(s["heap"]),
+                                    "browser_rss_mb": _mb(s["browser"])}
+                            for stage, s in data["stages"].items()
+                        },
+                    }
+                    for source, data in self.sources.items()
+                },
+            }
+
+def start(active_stages):
+    """Start monitoring a run (if enabled). `active_stages` returns {source: stage} for the run's stages running now."""
+    if not enabled:
+        return None
+    monitor = MemoryMonitor(active_stages)
+    monitor.start()
+    log_debug(f"Memory monitor started (every {monitor.interval}s, heap tracing {'on' if monitor.trace_heap else 'off'}).")
+    return monitor
+
+def stop(monitor):
+    """Stop `monitor` and return its summary (None if monitoring was off)."""
+    if monitor is None:
+        return None
+    return monitor.stop()
+
+def over_budget(monitor):
+    """True if the run `monitor` watches has gone over MEMORY_BUDGET_MB."""
+    return monitor is not None and monitor.over_budget
@@ -0,0 +1,198 @@
+import asyncio
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import pytz
+# Import our custom logger
+from logger_config import log_info, log_success, log_error, log_warning
+from sources import COST_BROWSER, plan_sources, account_source, account_total
+
+# asyncio building blocks for a report run: every source is a task, blocking
+# Selenium/HTTP/SendGrid work runs in executor threads, each task has its own deadline.
+
+BANGKOK_TZ = pytz.timezone("Asia/Bangkok")
+
+class DeadlineExceeded(TimeoutError):
+    """A blocking task ran past its deadline (the extractor's own TimeoutErrors are not this)."""
+
+async def run_blocking(func, *args, executor=None, timeout=None, on_done=None):
+    """
+    Await `func(*args)` running in `executor` (default: the loop's). The `timeout`
+    deadline starts when a worker thread picks the call up, so waiting for a free
+    worker does not count against it. On timeout (DeadlineExceeded) or cancellation
+    the await ends at once; a call that has not started yet is dropped, one that is
+    already running cannot be interrupted and finishes in the background. `func` runs in
+    a copy of the caller's context, so it belongs to the caller's run (timings).
+    `on_done()` is called exactly once when `func` has really returned (on its worker
+    thread, possibly after the await has given up) or when the call was dropped.
+    """
+    loop = asyncio.get_running_loop()
+    started = asyncio.Event()
+    context = contextvars.copy_context()
+    # "pending" until a worker takes the call ("running") or it is given up first ("dropped")
+    state = {"value": "pending"}
+    state_lock = threading.Lock()
+
+    def _done():
+        if on_done is not None:
+            try:
+                on_done()
+            except Exception as e:
+                log_warning(f"Cleanup after {getattr(func, '__name__', 'task')} failed: {e}")
+
+    def _call():
+        with state_lock:
+            if state["value"] == "dropped":
+                return None
+            state["value"] = "running"
+        try:
+            try:
+                loop.call_soon_threadsafe(started.set)
+            except RuntimeError:
+                return None  # The loop is gone; nobody is waiting for this result any more
+            return context.run(func, *args)
+        finally:
+            _done()
+
+    future = loop.run_in_executor(executor, _call)
+    try:
+        if timeout is None:
+            return await future
+        waiter = asyncio.ensure_future(started.wait())
+        try:
+            await asyncio.wait({waiter, future}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            waiter.cancel()
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            if future.done():
+                raise  # func itself raised TimeoutError
+            raise DeadlineExceeded(f"{getattr(func, '__name__', 'task')} did not finish within {timeout:.0f}s") from None
+    finally:
+        if not future.done():
+            future.cancel()
+        with state_lock:
+            dropped = state["value"] == "pending"
+            if dropped:
+                state["value"] = "dropped"
+        if dropped:
+            _done()
+
+async def extract_source(name, extractor, executor=None, timeout=None, on_result=None, on_done=None):
+    """
+    Run one blocking balance extractor as an awaitable. Returns (balance, extracted_at),
+    or (None, None) if it failed or missed its deadline. `on_result(name, balance,
+    extracted_at, duration, status)` is called with status "ok", "failed", "error",
+    "timeout" or "cancelled". `on_done` is passed to run_blocking().
+    """
+    started = {}
+
+    def _extract():
+        started["at"] = time.monotonic()
+        log_info(f"Extracting {name} balance...")
+        return extractor()
+
+    def _report(balance, extracted_at, status):
+        if on_result is None:
+            return
+        duration = time.monotonic() - started["at"] if "at" in started else None
+        try:
+            on_result(name, balance, extracted_at, duration, status)
+        except Exception as e:
+            log_warning(f"Could not record {name} result: {e}")
+
+    balance, status = None, "failed"
+    try:
+        balance = await run_blocking(_extract, executor=executor, timeout=timeout, on_done=on_done)
+    except DeadlineExceeded:
+        log_error(f"{name} extraction timed out after {timeout:.0f} seconds.")
+        status = "timeout"
+    except asyncio.CancelledError:
+        log_warning(f"{name} extraction cancelled.")
+        _report(None, None, "cancelled")
+        raise
+    except Exception as e:
+        log_error(f"{name} extraction raised an error: {e}")
+        status = "error"
+    else:
+        if balance is None:
+            log_error(f"Could not extract {name} balance.")
+
+    if balance is None:
+        _report(None, None, status)
+        return None, None
+    extracted_at = datetime.now(BANGKOK_TZ)
+    log_success(f"Extracted {name} Balance: {balance:,.2f} THB at {extracted_at.strftime('%Y-%m-%d %H:%M:%S %Z')}")
+    _report(balance, extracted_at, "ok")
+    return balance, extracted_at
+
+async def extract_sources(sources, max_workers, browser_slots, timeout=None, on_result=None, convert=None, business_date=None):
+    """
+    Extract BalanceSources concurrently on a dedicated pool of `max_workers` threads and
+    return {name: (balance, extracted_at)} once all of them have finished or timed out.
+    Sources start in plan_sources() order (cheap HTTP sources first), wait for the sources
+    they depend on, and browser sources hold one of `browser_slots` while they run.
+    `timeout` applies to sources that do not declare their own; `convert` is applied
+    to each raw result; dated sources are asked for `business_date` (default: their own).
+    Cancelling the caller cancels every source still running. A source returning
+    {account: balance} counts as their total, and each account is passed to `on_result`
+    as "<source>/<account>" (with no duration of its own) after the source itself.
+    """
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="extract")
+    browsers = asyncio.Semaphore(browser_slots)
+    tasks = {}
+
+    async def _run(source):
+        for dependency in source.depends_on:
+            task = tasks.get(dependency)
+            if task is not None and (await asyncio.shield(task))[0] is None:
+                log_warning(f"Skipping {source.name}: {dependency} did not return a balance.")
+                if on_result is not None:
+                    on_result(source.name, None, None, None, "skipped")
+                return None, None
+        found = {}
+
+        def extractor():
+            balance = source.extract(business_date)
+            if isinstance(balance, dict):
+                # A source made of several accounts: keep each one, report their total
+                found["accounts"] = {account: value if convert is None else convert(value) for account, value in balance.items()}
+                return account_total(found["accounts"])
+            return balance if convert is None else convert(balance)
+        deadline = timeout if source.timeout is None else source.timeout
+        result = await _extract(source, extractor, deadline)
+        if found.get("accounts") and on_result is not None:
+            extracted_at = result[1] or datetime.now(BANGKOK_TZ)
+            for account, value in found["accounts"].items():
+                on_result(account_source(source.name, account), value, extracted_at, None,
+                          "ok" if value is not None else "failed")
+        return result
+
+    async def _extract(source, extractor, deadline):
+        if source.cost == COST_BROWSER:
+            # The slot is freed when the extractor's thread returns, not when its deadline passes:
+            # an overrunning extractor still holds its browser, and the next source would only
+            # wait for that inside driver_pool.acquire() on its own deadline
+            await browsers.acquire()
+            loop = asyncio.get_running_loop()
+
+            def _free_slot():
+                try:
+                    loop.call_soon_threadsafe(browsers.release)
+                except RuntimeError:
+                    pass  # The run is over; nobody is waiting for the slot
+            return await extract_source(source.name, extractor, executor, deadline, on_result, on_done=_free_slot)
+        return await extract_source(source.name, extractor, executor, deadline, on_result)
+
+    try:
+        # Tasks start in creation order, so the plan decides who gets a worker first
+        for source in plan_sources(sources):
+            tasks[source.name] = asyncio.create_task(_run(source), name=f"extract-{source.name}")
+        await asyncio.gather(*tasks.values())
+        return {source.name: tasks[source.name].result() for source in sources}
+    finally:
+        # Don't block on a source that overran its deadline
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,80 @@
+import os
+import glob
+
+# Small /proc readers shared by the memory monitor (RSS of process trees) and the
+# browser supervisor (finding and killing Chrome trees). Linux only: on other systems
+# the tables are empty and every process looks gone.
+
+def process_table():
+    """pid -> (ppid, resident bytes) for every process we can read."""
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    processes = {}
+    for stat_path in glob.glob("/proc/[0-9]*/stat"):
+        try:
+            with open(stat_path) as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name can contain spaces; fields after it are fixed
+        fields = stat[stat.rfind(")") + 2:].split()
+        processes[int(stat_path.split("/")[2])] = (int(fields[1]), int(fields[21]) * page_size)
+    return processes
+
+def child_map(processes):
+    """ppid -> [pid, ...] for a process_table()."""
+    children = {}
+    for pid, (ppid, _) in processes.items():
+        children.setdefault(ppid, []).append(pid)
+    return children
+
+def tree_rss(processes, children, root):
+    """Resident bytes of `root` and everything under it, from process_table() and child_map()."""
+    total, stack = 0, [root]
+    while stack:
+        pid = stack.pop()
+        if pid in processes:
+            total += processes[pid][1]
+        stack.extend(children.get(pid, ()))
+    return total
+
+def descendants(root, processes=None):
+    """Pids of every process under `root` (not `root` itself), parents before their children."""
+    processes = process_table() if processes is None else processes
+    children = child_map(processes)
+    found, queue = [], list(children.get(root, ()))
+    while queue:
+        pid = queue.pop(0)
+        found.append(pid)
+        queue.extend(children.get(pid, ()))
+    return found
+
+def process_tree_rss(root=None):
+    """Resident memory in bytes of `root` (default: this process) and all its descendants, e.g. chromedriver and Chrome."""
+    processes = process_table()
+    return tree_rss(processes, child_map(processes), root or os.getpid())
+
+def cmdline(pid):
+    """The command line of `pid` as a list of arguments ([] if it is gone or unreadable)."""
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            return f.read().decode("utf-8", "replace").split("\0")
+    except OSError:
+        return []
+
+def parent(pid):
+    """The parent pid of `pid`, or None."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            stat = f.read()
+        return int(stat[stat.rfind(")") + 2:].split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+
+def alive(pid):
+    """True if `pid` exists and has not exited (a zombie has)."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            stat = f.read()
+    except OSError:
+        return False
+    return stat[stat.rfind(")") + 2:stat.rfind(")") + 3] != "Z"
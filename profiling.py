@@ -0,0 +1,154 @@
+import os
+import time
+import shutil
+import threading
+# Import our custom logger
+from logger_config import log_debug, log_info, log_warning, LOG_DIR
+
+# Opt-in profiling (PROFILE_RUNS=1 or `cli.py run --profile`): each report run and every
+# timed stage is profiled with cProfile and written as a pstats file:
+#   <PROFILE_DIR>/<run_id>/<source>.<stage>.pstats   (+ summary.txt for the run)
+# Open one with `python -m pstats FILE` or snakeviz.
+PROFILE_ENABLED = os.getenv("PROFILE_RUNS", "0").lower() in ("1", "true", "yes")
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(LOG_DIR, "profiles"))
+# Profiles of older runs are deleted, keeping this many run directories
+PROFILE_KEEP_RUNS = int(os.getenv("PROFILE_KEEP_RUNS", "20"))
+# Functions listed per table in summary.txt
+PROFILE_TOP = int(os.getenv("PROFILE_TOP", "15"))
+
+enabled = PROFILE_ENABLED
+_local = threading.local()
+
+def start(source, name):
+    """
+    Start profiling stage `name` of `source` on this thread. Returns a token for stop(),
+    or None if profiling is off or this thread already has a profile running (an outer
+    stage's profile then includes this one).
+    """
+    if not enabled or getattr(_local, "active", None) is not None:
+        return None
+    import cProfile
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:
+        # Another profiler (a debugger, coverage) owns this thread
+        log_debug(f"Not profiling {source}.{name}: {e}")
+        return None
+    _local.active = {"source": source, "name": name, "profiler": profiler, "thread": threading.get_ident()}
+    return _local.active
+
+def stop(token, run_id=None):
+    """Stop the profile started by start() and write it. Returns the file path, or None."""
+    if token is None:
+        return None
+    if token["thread"] != threading.get_ident():
+        # cProfile only profiles the thread that enabled it, and only that thread can stop it
+        log_debug(f"Profile of {token['source']}.{token['name']} was not stopped on its own thread; dropped.")
+        return None
+    token["profiler"].disable()
+    _local.active = None
+    run_dir = os.path.join(PROFILE_DIR, run_id or "no-run")
+    base = os.path.join(run_dir, f"{token['source']}.{token['name']}")
+    path, count = base + ".pstats", 1
+    # A stage can run more than once per run (retries, backfill dates)
+    while os.path.exists(path):
+        count += 1
+        path = f"{base}.{count}.pstats"
+    try:
+        os.makedirs(run_dir, exist_ok=True)
+        token["profiler"].dump_stats(path)
+    except OSError as e:
+        log_warning(f"Could not write profile {path}: {e}")
+        return None
+    return path
+
+def _label(function):
+    filename, line, name = function
+    if filename == "~":
+        return name  # Built-in, e.g. "<method 'recv_into' of '_socket.socket' objects>"
+    return f"{os.path.basename(filename)}:{line}({name})"
+
+def _table(title, rows):
+    lines = [title, f"  {'ncalls':>9} {'tottime':>9} {'cumtime':>9}  function"]
+    for function, (_, ncalls, tottime, cumtime, _) in rows:
+        lines.append(f"  {ncalls:>9} {tottime:>9.3f} {cumtime:>9.3f}  {_label(function)}")
+    return lines
+
+def summarize(run_id, top=None):
+    """
+    Write <run dir>/summary.txt: the slowest functions of the run by cumulative and by own
+    time (all stages together), then each stage's total. Returns the summary path, or None.
+    """
+    run_dir = os.path.join(PROFILE_DIR, run_id or "no-run")
+    try:
+        files = sorted(name for name in os.listdir(run_dir) if name.endswith(".pstats"))
+    except FileNotFoundError:
+        return None
+    if not files:
+        return None
+    import pstats
+    top = top or PROFILE_TOP
+    lines = [f"Run {run_id}: {len(files)} profile(s) in {run_dir}", ""]
+    combined = None
+    stage_totals = []
+    for name in files:
+        try:
+            stats = pstats.Stats(os.path.join(run_dir, name))
+        except (OSError, TypeError, ValueError) as e:
+            log_warning(f"Could not read profile {name}: {e}")
+            continue
+        stage_totals.append((name[:-len(".pstats")], stats.total_tt))
+        if combined is None:
+            combined = stats
+        else:
+            combined.add(stats)
+    if combined is None:
+        return None
+    entries = list(combined.stats.items())
+    by_cumulative = sorted(entries, key=lambda item: item[1][3], reverse=True)[:top]
+    by_own = sorted(entries, key=lambda item: item[1][2], reverse=True)[:top]
+    lines += _table(f"Top {top} functions by cumulative time:", by_cumulative) + [""]
+    # Own time shows where the time actually went: Python work, or waiting on sockets/locks (WebDriver, HTTP)
+    lines += _table(f"Top {top} functions by own time:", by_own) + [""]
+    lines.append("Profiled time per stage (s):")
+    lines += [f"  {total:>9.3f}  {name}" for name, total in sorted(stage_totals, key=lambda item: -item[1])]
+    path = os.path.join(run_dir, "summary.txt")
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+    except OSError as e:
+        log_warning(f"Could not write profile summary {path}: {e}")
+        return None
+    slowest = ", ".join(f"{_label(function)} {stat[3]:.1f}s" for function, stat in by_cumulative[:5])
+    log_info(f"Profile: {path} (top cumulative: {slowest})")
+    return path
+
+def prune(keep=None):
+    """Delete all but the `keep` most recent run directories under PROFILE_DIR."""
+    keep = PROFILE_KEEP_RUNS if keep is None else keep
+    try:
+        runs = [entry for entry in os.scandir(PROFILE_DIR) if entry.is_dir()]
+    except FileNotFoundError:
+        return []
+    runs.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    removed = []
+    for entry in runs[keep:]:
+        try:
+            shutil.rmtree(entry.path)
+            removed.append(entry.name)
+        except OSError as e:
+            log_warning(f"Could not delete old profiles {entry.path}: {e}")
+    if removed:
+        log_debug(f"Deleted profiles of {len(removed)} old run(s).")
+    return removed
+
+def finish_run(run_id):
+    """Summarize the run's profiles and apply the retention limit."""
+    if not enabled:
+        return None
+    started = time.monotonic()
+    path = summarize(run_id)
+    prune()
+    log_debug(f"Profile summary took {time.monotonic() - started:.2f}s")
+    return path
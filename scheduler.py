@@ -0,0 +1,180 @@
+import os
+import json
+import time
+import threading
+from datetime import datetime, timedelta, time as dt_time
+import pytz
+# Import our custom logger
+from logger_config import log_info, log_debug, log_success, log_error, log_warning
+
+BANGKOK_TZ = pytz.timezone("Asia/Bangkok")
+# Remembers the last successful day and pending retries across restarts
+SCHEDULER_STATE_PATH = os.getenv("SCHEDULER_STATE_PATH",
+                                 os.path.join(os.path.dirname(os.path.abspath(__file__)), "scheduler_state.json"))
+# Longest single sleep; the wall clock is re-read after each one so clock jumps are noticed
+MAX_SLEEP_SECONDS = 60.0
+# A sleep that overshoots by more than this is treated as a clock jump or suspend
+CLOCK_JUMP_TOLERANCE = 5.0
+
+RUN = "run"
+RETRY = "retry"
+
+class DailySchedule:
+    """
+    When the daily report is due: once a day at `run_at`, then after a failure on the
+    next full hour until `retry_until`. A run that was missed (process down, clock
+    jumped forward) is due immediately as long as the retry window has not closed.
+    """
+
+    def __init__(self, run_at=dt_time(2, 1), retry_until=dt_time(9, 1), tz=BANGKOK_TZ, state_path=None):
+        self.run_at = run_at
+        self.retry_until = retry_until
+        self.tz = tz
+        self.state_path = state_path if state_path is not None else SCHEDULER_STATE_PATH
+        self.last_success_date = None
+        self.last_attempt = None
+        self.retry_pending = False
+        self.load()
+
+    def _at(self, day, clock):
+        return self.tz.localize(datetime.combine(day, clock))
+
+    def next_due(self, now):
+        """Return (instant, kind) of the next run; kind is RUN or RETRY. `instant` may be <= now (due now)."""
+        today = now.date()
+        run_today = self._at(today, self.run_at)
+        retry_end = self._at(today, self.retry_until)
+        tomorrow = (self._at(today + timedelta(days=1), self.run_at), RUN)
+
+        if self.last_success_date == today:
+            return tomorrow
+        if self.retry_pending and self.last_attempt is not None and self.last_attempt.date() == today:
+            # Next full hour after the failed attempt
+            next_hour = self.last_attempt.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+            next_hour = self.tz.normalize(next_hour)
+            if next_hour < retry_end:
+                return next_hour, RETRY
+            return tomorrow
+        if self.last_attempt is not None and self.last_attempt.date() == today and not self.retry_pending:
+            return tomorrow  # Gave up for today
+        if now < run_today:
+            return run_today, RUN
+        if now < retry_end:
+            return now, RUN  # Missed today's run (restart or clock jump): catch up now
+        return tomorrow
+
+    def record(self, started, success):
+        """Update the schedule after a run that started at `started`."""
+        self.last_attempt = started
+        if success:
+            self.last_success_date = started.date()
+            self.retry_pending = False
+        else:
+            self.retry_pending = started < self._at(started.date(), self.retry_until)
+        self.save()
+
+    def give_up(self):
+        self.retry_pending = False
+        self.save()
+
+    def load(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("last_success_date"):
+                self.last_success_date = datetime.strptime(state["last_success_date"], "%Y-%m-%d").date()
+            if state.get("last_attempt"):
+                self.last_attempt = datetime.fromisoformat(state["last_attempt"]).astimezone(self.tz)
+            self.retry_pending = bool(state.get("retry_pending"))
+            log_debug(f"Scheduler state loaded from {self.state_path}: {state}")
+        except (OSError, ValueError) as e:
+            log_warning(f"Could not read scheduler state from {self.state_path}: {e}")
+
+    def save(self):
+        if not self.state_path:
+            return
+        state = {
+            "last_success_date": self.last_success_date.isoformat() if self.last_success_date else None,
+            "last_attempt": self.last_attempt.isoformat() if self.last_attempt else None,
+            "retry_pending": self.retry_pending,
+        }
+        try:
+            tmp_path = self.state_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            log_warning(f"Could not save scheduler state to {self.state_path}: {e}")
+
+def sleep_until(instant, now_fn, stop_event=None, max_sleep=MAX_SLEEP_SECONDS):
+    """
+    Sleep until wall-clock `instant`. Sleeps in chunks of at most `max_sleep` seconds and
+    re-reads the clock after each, so NTP corrections and suspends move the wake-up with
+    the clock. Returns False if `stop_event` was set, True otherwise.
+    """
+    stop_event = stop_event or threading.Event()
+    while True:
+        remaining = (instant - now_fn()).total_seconds()
+        if remaining <= 0:
+            return True
+        chunk = min(remaining, max_sleep)
+        started = time.monotonic()
+        if stop_event.wait(chunk):
+            return False
+        overshoot = time.monotonic() - started - chunk
+        if overshoot > CLOCK_JUMP_TOLERANCE:
+            log_warning(f"Scheduler slept {overshoot:.0f}s longer than asked (suspend or clock jump); re-checking schedule.")
+
+def run_scheduler(job, schedule=None, now_fn=None, stop_event=None, warmup=None, warmup_lead=timedelta(seconds=60), idle=None):
+    """
+    Run `job()` (returns True on success) whenever `schedule` says it is due. Sleeps
+    until exactly the next due instant instead of polling. `warmup()` is called
+    `warmup_lead` before a scheduled run; `idle()` once nothing else is due today.
+    Returns when `stop_event` is set.
+    """
+    schedule = schedule or DailySchedule()
+    now_fn = now_fn or (lambda: datetime.now(schedule.tz))
+    stop_event = stop_event or threading.Event()
+    warmed_for = None
+
+    while not stop_event.is_set():
+        now = now_fn()
+        due, kind = schedule.next_due(now)
+        if due.date() != now.date() and idle is not None:
+            idle()
+        if due > now:
+            log_info(f"Next {'retry' if kind == RETRY else 'scheduled run'} at {due.strftime('%Y-%m-%d %H:%M:%S %Z')} "
+                     f"(in {(due - now).total_seconds() / 60:.0f} min)")
+            # Pre-start browsers shortly before a scheduled run
+            if warmup is not None and kind == RUN and warmed_for != due:
+                if not sleep_until(due - warmup_lead, now_fn, stop_event):
+                    break
+                if schedule.next_due(now_fn())[0] != due:
+                    continue  # The clock moved; work the schedule out again
+                log_info("Pre-starting browsers for the scheduled run...")
+                warmup()
+                warmed_for = due
+            if not sleep_until(due, now_fn, stop_event):
+                break
+            now = now_fn()
+            due, kind = schedule.next_due(now)
+            if due > now:
+                continue  # Clock went backwards while sleeping
+        started = now_fn()
+        log_info(f"Starting {'retry' if kind == RETRY else 'scheduled daily run'} at {started.strftime('%Y-%m-%d %H:%M:%S')}")
+        try:
+            success = bool(job())
+        except Exception as e:
+            log_error(f"Report run raised an error: {e}")
+            success = False
+        schedule.record(started, success)
+        if success:
+            log_success("Report completed successfully")
+        elif schedule.retry_pending and schedule.next_due(now_fn())[1] == RETRY:
+            log_warning("Report run failed. Will retry on the next hour.")
+        else:
+            log_warning(f"Report run failed and the retry window (until {schedule.retry_until.strftime('%H:%M')}) is over. "
+                        "Will not retry until the next scheduled run.")
+            schedule.give_up()
@@ -0,0 +1,205 @@
+import os
+import json
+import time
+import threading
+from urllib.parse import urlsplit
+# Import our custom logger
+from logger_config import log_debug, log_info, log_warning
+
+# Encrypted on-disk cache of portal sessions (cookies plus a few URLs), one file per source.
+# The extractors try a cached session first and only go through the login page if it is gone.
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+SESSION_CACHE_DIR = os.getenv("SESSION_CACHE_DIR", os.path.join(PROJECT_DIR, "sessions"))
+# Fernet key (urlsafe base64, 32 bytes). If unset, one is generated into SESSION_CACHE_KEY_FILE,
+# which must be outside SESSION_CACHE_DIR: a copy of the cache directory alone can't be decrypted
+SESSION_CACHE_KEY = os.getenv("SESSION_CACHE_KEY")
+SESSION_CACHE_KEY_FILE = os.getenv("SESSION_CACHE_KEY_FILE",
+                                   os.path.join(os.path.expanduser("~"), ".config", "daily-float-report", "session-cache.key"))
+SESSION_CACHE_ENABLED = os.getenv("SESSION_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+# Longest a cached session is trusted; <NAME>_SESSION_TTL_SECONDS overrides it per source
+SESSION_CACHE_TTL_SECONDS = float(os.getenv("SESSION_CACHE_TTL_SECONDS", "3600"))
+# How long an extractor waits for a page behind a cached session before logging in normally
+SESSION_CHECK_TIMEOUT = float(os.getenv("SESSION_CHECK_TIMEOUT_SECONDS", "5"))
+
+COOKIE_FIELDS = ("name", "value", "domain", "path", "secure", "httpOnly", "expiry")
+
+def origin_of(url):
+    """'https://host:443/a/b?c' -> 'https://host:443'; a cached session only belongs to the portal it came from."""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+class SessionCache:
+    """
+    Cookies and session data per source, encrypted with Fernet and stored with an expiry.
+
+    Entries are bound to the portal's origin, so a session from the benchmark fixtures
+    or another environment is never sent to the real portal. Every failure (missing
+    `cryptography`, bad key, corrupt file) just means "no cached session". The key is
+    `key`, or read from (or generated into) `key_file`, which may not be in `directory`.
+    """
+
+    def __init__(self, directory=None, key=None, ttl=None, enabled=None, key_file=None):
+        self.directory = directory or SESSION_CACHE_DIR
+        self.ttl = SESSION_CACHE_TTL_SECONDS if ttl is None else ttl
+        self.enabled = SESSION_CACHE_ENABLED if enabled is None else enabled
+        self.key_file = key_file or SESSION_CACHE_KEY_FILE
+        self._key = key or SESSION_CACHE_KEY
+        self._fernet = None
+        self._lock = threading.Lock()
+
+    def _path(self, source):
+        return os.path.join(self.directory, f"{source.lower()}.session")
+
+    def _cipher(self):
+        if self._fernet is not None:
+            return self._fernet
+        try:
+            # Only needed once a session is cached
+            from cryptography.fernet import Fernet
+        except ImportError:
+            log_warning("Session cache disabled: the 'cryptography' package is not installed.")
+            self.enabled = False
+            return None
+        with self._lock:
+            if self._fernet is None:
+                try:
+                    self._fernet = Fernet(self._key or self._load_or_create_key(Fernet))
+                except (ValueError, OSError) as e:
+                    log_warning(f"Session cache disabled: no usable key ({e}).")
+                    self.enabled = False
+                    return None
+        return self._fernet
+
+    def _load_or_create_key(self, fernet_class):
+        key_path = os.path.abspath(self.key_file)
+        directory = os.path.abspath(self.directory)
+        if os.path.commonpath([key_path, directory]) == directory:
+            raise ValueError(f"key file {key_path} is inside the cache directory; set SESSION_CACHE_KEY_FILE "
+                             f"outside {directory} or set SESSION_CACHE_KEY")
+        if os.path.exists(key_path):
+            with open(key_path, "rb") as f:
+                return f.read().strip()
+        os.makedirs(os.path.dirname(key_path), mode=0o700, exist_ok=True)
+        key = fernet_class.generate_key()
+        # Readable by this user only
+        fd = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(key)
+        log_info(f"Generated session cache key at {key_path}")
+        return key
+
+    def ttl_for(self, source):
+        value = os.getenv(f"{source.upper()}_SESSION_TTL_SECONDS")
+        return float(value) if value else self.ttl
+
+    def load(self, source, url):
+        """The cached {"cookies": [...], "data": {...}} for `source` at `url`'s origin, or None."""
+        if not self.enabled:
+            return None
+        path = self._path(source)
+        if not os.path.exists(path):
+            return None
+        cipher = self._cipher()
+        if cipher is None:
+            return None
+        try:
+            from cryptography.fernet import InvalidToken
+            with open(path, "rb") as f:
+                token = f.read()
+            # Fernet tokens carry their creation time, so the TTL is also checked cryptographically
+            entry = json.loads(cipher.decrypt(token, ttl=int(self.ttl_for(source))))
+        except (InvalidToken, OSError, ValueError) as e:
+            log_debug(f"Cached {source} session unusable ({type(e).__name__}); discarding it.")
+            self.discard(source)
+            return None
+        if entry.get("origin") != origin_of(url):
+            log_debug(f"Cached {source} session belongs to {entry.get('origin')}, not {origin_of(url)}; ignoring it.")
+            return None
+        if entry.get("expires_at", 0) <= time.time():
+            log_debug(f"Cached {source} session expired.")
+            self.discard(source)
+            return None
+        now = time.time()
+        entry["cookies"] = [c for c in entry.get("cookies", []) if not c.get("expiry") or c["expiry"] > now]
+        if not entry["cookies"]:
+            return None
+        log_debug(f"Found cached {source} session from {time.strftime('%H:%M:%S', time.localtime(entry['saved_at']))}.")
+        return entry
+
+    def save(self, source, url, cookies, data=None, ttl=None):
+        """Encrypt and store `source`'s cookies (list of dicts) and `data`. Returns True if it was stored."""
+        if not self.enabled:
+            return False
+        cookies = [{k: cookie[k] for k in COOKIE_FIELDS if cookie.get(k) is not None}
+                   for cookie in cookies if isinstance(cookie, dict) and cookie.get("name")]
+        if not cookies:
+            return False  # Nothing that could carry a session
+        cipher = self._cipher()
+        if cipher is None:
+            return False
+        now = time.time()
+        entry = {
+            "source": source,
+            "origin": origin_of(url),
+            "saved_at": now,
+            "expires_at": now + (self.ttl_for(source) if ttl is None else ttl),
+            "cookies": cookies,
+            "data": data or {},
+        }
+        path = self._path(source)
+        try:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            tmp_path = path + ".tmp"
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "wb") as f:
+                f.write(cipher.encrypt(json.dumps(entry).encode("utf-8")))
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            log_warning(f"Could not cache {source} session: {e}")
+            return False
+        log_debug(f"Cached {source} session ({len(cookies)} cookies) until "
+                  f"{time.strftime('%H:%M:%S', time.localtime(entry['expires_at']))}.")
+        return True
+
+    def discard(self, source):
+        try:
+            os.remove(self._path(source))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            log_warning(f"Could not remove cached {source} session: {e}")
+
+# Shared cache used by the extractors
+session_cache = SessionCache()
+
+def jar_cookies(jar):
+    """Cookies of a requests cookie jar as Selenium-style dicts."""
+    return [{"name": c.name, "value": c.value, "domain": c.domain, "path": c.path,
+             "secure": bool(c.secure), "expiry": c.expires} for c in jar]
+
+def restore_jar(jar, cookies):
+    for cookie in cookies:
+        jar.set(cookie["name"], cookie["value"], domain=cookie.get("domain", ""), path=cookie.get("path", "/"),
+                secure=cookie.get("secure", False), expires=cookie.get("expiry"))
+
+def browser_cookies(driver):
+    try:
+        cookies = driver.get_cookies()
+    except Exception as e:
+        log_debug(f"Could not read browser cookies: {e}")
+        return []
+    return cookies if isinstance(cookies, list) else []
+
+def restore_browser(driver, url, cookies):
+    """Open `url` (cookies can only be set for the page's own site) and add the cached cookies."""
+    driver.get(url)
+    for cookie in cookies:
+        cookie = {k: v for k, v in cookie.items() if k in COOKIE_FIELDS}
+        if "expiry" in cookie:
+            cookie["expiry"] = int(cookie["expiry"])
+        try:
+            driver.add_cookie(cookie)
+        except Exception:
+            # Chrome rejects some domain forms (e.g. host-only cookies with a domain); let it default to the page's
+            cookie.pop("domain", None)
+            driver.add_cookie(cookie)
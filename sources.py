@@ -0,0 +1,188 @@
+import os
+import ast
+import importlib
+# Import our custom logger
+from logger_config import log_debug, log_error
+
+# How expensive a source is to extract; the runner starts cheap sources first
+COST_HTTP = "http"        # Plain HTTP requests, no browser
+COST_FILE = "file"        # Reads a local or downloaded file
+COST_BROWSER = "browser"  # Needs a Chrome session from the pool
+COST_ORDER = {COST_HTTP: 0, COST_FILE: 1, COST_BROWSER: 2}
+
+# The report checks that the bank account covers the floats held in the other systems
+DEFAULT_FORMULA = "CIMB - (V2 + VAS)"
+RECONCILIATION_FORMULA = os.getenv("RECONCILIATION_FORMULA", DEFAULT_FORMULA)
+
+class BalanceSource:
+    """
+    One float account the report reads. `extract` is a callable returning the balance
+    (or None) or {account: balance} for a source made of several accounts, or a
+    "module:function" path imported the first time the source runs.
+    `depends_on` names sources that must finish first; `timeout` is in seconds
+    (None = the runner's default). A `dated` source reads the report for a given
+    business date (passed as `business_date=`); the others read the live balance.
+    """
+
+    def __init__(self, name, extract, cost=COST_BROWSER, depends_on=(), timeout=None, dated=False):
+        if cost not in COST_ORDER:
+            raise ValueError(f"Unknown cost {cost!r} for source {name} (choose from {', '.join(COST_ORDER)})")
+        if timeout is not None and timeout <= 0:
+            raise ValueError(f"Timeout for source {name} must be positive, got {timeout}")
+        self.name = name
+        self.cost = cost
+        self.depends_on = tuple(depends_on)
+        self.timeout = timeout
+        self.dated = dated
+        self._extract = extract
+
+    def extract(self, business_date=None):
+        extract = self._extract
+        if isinstance(extract, str):
+            module_name, _, attribute = extract.partition(":")
+            # Looked up on every call so tests and the benchmark can patch the module attribute
+            extract = getattr(importlib.import_module(module_name), attribute)
+        if self.dated and business_date is not None:
+            return extract(business_date=business_date)
+        return extract()
+
+    def __repr__(self):
+        return f"BalanceSource({self.name!r}, cost={self.cost!r}, depends_on={list(self.depends_on)!r})"
+
+# A source holding several accounts returns {account: balance}; each account is stored as "<source>/<account>"
+ACCOUNT_SEPARATOR = "/"
+
+def account_source(name, account):
+    return f"{name}{ACCOUNT_SEPARATOR}{account}"
+
+def account_total(accounts):
+    """The source's balance from {account: balance}: their sum, or None unless every account was read."""
+    if not accounts or None in accounts.values():
+        return None
+    return sum(accounts.values())
+
+_registry = {}
+
+def register_source(source):
+    """Add (or replace) a source in the registry. Returns it, so it can be used as a one-liner."""
+    _registry[source.name] = source
+    return source
+
+def get_source(name):
+    try:
+        return _registry[name]
+    except KeyError:
+        raise KeyError(f"Unknown balance source {name!r} (registered: {', '.join(_registry)})") from None
+
+def registered_sources():
+    """All registered sources in registration order (which is also the report order)."""
+    return list(_registry.values())
+
+def resolve_sources(names=None):
+    """The named sources (default: all) plus everything they depend on, in registration order."""
+    wanted = set()
+    stack = list(names if names is not None else _registry)
+    while stack:
+        source = get_source(stack.pop())
+        if source.name not in wanted:
+            wanted.add(source.name)
+            stack.extend(source.depends_on)
+    return [source for source in _registry.values() if source.name in wanted]
+
+def as_sources(sources):
+    """A list of BalanceSources as is, or {name: extractor} as ad-hoc browser sources."""
+    if isinstance(sources, dict):
+        return [BalanceSource(name, extractor) for name, extractor in sources.items()]
+    return list(sources)
+
+def plan_sources(sources):
+    """
+    Order sources for starting: dependencies before dependents, otherwise cheapest
+    first (HTTP, then file, then browser), then registration order.
+    """
+    pending = list(sources)
+    names = {source.name for source in pending}
+    done, ordered = set(), []
+    while pending:
+        ready = [s for s in pending if all(dep in done or dep not in names for dep in s.depends_on)]
+        if not ready:
+            raise ValueError(f"Circular dependency between sources: {', '.join(s.name for s in pending)}")
+        source = min(ready, key=lambda s: (COST_ORDER[s.cost], pending.index(s)))
+        pending.remove(source)
+        done.add(source.name)
+        ordered.append(source)
+    log_debug(f"Source plan: {', '.join(f'{s.name} ({s.cost})' for s in ordered)}")
+    return ordered
+
+class Formula:
+    """
+    A reconciliation formula over source names, e.g. "CIMB - (V2 + VAS)". Only names,
+    numbers, + - * / and parentheses are allowed; it is parsed once and never eval()'d.
+    """
+
+    _BINARY = {ast.Add: lambda a, b: a + b, ast.Sub: lambda a, b: a - b,
+               ast.Mult: lambda a, b: a * b, ast.Div: lambda a, b: a / b}
+
+    def __init__(self, text):
+        self.text = " ".join(text.split())
+        try:
+            self._tree = ast.parse(self.text, mode="eval").body
+        except SyntaxError as e:
+            raise ValueError(f"Invalid reconciliation formula {text!r}: {e.msg}") from None
+        self.names = []
+        self.credits, self.debits = [], []  # Names added to / subtracted from the result
+        self._check(self._tree, 1)
+
+    def _check(self, node, sign):
+        if isinstance(node, ast.Name):
+            if node.id not in self.names:
+                self.names.append(node.id)
+            (self.credits if sign > 0 else self.debits).append(node.id)
+        elif isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+            pass
+        elif isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            self._check(node.operand, -sign if isinstance(node.op, ast.USub) else sign)
+        elif isinstance(node, ast.BinOp) and type(node.op) in self._BINARY:
+            self._check(node.left, sign)
+            self._check(node.right, -sign if isinstance(node.op, ast.Sub) else sign)
+        else:
+            raise ValueError(f"Unsupported expression in reconciliation formula {self.text!r}: {ast.dump(node)}")
+
+    def evaluate(self, values):
+        """Evaluate with {name: balance}. Raises KeyError if a balance is missing; None (logged) if it divides by zero."""
+        def _eval(node):
+            if isinstance(node, ast.Name):
+                value = values[node.id]
+                if value is None:
+                    raise KeyError(node.id)
+                return value
+            if isinstance(node, ast.Constant):
+                return node.value
+            if isinstance(node, ast.UnaryOp):
+                operand = _eval(node.operand)
+                return -operand if isinstance(node.op, ast.USub) else operand
+            return self._BINARY[type(node.op)](_eval(node.left), _eval(node.right))
+        try:
+            return _eval(self._tree)
+        except ZeroDivisionError:
+            log_error(f"Reconciliation formula {self.text} divides by zero with balances {values}.")
+            return None
+
+    def __str__(self):
+        return self.text
+
+def reconciliation_formula():
+    return Formula(RECONCILIATION_FORMULA)
+
+def _timeout(name):
+    value = os.getenv(f"{name}_TIMEOUT_SECONDS")
+    return float(value) if value else None
+
+# Built-in sources (registration order = order in the report)
+# CIMB returns a balance per account in CIMB_ACCOUNT_NUMBERS; its balance in the report is their total
+register_source(BalanceSource("CIMB", "main3:login_and_get_cimb_balances", cost=COST_BROWSER, timeout=_timeout("CIMB")))
+# V2 is read over HTTP and falls back to a browser if that fails, so it holds a browser slot
+# (and opens the pool) unless V2_EXTRACT_MODE=http rules the fallback out
+V2_COST = COST_HTTP if os.getenv("V2_EXTRACT_MODE", "auto").lower() == "http" else COST_BROWSER
+register_source(BalanceSource("V2", "main:login_and_test_v2", cost=V2_COST, timeout=_timeout("V2")))
+register_source(BalanceSource("VAS", "main2:login_vas", cost=COST_BROWSER, timeout=_timeout("VAS"), dated=True))
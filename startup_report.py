@@ -0,0 +1,82 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+# Import-time breakdown for the report's entry points.
+# Usage: python startup_report.py [module ...] [--top 15] [--json]
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MODULES = ("generate_report",)
+
+def import_breakdown(module, python=None):
+    """
+    Import `module` in a fresh interpreter with `-X importtime` and return
+    {"module", "total_ms", "direct": [...], "slowest": [...]}. `direct` are the imports
+    made by `module` itself; `slowest` is every module sorted by cumulative time.
+    Each entry is {"name", "self_ms", "cumulative_ms"}.
+    """
+    completed = subprocess.run(
+        [python or sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_DIR, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr[-2000:]}")
+
+    entries = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append({"name": name.strip(), "depth": depth,
+                        "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000})
+
+    # -X importtime prints children before their parent; walk backwards to find the module's own imports
+    total_ms, direct = None, []
+    for index in range(len(entries) - 1, -1, -1):
+        entry = entries[index]
+        if entry["name"] == module and total_ms is None:
+            total_ms = entry["cumulative_ms"]
+            depth = entry["depth"]
+            for child in reversed(entries[:index]):
+                if child["depth"] <= depth:
+                    break
+                if child["depth"] == depth + 1:
+                    direct.append(child)
+            break
+    strip = lambda items: [{k: round(v, 1) if isinstance(v, float) else v for k, v in e.items() if k != "depth"}
+                           for e in items]
+    return {
+        "module": module,
+        "total_ms": round(total_ms or 0.0, 1),
+        "direct": strip(sorted(direct, key=lambda e: e["cumulative_ms"], reverse=True)),
+        "slowest": strip(sorted(entries, key=lambda e: e["cumulative_ms"], reverse=True)),
+    }
+
+def format_breakdown(breakdown, top=15):
+    lines = [f"import {breakdown['module']}: {breakdown['total_ms']:.1f} ms",
+             f"  {'module':<40} {'self ms':>9} {'total ms':>9}"]
+    for entry in breakdown["direct"][:top]:
+        lines.append(f"  {entry['name']:<40} {entry['self_ms']:>9.1f} {entry['cumulative_ms']:>9.1f}")
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show how long importing the report's modules takes.")
+    parser.add_argument("modules", nargs="*", default=list(DEFAULT_MODULES))
+    parser.add_argument("--top", type=int, default=15, help="direct imports to show per module")
+    parser.add_argument("--json", action="store_true", help="print the full breakdown as JSON")
+    args = parser.parse_args(argv)
+
+    breakdowns = [import_breakdown(module) for module in args.modules]
+    if args.json:
+        for breakdown in breakdowns:
+            breakdown["slowest"] = breakdown["slowest"][:args.top]
+        print(json.dumps(breakdowns, indent=2))
+    else:
+        print("\n\n".join(format_breakdown(breakdown, args.top) for breakdown in breakdowns))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,251 @@
+import os
+import json
+import time
+import uuid
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+import pytz
+# Import our custom logger
+from logger_config import log_info, log_warning, log_queue_stats, LOG_DIR, APP_NAME
+import profiling
+import memory_monitor
+
+# Structured stage timings are written as JSON lines next to the main log file
+TIMINGS_PATH = os.getenv("TIMINGS_PATH", os.path.join(LOG_DIR, f"{APP_NAME}.timings.jsonl"))
+BANGKOK_TZ = pytz.timezone("Asia/Bangkok")
+
+_lock = threading.Lock()
+_local = threading.local()
+# Open runs by id: {"id", "started", "records", "active" (source -> stage running now), "profile", "memory"}
+_runs = {}
+# The run the current task belongs to; orchestrator.run_blocking() carries it into worker threads
+_current_run = contextvars.ContextVar("current_run", default=None)
+_write_failed = False
+
+def _run_for(run_id=None):
+    # Caller holds _lock. Threads that didn't inherit a run (e.g. a sampler) get the latest open one
+    run = _runs.get(run_id or _current_run.get())
+    if run is None and _runs:
+        run = next(reversed(_runs.values()))
+    return run
+
+def _timestamp(epoch):
+    return datetime.fromtimestamp(epoch, BANGKOK_TZ).isoformat(timespec="milliseconds")
+
+def _write(record):
+    global _write_failed
+    try:
+        with open(TIMINGS_PATH, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+    except OSError as e:
+        if not _write_failed:
+            log_warning(f"Could not write stage timings to {TIMINGS_PATH}: {e}")
+            _write_failed = True
+
+def _record(source, name, started, ended, ok, cpu=None):
+    record = {
+        "type": "stage",
+        "run_id": None,
+        "source": source,
+        "stage": name,
+        "start": _timestamp(started),
+        "end": _timestamp(ended),
+        "duration": round(ended - started, 3),
+        "cpu": round(cpu, 3) if cpu is not None else None,  # Python CPU time of the thread that ran the stage
+        "ok": ok,
+    }
+    with _lock:
+        run = _run_for()
+        if run is not None:
+            record["run_id"] = run["id"]
+            if run["active"].get(source) == name:
+                del run["active"][source]
+            run["records"].append(record)
+        _write(record)
+    return record
+
+def start_run(run_id=None):
+    """
+    Begin collecting stage timings for one report run and make it the current task's run
+    (runs on the same event loop keep separate timings). Returns the run id. The caller
+    must end_run() it, also when the run fails, or its memory sampler keeps running.
+    """
+    with _lock:
+        run_id = run_id or f"{datetime.now(BANGKOK_TZ):%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+        run = {"id": run_id, "started": time.time(), "records": [], "active": {}, "profile": None, "memory": None,
+               "log_queue": log_queue_stats()}
+        _runs[run_id] = run
+        _current_run.set(run_id)
+    # PROFILE_RUNS=1: profile the run's own thread; stages on worker threads get their own profiles
+    run["profile"] = profiling.start("report", "run")
+    # Peak memory per source and stage while the run is open
+    run["memory"] = memory_monitor.start(functools.partial(active_stages, run_id))
+    return run_id
+
+def current_run_id():
+    with _lock:
+        run = _run_for()
+        return run["id"] if run else None
+
+def run_records(run_id=None):
+    """Copy of the stage records collected so far in the current run (or `run_id`)."""
+    with _lock:
+        run = _run_for(run_id)
+        return list(run["records"]) if run else []
+
+def active_stages(run_id=None):
+    """Snapshot of {source: stage} for the stages of the current run (or `run_id`) running right now."""
+    with _lock:
+        run = _run_for(run_id)
+        return dict(run["active"]) if run else {}
+
+def over_memory_budget(run_id=None):
+    """True if the current run (or `run_id`) has gone over MEMORY_BUDGET_MB."""
+    with _lock:
+        run = _run_for(run_id)
+        monitor = run["memory"] if run else None
+    return memory_monitor.over_budget(monitor)
+
+def _activate(source, name):
+    if name != "total":
+        with _lock:
+            run = _run_for()
+            if run is not None:
+                run["active"][source] = name
+
+def run_summary(run_id=None):
+    """Per-source totals and stage durations for the current run (or `run_id`)."""
+    with _lock:
+        run = _run_for(run_id)
+        records = list(run["records"]) if run else []
+        started = run["started"] if run else None
+        run_id = run["id"] if run else None
+    sources = {}
+    for record in records:
+        summary = sources.setdefault(record["source"], {"total": 0.0, "ok": True, "stages": {}})
+        if record["stage"] == "total":
+            summary["total"] = record["duration"]
+            summary["ok"] = record["ok"]
+        else:
+            stages = summary["stages"]
+            stages[record["stage"]] = round(stages.get(record["stage"], 0.0) + record["duration"], 3)
+    slowest = None
+    for source, summary in sources.items():
+        for name, duration in summary["stages"].items():
+            if slowest is None or duration > slowest["duration"]:
+                slowest = {"source": source, "stage": name, "duration": duration}
+    return {
+        "type": "run_summary",
+        "run_id": run_id,
+        "duration": round(time.time() - started, 3) if started else None,
+        "sources": sources,
+        "slowest_stage": slowest,
+    }
+
+def _log_queue_during(before, after):
+    # Logging queue counters for one run; depth and high water are as of the end of the run
+    if after is None:
+        return None
+    stats = dict(after)
+    for key in ("enqueued", "dropped", "blocked", "blocked_seconds"):
+        stats[key] = stats[key] - (before or {}).get(key, 0)
+    stats["blocked_seconds"] = round(stats["blocked_seconds"], 3)
+    return stats
+
+def end_run(run_id=None):
+    """Write and log the summary of the current run (or `run_id`), then stop collecting. Returns the summary."""
+    with _lock:
+        run = _run_for(run_id)
+    if run is None:
+        return run_summary()
+    memory = memory_monitor.stop(run["memory"])
+    summary = run_summary(run["id"])
+    if memory is not None:
+        summary["memory"] = memory
+    log_queue = _log_queue_during(run["log_queue"], log_queue_stats())
+    if log_queue is not None:
+        summary["log_queue"] = log_queue
+    profiling.stop(run["profile"], run["id"])
+    profiling.finish_run(run["id"])
+    with _lock:
+        _write(summary)
+        _runs.pop(run["id"], None)
+        if _current_run.get() == run["id"]:
+            _current_run.set(None)
+    for source, data in summary["sources"].items():
+        stages = ", ".join(f"{name} {duration:.1f}s" for name, duration in data["stages"].items())
+        log_info(f"Timing: {source} {data['total']:.1f}s ({stages or 'no stages'})")
+    if summary["slowest_stage"]:
+        slowest = summary["slowest_stage"]
+        log_info(f"Timing: slowest stage was {slowest['source']}.{slowest['stage']} ({slowest['duration']:.1f}s)")
+    if memory is not None:
+        peaks = ", ".join(f"{source} {data['peak_rss_mb']} MB (browser {data['browser_rss_mb'] or 0} MB)"
+                          for source, data in memory["sources"].items())
+        heap = f", Python heap {memory['peak_heap_mb']} MB" if memory["peak_heap_mb"] else ""
+        log_info(f"Memory: peak {memory['peak_rss_mb']} MB RSS{heap}" + (f"; {peaks}" if peaks else ""))
+    if log_queue is not None:
+        (log_warning if log_queue["dropped"] else log_info)(
+            f"Logging queue: {log_queue['enqueued']} record(s), {log_queue['dropped']} dropped, "
+            f"{log_queue['blocked']} waited for room ({log_queue['blocked_seconds']:.2f}s); "
+            f"high water {log_queue['high_water']}/{log_queue['max_size']}")
+    return summary
+
+@contextmanager
+def stage(source, name):
+    """Time a block: `with stage("vas", "download"): ...`. The stage is marked failed if the block raises."""
+    _activate(source, name)
+    profile = profiling.start(source, name)
+    started = time.time()
+    cpu_started = time.thread_time()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        _record(source, name, started, time.time(), ok, time.thread_time() - cpu_started)
+        profiling.stop(profile, current_run_id())
+
+def timed_stage(source, name="total"):
+    """
+    Decorator that times a whole extractor as stage `name` (ok = it returned a value)
+    and lets the code inside split it into stages with lap().
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            previous = getattr(_local, "laps", None)
+            _local.laps = {"source": source, "name": None, "started": None, "cpu_started": None}
+            started = time.time()
+            cpu_started = time.thread_time()
+            result = None
+            try:
+                result = func(*args, **kwargs)
+                return result
+            finally:
+                _close_lap(ok=result is not None)
+                _record(source, name, started, time.time(), result is not None, time.thread_time() - cpu_started)
+                _local.laps = previous
+        return wrapper
+    return decorator
+
+def _close_lap(ok=True):
+    laps = getattr(_local, "laps", None)
+    if laps and laps["name"]:
+        _record(laps["source"], laps["name"], laps["started"], time.time(), ok, time.thread_time() - laps["cpu_started"])
+        profiling.stop(laps.pop("profile", None), current_run_id())
+        laps["name"] = None
+
+def lap(name):
+    """End the current stage of the running @timed_stage extractor (if any) and start `name`."""
+    laps = getattr(_local, "laps", None)
+    if laps is None:
+        return
+    _close_lap(ok=True)
+    _activate(laps["source"], name)
+    laps["name"] = name
+    laps["profile"] = profiling.start(laps["source"], name)
+    laps["started"] = time.time()
+    laps["cpu_started"] = time.thread_time()
@@ -1,13 +1,13 @@
 from unittest.mock import patch
 from selenium.common.exceptions import WebDriverException
-from main import login_and_test_v2
+from main import login_and_test_v2_browser
 
-@patch('main.webdriver.Chrome')
+@patch('driver_factory.webdriver.Chrome')
 def test_chromedriver_missing(mock_chrome):
     # Simulate ChromeDriver missing
     mock_chrome.side_effect = WebDriverException("ChromeDriver executable needs to be in PATH.")
-    result = login_and_test_v2()
-    print(f"login_and_test_v2() result with missing ChromeDriver: {result!r}")  # Expect None
+    result = login_and_test_v2_browser()
+    print(f"login_and_test_v2_browser() result with missing ChromeDriver: {result!r}")  # Expect None
 
 if __name__ == '__main__':
     test_chromedriver_missing()
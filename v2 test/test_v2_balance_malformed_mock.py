@@ -1,7 +1,9 @@
 from unittest.mock import patch, MagicMock
-from main import login_and_test_v2
+from main import login_and_test_v2_browser
 
-@patch('main.webdriver.Chrome')
+# The balance never parses, so don't wait the real V2_BALANCE_TIMEOUT_SECONDS for it
+@patch('main.BALANCE_TIMEOUT', 0.2)
+@patch('driver_factory.webdriver.Chrome')
 def test_malformed_balance_text(mock_chrome):
     mock_driver = MagicMock()
     # Mock normal login fields
@@ -15,8 +17,8 @@ def test_malformed_balance_text(mock_chrome):
     mock_driver.find_element.side_effect = find_element_side_effect
     mock_chrome.return_value = mock_driver
 
-    result = login_and_test_v2()
-    print(f"login_and_test_v2() result with malformed balance text: {result!r}")  # Expect None
+    result = login_and_test_v2_browser()
+    print(f"login_and_test_v2_browser() result with malformed balance text: {result!r}")  # Expect None
 
 if __name__ == '__main__':
     test_malformed_balance_text()
@@ -1,9 +1,10 @@
 from unittest.mock import patch, MagicMock
 from selenium.common.exceptions import NoSuchElementException
-from main import login_and_test_v2
+from main import login_and_test_v2_browser
 
 # Patch the webdriver to mock find_element to raise NoSuchElementException for the balance element
-@patch('main.webdriver.Chrome')
+@patch('main.BALANCE_TIMEOUT', 0.2)  # The element never appears; don't wait the real timeout
+@patch('driver_factory.webdriver.Chrome')
 def test_missing_balance_element(mock_chrome):
     # Mock driver instance
     mock_driver = MagicMock()
@@ -16,8 +17,8 @@ def test_missing_balance_element(mock_chrome):
     mock_driver.find_element.side_effect = find_element_side_effect
     mock_chrome.return_value = mock_driver
 
-    result = login_and_test_v2()
-    print(f"login_and_test_v2() result when balance element missing: {result!r}")  # Expect None
+    result = login_and_test_v2_browser()
+    print(f"login_and_test_v2_browser() result when balance element missing: {result!r}")  # Expect None
 
 if __name__ == '__main__':
     test_missing_balance_element()
@@ -0,0 +1,120 @@
+import sys
+import os
+import threading
+import tempfile
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from unittest.mock import patch
+import main
+from session_cache import SessionCache
+from http_client import get_session
+
+FIXTURES = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks', 'fixtures'))
+
+class V2StubHandler(BaseHTTPRequestHandler):
+    """Serves the recorded V2 login and dashboard pages behind a session cookie."""
+
+    def _send_page(self, name):
+        with open(os.path.join(FIXTURES, name), "rb") as f:
+            body = f.read()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _redirect(self, location, cookie=None):
+        self.send_response(302)
+        self.send_header("Location", location)
+        if cookie:
+            self.send_header("Set-Cookie", cookie)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        if self.path == "/agents/login":
+            self._send_page("v2_login.html")
+        elif self.path == "/agents/dashboard" and "v2_session=ok" in self.headers.get("Cookie", ""):
+            self._send_page("v2_dashboard.html")
+        else:
+            self._redirect("/agents/login")
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        form = parse_qs(self.rfile.read(length).decode())
+        if (form.get("_token") == ["k3VtQ9mS2bXo7rPzYcLw1aEfGh4jKuN8"] and
+                form.get("email") == ["agent@example.com"] and form.get("password") == ["secret"]):
+            self._redirect("/agents/dashboard", cookie="v2_session=ok; Path=/; HttpOnly")
+        else:
+            self._redirect("/agents/login")
+
+    def log_message(self, format, *args):
+        pass
+
+def start_stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), V2StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/agents/login"
+
+def test_v2_http_fast_path():
+    server, login_url = start_stub_server()
+    try:
+        with patch('main.V2_URL', login_url), \
+             patch('main.session_cache', SessionCache(enabled=False)), \
+             patch('main.USERNAME', "agent@example.com"), \
+             patch('main.PASSWORD', "secret"), \
+             patch('main.login_and_test_v2_browser') as mock_browser:
+            result = main.login_and_test_v2()
+            print(f"login_and_test_v2() result over HTTP: {result!r}")
+            assert result == 241.67, "E-Money balance not parsed from dashboard HTML!"
+            mock_browser.assert_not_called()
+    finally:
+        server.shutdown()
+
+def test_v2_falls_back_to_browser():
+    server, login_url = start_stub_server()
+    try:
+        with patch('main.V2_URL', login_url), \
+             patch('main.session_cache', SessionCache(enabled=False)), \
+             patch('main.USERNAME', "agent@example.com"), \
+             patch('main.PASSWORD', "wrong-password"), \
+             patch('main.login_and_test_v2_browser') as mock_browser:
+            mock_browser.return_value = 100.0
+            result = main.login_and_test_v2()
+            print(f"login_and_test_v2() result after failed HTTP login: {result!r}")
+            assert result == 100.0, "Should fall back to the browser when the fast path fails!"
+            mock_browser.assert_called_once()
+    finally:
+        server.shutdown()
+
+def test_v2_reuses_cached_session():
+    server, login_url = start_stub_server()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = SessionCache(directory=os.path.join(tmp, "sessions"), key_file=os.path.join(tmp, "session.key"))
+            session = get_session("v2")
+            with patch('main.V2_URL', login_url), \
+                 patch('main.session_cache', cache), \
+                 patch('main.USERNAME', "agent@example.com"), \
+                 patch('main.PASSWORD', "secret"), \
+                 patch.object(session, 'post', wraps=session.post) as post, \
+                 patch('main.login_and_test_v2_browser') as mock_browser:
+                assert main.login_and_test_v2() == 241.67
+                assert post.call_count == 1
+                assert main.login_and_test_v2() == 241.67, "Cached session should read the dashboard"
+                assert post.call_count == 1, "A valid cached session must skip the login form"
+
+                # The portal dropped the session: log in again and cache the new one
+                cached = cache.load("V2", login_url)
+                cache.save("V2", login_url, [dict(c, value="expired") for c in cached["cookies"]], cached["data"])
+                assert main.login_and_test_v2() == 241.67
+                assert post.call_count == 2
+                mock_browser.assert_not_called()
+    finally:
+        server.shutdown()
+
+if __name__ == '__main__':
+    test_v2_http_fast_path()
+    test_v2_falls_back_to_browser()
+    test_v2_reuses_cached_session()
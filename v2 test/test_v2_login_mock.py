@@ -1,9 +1,9 @@
 from unittest.mock import patch, MagicMock
 from selenium.common.exceptions import NoSuchElementException
-from main import login_and_test_v2
+from main import login_and_test_v2_browser
 
 # Patch the webdriver to mock find_element to raise NoSuchElementException for 'email'
-@patch('main.webdriver.Chrome')
+@patch('driver_factory.webdriver.Chrome')
 def test_missing_email_field(mock_chrome):
     # Mock driver instance
     mock_driver = MagicMock()
@@ -15,8 +15,8 @@ def test_missing_email_field(mock_chrome):
     mock_driver.find_element.side_effect = side_effect
     mock_chrome.return_value = mock_driver
 
-    result = login_and_test_v2()
-    print(f"login_and_test_v2() result when email field missing: {result!r}")  # Expect None
+    result = login_and_test_v2_browser()
+    print(f"login_and_test_v2_browser() result when email field missing: {result!r}")  # Expect None
 
 if __name__ == '__main__':
     test_missing_email_field()
@@ -2,7 +2,7 @@ import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from unittest.mock import patch
-from main import login_and_test_v2
+from main import login_and_test_v2_browser
 
 @patch('main.os.getenv')
 def test_missing_env(mock_getenv):
@@ -12,8 +12,8 @@ def test_missing_env(mock_getenv):
             return None
         return default
     mock_getenv.side_effect = getenv_side_effect
-    result = login_and_test_v2()
-    print(f"login_and_test_v2() result with missing env variables: {result!r}")  # Expect None
+    result = login_and_test_v2_browser()
+    print(f"login_and_test_v2_browser() result with missing env variables: {result!r}")  # Expect None
 
 if __name__ == '__main__':
     test_missing_env()
@@ -0,0 +1,100 @@
+import os
+import time
+import threading
+from collections import deque
+from selenium.common.exceptions import (
+    NoSuchElementException,
+    NoSuchFrameException,
+    StaleElementReferenceException,
+)
+# Import our custom logger
+from logger_config import log_debug
+
+# Shared wait settings for all extractors
+DEFAULT_TIMEOUT = float(os.getenv("WAIT_TIMEOUT_SECONDS", "30"))
+DEFAULT_POLL = float(os.getenv("WAIT_POLL_SECONDS", "0.25"))
+
+# Exceptions that mean "not ready yet" rather than "failed"
+IGNORED_EXCEPTIONS = (NoSuchElementException, NoSuchFrameException, StaleElementReferenceException)
+
+# How long the most recent waits actually took, e.g. {"label": "cimb.dashboard", "seconds": 1.84, "ok": True}
+# (bounded so a long-running scheduler doesn't keep every wait it has ever done)
+WAIT_TIMINGS_KEPT = 1000
+wait_timings = deque(maxlen=WAIT_TIMINGS_KEPT)
+_timings_lock = threading.Lock()
+
+class Ready:
+    """Wraps a condition result that may be falsy (e.g. a 0.00 balance) so the wait still stops."""
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+def wait_until(target, condition, timeout=None, poll=None, label=None):
+    """
+    Poll condition(target) until it returns a truthy value and return that value.
+    `target` is usually the WebDriver, but any object the condition accepts works
+    (e.g. a file path). Raises selenium's TimeoutException when the deadline passes.
+    """
+    timeout = DEFAULT_TIMEOUT if timeout is None else timeout
+    poll = DEFAULT_POLL if poll is None else poll
+    label = label or getattr(condition, "__name__", "wait")
+    start = time.monotonic()
+    ok = False
+    try:
+        # Imported here: the selenium webdriver stack is only needed once a browser is in use
+        from selenium.webdriver.support.ui import WebDriverWait
+        result = WebDriverWait(target, timeout, poll_frequency=poll, ignored_exceptions=IGNORED_EXCEPTIONS).until(condition)
+        ok = True
+        return result.value if isinstance(result, Ready) else result
+    finally:
+        elapsed = time.monotonic() - start
+        with _timings_lock:
+            wait_timings.append({"label": label, "seconds": round(elapsed, 3), "ok": ok})
+        log_debug(f"[WAIT] {label} {'satisfied' if ok else 'not satisfied'} after {elapsed:.2f}s (timeout {timeout:.0f}s)")
+
+def reset_wait_timings():
+    with _timings_lock:
+        wait_timings.clear()
+
+# --- Conditions (callables taking the wait target, like selenium's expected_conditions) ---
+
+def _switch_to(driver, frame):
+    if frame is not None:
+        driver.switch_to.default_content()
+        driver.switch_to.frame(frame)
+
+def url_contains(fragment):
+    def condition(driver):
+        return fragment in driver.current_url
+    condition.__name__ = f"url_contains({fragment})"
+    return condition
+
+def url_not_contains(fragment):
+    def condition(driver):
+        return fragment not in driver.current_url
+    condition.__name__ = f"url_not_contains({fragment})"
+    return condition
+
+def element_present(by, value, frame=None):
+    """First element matching (by, value), optionally inside `frame`. Leaves the driver in that frame."""
+    def condition(driver):
+        _switch_to(driver, frame)
+        elements = driver.find_elements(by, value)
+        return elements[0] if elements else False
+    condition.__name__ = f"element_present({value}{', frame=' + frame if frame else ''})"
+    return condition
+
+def text_as_number(by, value, frame=None, strip=("Balance:", "THB")):
+    """Element text parsed as a float once it looks like a number, e.g. 'Balance: 1,234.50 THB'."""
+    def condition(driver):
+        _switch_to(driver, frame)
+        text = driver.find_element(by, value).text
+        try:
+            for token in strip:
+                text = text.replace(token, "")
+            return Ready(float(text.replace(",", "").strip()))
+        except (AttributeError, TypeError, ValueError):
+            return False
+    condition.__name__ = f"text_as_number({value})"
+    return condition